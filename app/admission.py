@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
+
+from app.configs import (
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_SENDER_MAX_IN_FLIGHT,
+    ADMISSION_SENDER_MAX_QUEUED,
+    RATE_LIMIT_COLLECTION_BURST,
+    RATE_LIMIT_COLLECTION_PER_MINUTE,
+    RATE_LIMIT_SENDER_BURST,
+    RATE_LIMIT_SENDER_PER_MINUTE,
+)
+from app.exceptions.admission import RateLimitExceeded, TooManyInFlightRequests
+
+logger = logging.getLogger(__name__)
+
+# Refills and checks every bucket in KEYS, then takes one token from each only if all have one.
+# ARGV: now, then rate (tokens per second) and capacity of each bucket. Returns the seconds to wait, "0" if admitted.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - last) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local available = tokens[i]
+    if wait == 0 then
+        available = available - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(available), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limits per sender and per collection, shared by all workers through Redis.
+
+    Both buckets are checked and charged atomically by one server-side script, in one round trip.
+    A request is admitted only if both buckets have a token. When Redis is unavailable requests
+    are admitted, as the limits protect capacity rather than enforce quotas.
+    """
+
+    def __init__(
+        self,
+        sender_per_minute: float = 30,
+        sender_burst: int = 10,
+        collection_per_minute: float = 600,
+        collection_burst: int = 100,
+    ):
+        """
+        Initialize the limiter.
+        Args:
+            sender_per_minute (float): Sustained requests per minute of one sender. 0 disables the limit.
+            sender_burst (int): Requests a sender may make at once after being idle
+            collection_per_minute (float): Sustained requests per minute to one collection. 0 disables the limit.
+            collection_burst (int): Requests a collection may receive at once after being idle
+        """
+        self.sender_rate = sender_per_minute / 60
+        self.sender_burst = sender_burst
+        self.collection_rate = collection_per_minute / 60
+        self.collection_burst = collection_burst
+        self._scripts: dict[int, Any] = {}
+
+    async def check(self, redis, sender_id: str, collection_name: str) -> None:
+        """
+        Take a token from the sender's and the collection's bucket.
+        Args:
+            redis: Redis connection
+            sender_id (str): Unique identifier for the chat session/sender
+            collection_name (str): Name of the collection being queried
+        Raises:
+            RateLimitExceeded: If either bucket is empty, with the seconds until both have a token
+        """
+        keys, args = [], []
+        if self.sender_rate > 0:
+            keys.append(f"rate_limit:sender:{sender_id}")
+            args += [self.sender_rate, self.sender_burst]
+        if self.collection_rate > 0:
+            keys.append(f"rate_limit:collection:{collection_name}")
+            args += [self.collection_rate, self.collection_burst]
+        if redis is None or not keys:
+            return
+
+        try:
+            wait = float(await self._script(redis)(keys=keys, args=[time.time(), *args]))
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable: {e}")
+            return
+        if wait > 0:
+            raise RateLimitExceeded(f"Rate limit exceeded, retry in {wait:.1f} seconds", retry_after=wait)
+
+    def _script(self, redis):
+        script = self._scripts.get(id(redis))
+        if script is None:
+            script = self._scripts[id(redis)] = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        return script
+
+
+class SenderConcurrencyLimiter:
+    """
+    Limits the requests each sender runs at once, queueing a few more and rejecting the rest.
+
+    State is per process and only kept for senders with requests running or queued, so memory
+    stays proportional to the active senders.
+    """
+
+    def __init__(self, max_in_flight: int = 2, max_queued: int = 4, queue_timeout: float = 30):
+        """
+        Initialize the limiter.
+        Args:
+            max_in_flight (int): Requests of one sender running at once
+            max_queued (int): Requests of one sender waiting for a slot; more are rejected
+            queue_timeout (float): Seconds a request waits for a slot before being rejected
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._senders: dict[str, dict] = {}
+
+    async def acquire(self, sender_id: str) -> None:
+        """
+        Wait for a slot of the sender. Every successful acquire must be followed by a release.
+        Args:
+            sender_id (str): Unique identifier for the chat session/sender
+        Raises:
+            TooManyInFlightRequests: If the sender's queue is full or the wait times out
+        """
+        state = self._senders.setdefault(
+            sender_id, {"semaphore": asyncio.Semaphore(self.max_in_flight), "running": 0, "waiting": 0}
+        )
+        if state["running"] + state["waiting"] >= self.max_in_flight + self.max_queued:
+            raise TooManyInFlightRequests(f"Too many requests in flight for {sender_id}", retry_after=1)
+
+        state["waiting"] += 1
+        try:
+            await asyncio.wait_for(state["semaphore"].acquire(), timeout=self.queue_timeout)
+            state["running"] += 1
+        except asyncio.TimeoutError:
+            raise TooManyInFlightRequests(f"Timed out waiting behind earlier requests of {sender_id}", retry_after=1)
+        finally:
+            state["waiting"] -= 1
+            self._forget_if_idle(sender_id, state)
+
+    def release(self, sender_id: str) -> None:
+        """
+        Free a slot of the sender.
+        Args:
+            sender_id (str): Unique identifier for the chat session/sender
+        """
+        state = self._senders[sender_id]
+        state["running"] -= 1
+        state["semaphore"].release()
+        self._forget_if_idle(sender_id, state)
+
+    @asynccontextmanager
+    async def slot(self, sender_id: str) -> AsyncIterator[None]:
+        await self.acquire(sender_id)
+        try:
+            yield
+        finally:
+            self.release(sender_id)
+
+    def _forget_if_idle(self, sender_id: str, state: dict) -> None:
+        if state["running"] == 0 and state["waiting"] == 0:
+            self._senders.pop(sender_id, None)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution whose result they all share.
+
+    The execution runs as its own task, so it completes for the remaining callers when the caller
+    that started it goes away.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        Run call, or join the execution already running for key.
+        Args:
+            key (Hashable): Identifies equivalent calls
+            call (Callable[[], Awaitable[Any]]): Starts the execution
+        Returns:
+            tuple[Any, bool]: The result and whether it was shared from another caller's execution
+        """
+        future = self._calls.get(key)
+        shared = future is not None
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future), shared
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class AdmissionController:
+    """
+    Admission control for agent requests: rate limits first, then the sender's concurrency slot.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter, concurrency: SenderConcurrencyLimiter):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+
+    async def admit(self, redis, sender_id: str, collection_name: str) -> None:
+        """
+        Admit a request, waiting for a slot if needed. Must be followed by release(sender_id).
+        Args:
+            redis: Redis connection holding the rate limit buckets
+            sender_id (str): Unique identifier for the chat session/sender
+            collection_name (str): Name of the collection being queried
+        Raises:
+            AdmissionError: If the request is rate limited or the sender has too many requests in flight
+        """
+        await self.rate_limiter.check(redis, sender_id, collection_name)
+        await self.concurrency.acquire(sender_id)
+
+    def release(self, sender_id: str) -> None:
+        self.concurrency.release(sender_id)
+
+    @asynccontextmanager
+    async def admitted(self, redis, sender_id: str, collection_name: str) -> AsyncIterator[None]:
+        await self.admit(redis, sender_id, collection_name)
+        try:
+            yield
+        finally:
+            self.release(sender_id)
+
+
+def coalescing_key(collection_name: str, sender_id: str, query: str) -> tuple[str, str, str]:
+    """
+    Key under which identical questions of a sender to a collection share one agent execution.
+    The sender is part of the key because the answer depends on the sender's chat history.
+    """
+    return collection_name, sender_id, " ".join(query.lower().split())
+
+
+admission = AdmissionController(
+    RateLimiter(
+        sender_per_minute=RATE_LIMIT_SENDER_PER_MINUTE,
+        sender_burst=RATE_LIMIT_SENDER_BURST,
+        collection_per_minute=RATE_LIMIT_COLLECTION_PER_MINUTE,
+        collection_burst=RATE_LIMIT_COLLECTION_BURST,
+    ),
+    SenderConcurrencyLimiter(
+        max_in_flight=ADMISSION_SENDER_MAX_IN_FLIGHT,
+        max_queued=ADMISSION_SENDER_MAX_QUEUED,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    ),
+)
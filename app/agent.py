@@ -1,39 +1,133 @@
-import mlflow
-from langchain.agents import AgentExecutor, create_tool_calling_agent
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from langchain.agents import create_tool_calling_agent
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_openai import ChatOpenAI
 
-from app.configs import OPENAI_API_KEY, OPENAI_MODEL
+from app.admission import SingleFlight, coalescing_key
+from app.cache.lru import LRUCache
+from app.cache.semantic import semantic_cache
+from app.compaction import HistoryCompactor, tiktoken_counter
+from app.configs import (
+    AGENT_CONFIG_CHECK_INTERVAL,
+    AGENT_REGISTRY_SIZE,
+    CONVERSATION_TTL,
+    HISTORY_CACHE_SIZE,
+    HISTORY_KEEP_TURNS,
+    HISTORY_SUMMARY_MAX_TOKENS,
+    HISTORY_TOKEN_BUDGET,
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    SEMANTIC_CACHE_ENABLED,
+    TOOL_TIMEOUT,
+    TOOL_TIMEOUTS,
+    TRACING_MODE,
+)
+from app.db.history import SessionHistory, session_history_store
+from app.db.mongodb import (
+    get_collection_config_from_db,
+    get_collection_config_version_from_db,
+    get_mongodb,
+)
 from app.db.vector_store import VectorStore
-from app.models.schema import Query
+from app.executor import ParallelAgentExecutor
+from app.models.schema import CollectionConfig, Query
 from app.tools.tavily_search import search
 from app.tools.weather_tool import WeatherTool
+from app.tracing import tracing_callbacks
 
-mlflow.set_experiment("Agentic-RAG")
-mlflow.langchain.autolog(
-    log_models=True,
-    log_input_examples=True,
-    log_model_signatures=True,
-)
+logger = logging.getLogger(__name__)
+
+llm: Optional[BaseChatModel] = None
+
+
+def get_llm() -> BaseChatModel:
+    """
+    Get the chat model shared by all agents, creating it on first use.
 
-llm = ChatOpenAI(
-    model=OPENAI_MODEL,
-    temperature=0,
-    openai_api_key=OPENAI_API_KEY,
-    max_tokens=100,
-    verbose=True,
+    Returns:
+        BaseChatModel: The OpenAI chat model
+    """
+    global llm
+    if llm is None:
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(
+            model=OPENAI_MODEL,
+            temperature=0,
+            openai_api_key=OPENAI_API_KEY,
+            max_tokens=100,
+            verbose=True,
+        )
+    return llm
+
+
+tracing_configured = False
+
+
+def configure_tracing() -> None:
+    """
+    Enable MLflow autologging of agent runs, once, when TRACING_MODE is "mlflow". Reaches
+    MLFLOW_TRACKING_URI, so it runs while the service warms up, or when the first agent is built,
+    rather than at import. In "spans" mode runs are traced by the callbacks of run_config instead.
+    """
+    global tracing_configured
+    if tracing_configured:
+        return
+    tracing_configured = True
+    if TRACING_MODE != "mlflow":
+        return
+
+    import mlflow
+
+    mlflow.set_experiment("Agentic-RAG")
+    mlflow.langchain.autolog(
+        log_models=True,
+        log_input_examples=True,
+        log_model_signatures=True,
+    )
+
+
+agent_calls = SingleFlight()
+
+# The summarizer is bound to the chat model when the first agent is built.
+history_compactor = HistoryCompactor(
+    token_counter=tiktoken_counter(OPENAI_MODEL),
+    keep_turns=HISTORY_KEEP_TURNS,
+    token_budget=HISTORY_TOKEN_BUDGET,
+    summary_max_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+    cache_size=HISTORY_CACHE_SIZE,
+    ttl=CONVERSATION_TTL,
 )
 
 
-store = {}
+def run_config(sender_id: str, collection_name: str) -> dict:
+    """
+    Get the config of an agent run: the sender's session and the tracing callbacks.
+
+    Args:
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the vector store collection used
+
+    Returns:
+        dict: Runnable config for invoking or streaming the agent
+    """
+    return {
+        "configurable": {"session_id": sender_id},
+        "callbacks": tracing_callbacks(),
+        "metadata": {"sender_id": sender_id, "collection_name": collection_name},
+    }
 
 
 def get_session_history(sender_id: str) -> BaseChatMessageHistory:
     """
-    Get or create a chat message history for a given sender ID.
+    Get the chat message history for a given sender ID.
 
     Args:
         sender_id (str): Unique identifier for the chat session/sender
@@ -42,60 +136,275 @@ def get_session_history(sender_id: str) -> BaseChatMessageHistory:
         BaseChatMessageHistory: Chat message history object for the sender
 
     Description:
-        Retrieves existing chat history from store if it exists for the sender_id,
-        otherwise creates a new ChatMessageHistory and stores it before returning.
+        Histories live in the bounded session history store (Redis with an in-process LRU tier),
+        keep the sender's most recent messages and expire with the conversation tracker.
     """
-    if sender_id not in store:
-        store[sender_id] = ChatMessageHistory()
-    return store[sender_id]
+    return SessionHistory(session_history_store, sender_id)
 
 
-def ask_agent(query: Query, sender_id: str, collection_name: str) -> str:
+prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", "You are a helpful assistant"),
+        MessagesPlaceholder("chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ]
+)
+
+agent_registry = LRUCache(maxsize=AGENT_REGISTRY_SIZE)
+
+
+def build_agent(collection_name: str, config: Optional[CollectionConfig] = None) -> RunnableWithMessageHistory:
     """
-    Creates and executes an agent with tools and chat history to process user queries.
+    Builds a ready-to-run agent for a collection.
 
     Args:
-        query (Query): The user's input query to be processed
-        sender_id (str): Unique identifier for the chat session/sender
         collection_name (str): Name of the vector store collection to use
+        config (Optional[CollectionConfig]): Settings the collection was created with
 
     Returns:
-        str: The agent's response to the query
+        RunnableWithMessageHistory: Agent executor wrapped with message history
 
     Description:
         1. Initializes vector store and tools (retriever, search, weather)
-        2. Creates a chat prompt template with system message and placeholders
-        3. Creates a tool-calling agent with the tools and prompt
-        4. Wraps the agent executor with message history functionality
-        5. Executes the agent with the query and returns the response
+        2. Creates a tool-calling agent with the tools and the shared prompt
+        3. Wraps the agent executor with message history functionality, compacting the history
+           to the token budget before each run
     """
 
-    qdrant_vectorstore = VectorStore(collection_name)
+    qdrant_vectorstore = VectorStore(collection_name, config)
     retriever_tool = qdrant_vectorstore.content_retriever_tool()
 
     search_tool = search()
 
+    configure_tracing()
+    llm = get_llm()
+    if history_compactor.summarizer is None:
+        history_compactor.summarizer = llm.bind(max_tokens=HISTORY_SUMMARY_MAX_TOKENS)
+
     tools = [WeatherTool(), retriever_tool, search_tool]
 
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", "You are a helpful assistant"),
-            MessagesPlaceholder("chat_history", optional=True),
-            ("human", "{input}"),
-            MessagesPlaceholder("agent_scratchpad"),
-        ]
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    agent_executor = ParallelAgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        return_intermediate_steps=True,
+        tool_timeout=TOOL_TIMEOUT,
+        tool_timeouts=TOOL_TIMEOUTS,
     )
 
-    agent = create_tool_calling_agent(llm, tools, prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
+    compact_history = RunnableLambda(history_compactor.compact_input, afunc=history_compactor.acompact_input)
 
-    appraisal_agent = RunnableWithMessageHistory(
-        agent_executor,
+    return RunnableWithMessageHistory(
+        compact_history | agent_executor,
         get_session_history,
         input_messages_key="input",
         history_messages_key="chat_history",
     )
 
-    config = {"configurable": {"session_id": sender_id}}
-    agent_response = appraisal_agent.invoke({"input": query}, config=config)
+
+async def get_agent(collection_name: str) -> RunnableWithMessageHistory:
+    """
+    Get the agent for a collection from the registry, building it with the collection's settings on a miss
+    or when they changed since it was built.
+
+    Args:
+        collection_name (str): Name of the vector store collection to use
+
+    Returns:
+        RunnableWithMessageHistory: Ready-to-run agent for the collection
+    """
+    entry = agent_registry.get(collection_name)
+    if entry is not None and time.monotonic() < entry[2]:
+        return entry[0]
+
+    db = await get_mongodb()
+    version = await get_collection_config_version_from_db(db, collection_name)
+    if entry is not None and entry[1] == version:
+        agent = entry[0]
+    else:
+        agent = build_agent(collection_name, await get_collection_config_from_db(db, collection_name))
+    register_agent(collection_name, agent, version)
+    return agent
+
+
+def register_agent(
+    collection_name: str,
+    agent: RunnableWithMessageHistory,
+    version: Optional[int] = None,
+    check_interval: Optional[float] = None,
+) -> None:
+    """
+    Put an agent in the registry. It is used without looking at the collection's settings for
+    check_interval seconds; after that the next query rebuilds it if their version changed, also
+    when they were changed through another worker.
+
+    Args:
+        collection_name (str): Name of the vector store collection the agent uses
+        agent (RunnableWithMessageHistory): Agent built with the collection's settings
+        version (Optional[int]): Version of the settings the agent was built with
+        check_interval (Optional[float]): Seconds until the settings version is checked again.
+                                          Defaults to AGENT_CONFIG_CHECK_INTERVAL.
+    """
+    check_interval = AGENT_CONFIG_CHECK_INTERVAL if check_interval is None else check_interval
+    agent_registry.set(collection_name, (agent, version, time.monotonic() + check_interval))
+
+
+def invalidate_agent(collection_name: str) -> None:
+    """
+    Drop the cached agent of a collection so the next query to this worker rebuilds it. Other
+    workers rebuild theirs within AGENT_CONFIG_CHECK_INTERVAL seconds, see register_agent.
+
+    Args:
+        collection_name (str): Name of the vector store collection that changed
+    """
+    agent_registry.pop(collection_name)
+
+
+async def ask_agent(query: Query, sender_id: str, collection_name: str) -> str:
+    """
+    Executes the collection's agent with chat history to process user queries.
+
+    Args:
+        query (Query): The user's input query to be processed
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the vector store collection to use
+
+    Returns:
+        str: The agent's response to the query
+    """
+
+    appraisal_agent = await get_agent(collection_name)
+
+    config = run_config(sender_id, collection_name)
+    agent_response = await appraisal_agent.ainvoke({"input": query.query}, config=config)
     return agent_response["output"]
+
+
+async def ask_agent_cached(redis, query: Query, sender_id: str, collection_name: str) -> tuple[str, bool]:
+    """
+    Answers from the semantic cache when a similar query was answered recently, otherwise runs the agent.
+    Senders with chat history always get an answer of their own, see lookup_cached_answer.
+    Concurrent identical questions of the sender to the collection share one agent execution, which
+    answers from the sender's chat history; the history records each of them.
+
+    Args:
+        redis: Redis connection backing the cache, or None for the in-process cache
+        query (Query): The user's input query to be processed
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the vector store collection to use
+
+    Returns:
+        tuple[str, bool]: The response and whether it was a cache hit
+    """
+    cached_response, query_embedding = await lookup_cached_answer(redis, query, sender_id, collection_name)
+    if cached_response is not None:
+        return cached_response, True
+
+    async def answer() -> str:
+        response = await ask_agent(query, sender_id, collection_name)
+        await store_answer(redis, query, collection_name, query_embedding, response)
+        return response
+
+    # Identical questions already being answered share that execution instead of starting another.
+    response, shared = await agent_calls.do(coalescing_key(collection_name, sender_id, query.query), answer)
+    if shared:
+        history = get_session_history(sender_id)
+        await history.aadd_messages([HumanMessage(content=query.query), AIMessage(content=response)])
+    return response, False
+
+
+async def lookup_cached_answer(
+    redis, query: Query, sender_id: str, collection_name: str
+) -> tuple[Optional[str], Optional[list[float]]]:
+    """
+    Looks up the semantic cache and records a hit in the sender's chat history.
+
+    Cached answers are shared by all senders of a collection, so the cache is only used for senders
+    without chat history: their answers are built from the question alone, and a cached answer
+    would ignore the conversation of a sender who has one.
+
+    Args:
+        redis: Redis connection backing the cache, or None for the in-process cache
+        query (Query): The user's input query
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the vector store collection to use
+
+    Returns:
+        tuple[Optional[str], Optional[list[float]]]: The cached response (None on a miss) and the
+                                                     query embedding (None when the cache is unavailable
+                                                     or skipped, so the answer is not stored)
+    """
+    if not SEMANTIC_CACHE_ENABLED:
+        return None, None
+
+    history = get_session_history(sender_id)
+    if await history.aget_messages():
+        return None, None
+
+    try:
+        cached_response, query_embedding = await semantic_cache.lookup(redis, collection_name, query.query)
+    except Exception as e:
+        logger.warning(f"Semantic cache unavailable: {e}")
+        return None, None
+
+    if cached_response is not None:
+        await history.aadd_messages([HumanMessage(content=query.query), AIMessage(content=cached_response)])
+    return cached_response, query_embedding
+
+
+async def store_answer(
+    redis, query: Query, collection_name: str, query_embedding: Optional[list[float]], response: str
+) -> None:
+    """
+    Stores an agent response in the semantic cache.
+
+    Args:
+        redis: Redis connection backing the cache, or None for the in-process cache
+        query (Query): The user's input query
+        collection_name (str): Name of the vector store collection used
+        query_embedding (Optional[list[float]]): Embedding returned by lookup_cached_answer
+        response (str): The agent's response
+    """
+    if query_embedding is not None:
+        await semantic_cache.store(redis, collection_name, query.query, query_embedding, response)
+
+
+async def astream_agent(query: Query, sender_id: str, collection_name: str) -> AsyncIterator[dict]:
+    """
+    Executes the collection's agent and yields its progress as it happens.
+
+    Args:
+        query (Query): The user's input query to be processed
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the vector store collection to use
+
+    Yields:
+        dict: Events shaped as {"event": str, "data": Any}, where event is one of
+              "token" (LLM output text), "tool_start", "tool_end", "tool_timing" (wall time
+              of a tool call as {"tool", "wall_time", "timed_out"}) and finally "end"
+              carrying the full response as {"response": str}
+    """
+
+    appraisal_agent = await get_agent(collection_name)
+
+    config = run_config(sender_id, collection_name)
+    root_run_id = None
+    async for event in appraisal_agent.astream_events({"input": query.query}, config=config, version="v2"):
+        kind = event["event"]
+        if root_run_id is None:
+            root_run_id = event["run_id"]
+
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            if content:
+                yield {"event": "token", "data": content}
+        elif kind == "on_tool_start":
+            yield {"event": "tool_start", "data": {"tool": event["name"], "input": event["data"].get("input")}}
+        elif kind == "on_tool_end":
+            yield {"event": "tool_end", "data": {"tool": event["name"], "output": str(event["data"].get("output"))}}
+        elif kind == "on_custom_event" and event["name"] == "tool_timing":
+            yield {"event": "tool_timing", "data": event["data"]}
+        elif kind == "on_chain_end" and event["run_id"] == root_run_id:
+            yield {"event": "end", "data": {"response": event["data"]["output"]["output"]}}
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+from threading import Lock
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage.encoder_backed import EncoderBackedStore
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
+
+
+class SQLiteByteStore(ByteStore):
+    """
+    Persistent byte store backed by a local SQLite file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (and create if needed) the store.
+        Args:
+            path (str): Path of the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        self._connection.commit()
+
+    def mget(self, keys: Sequence[str]) -> list[Optional[bytes]]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders})", list(keys)
+            ).fetchall()
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, bytes]]) -> None:
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", key_value_pairs)
+            self._connection.commit()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            self._connection.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+            self._connection.commit()
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            if prefix is None:
+                rows = self._connection.execute("SELECT key FROM cache").fetchall()
+            else:
+                rows = self._connection.execute("SELECT key FROM cache WHERE key LIKE ?", (prefix + "%",)).fetchall()
+        for (key,) in rows:
+            yield key
+
+
+class InstrumentedByteStore(ByteStore):
+    """
+    Byte store wrapper counting cache hits, misses and the embedding bytes served from the cache.
+    """
+
+    def __init__(self, store: ByteStore):
+        """
+        Wrap a store.
+        Args:
+            store (ByteStore): The store holding the cached embeddings
+        """
+        self.store = store
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def mget(self, keys: Sequence[str]) -> list[Optional[bytes]]:
+        values = self.store.mget(keys)
+        hits = [value for value in values if value is not None]
+        with self._lock:
+            self.hits += len(hits)
+            self.misses += len(values) - len(hits)
+            self.bytes_saved += sum(len(value) for value in hits)
+        return values
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, bytes]]) -> None:
+        self.store.mset(key_value_pairs)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.store.mdelete(keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.store.yield_keys(prefix=prefix)
+
+    def stats(self) -> dict:
+        """
+        Get cache counters.
+        Returns:
+            dict: hits, misses, hit_rate and bytes_saved
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+def create_byte_store(backend: str, path: str, redis_url: str) -> Optional[ByteStore]:
+    """
+    Create the byte store of an embedding cache backend.
+    Args:
+        backend (str): "sqlite", "redis" or "none"
+        path (str): SQLite database path, used by the sqlite backend
+        redis_url (str): Redis URL, used by the redis backend
+    Returns:
+        Optional[ByteStore]: The store, or None when caching is disabled
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteByteStore(path)
+    if backend == "redis":
+        # The store uses the synchronous `redis` client; the service's own connection is async aioredis.
+        from langchain_community.storage import RedisStore
+
+        return RedisStore(redis_url=redis_url, namespace="embedding_cache")
+    raise ValueError(f"Unknown embedding cache backend: {backend}")
+
+
+def cache_embeddings(
+    underlying: Embeddings, store: Optional[ByteStore], namespace: str
+) -> tuple[Embeddings, Optional[InstrumentedByteStore]]:
+    """
+    Put a content-addressed cache in front of an embedding model.
+
+    Keys are sha256(namespace, text) so entries are shared by ingestion and query-time
+    embed_query, and never collide across models. Vectors are stored as float32 bytes.
+    Args:
+        underlying (Embeddings): The embedding model
+        store (Optional[ByteStore]): Store for the cached vectors, or None to disable caching
+        namespace (str): Identifies the model (and its output dimensions)
+    Returns:
+        tuple[Embeddings, Optional[InstrumentedByteStore]]: The cached embeddings and the store
+                                                            exposing its stats
+    """
+    if store is None:
+        return underlying, None
+
+    instrumented_store = InstrumentedByteStore(store)
+    vector_store = EncoderBackedStore(
+        instrumented_store,
+        key_encoder=lambda text: hashlib.sha256(f"{namespace}\x00{text}".encode()).hexdigest(),
+        value_serializer=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+        value_deserializer=lambda value: np.frombuffer(value, dtype=np.float32).tolist(),
+    )
+    cached = CacheBackedEmbeddings(underlying, vector_store, query_embedding_store=vector_store)
+    return cached, instrumented_store
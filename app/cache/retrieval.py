@@ -0,0 +1,106 @@
+from threading import Lock
+from typing import Hashable, Optional
+
+from langchain_core.documents import Document
+
+from app.cache.lru import LRUCache
+from app.configs import (
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+    RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_CACHE_TTL,
+)
+from app.models.schema import RetrievalSettings
+
+
+def normalize_query(query: str) -> str:
+    """Collapse the whitespace of a query. Case is kept, since embeddings are case-sensitive."""
+    return " ".join(query.split())
+
+
+class RetrievalCache:
+    """
+    Two-level in-process cache in front of the vector store.
+
+    The first level maps a normalized query, per embedding size, to its embedding, so repeated
+    queries skip the embedding model. The second maps a search (collection, query, retrieval settings, filter) to the
+    documents it returned, so they also skip Qdrant. Both levels are LRU with a TTL. Search entries
+    are keyed by the collection's version, which invalidate() bumps whenever documents are added or
+    deleted: later searches miss, and the old entries age out. Versions are per process; the TTL
+    bounds how long other workers can serve results from before a change.
+    """
+
+    def __init__(
+        self,
+        size: int = 1024,
+        ttl: Optional[float] = 300,
+        embedding_size: int = 4096,
+        embedding_ttl: Optional[float] = 3600,
+    ):
+        """
+        Initialize the cache.
+        Args:
+            size (int): Searches kept
+            ttl (Optional[float]): Seconds search results are reused
+            embedding_size (int): Query embeddings kept
+            embedding_ttl (Optional[float]): Seconds query embeddings are reused
+        """
+        self.embeddings = LRUCache(maxsize=embedding_size, ttl=embedding_ttl)
+        self.results = LRUCache(maxsize=size, ttl=ttl)
+        self._versions: dict[str, int] = {}
+        self._lock = Lock()
+
+    def version(self, collection_name: str) -> int:
+        return self._versions.get(collection_name, 0)
+
+    def invalidate(self, collection_name: str) -> None:
+        """
+        Make the cached searches of a collection stale, after its documents changed.
+        Args:
+            collection_name (str): Name of the collection
+        """
+        with self._lock:
+            self._versions[collection_name] = self.version(collection_name) + 1
+
+    @staticmethod
+    def embedding_key(query: str, dimensions: int) -> Hashable:
+        return dimensions, normalize_query(query)
+
+    def results_key(
+        self, collection_name: str, query: str, settings: RetrievalSettings, filter_key: Optional[str] = None
+    ) -> Hashable:
+        return (
+            collection_name,
+            self.version(collection_name),
+            normalize_query(query),
+            settings.model_dump_json(),
+            filter_key,
+        )
+
+    def get_results(self, key: Hashable) -> Optional[list[Document]]:
+        documents = self.results.get(key)
+        if documents is None:
+            return None
+        # Callers get their own documents, so changing one cannot alter the cached entry.
+        return [Document(page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in documents]
+
+    def set_results(self, key: Hashable, documents: list[Document]) -> None:
+        self.results.set(
+            key, [Document(page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in documents]
+        )
+
+    def stats(self) -> dict:
+        """
+        Get the counters of both levels.
+        Returns:
+            dict: LRU counters of the "embeddings" and "results" levels
+        """
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+
+retrieval_cache = RetrievalCache(
+    size=RETRIEVAL_CACHE_SIZE,
+    ttl=RETRIEVAL_CACHE_TTL,
+    embedding_size=QUERY_EMBEDDING_CACHE_SIZE,
+    embedding_ttl=QUERY_EMBEDDING_CACHE_TTL,
+)
@@ -0,0 +1,159 @@
+import base64
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.configs import (
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+)
+from app.db.qdrant import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_PREFIX = "semantic_cache"
+
+
+class SemanticCache:
+    """
+    Response cache keyed by query embedding and collection.
+
+    A lookup embeds the query and compares it by cosine similarity against the most recent
+    entries of the collection. Entries live in a capped Redis list per collection, or in an
+    in-process deque when Redis is not connected.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        threshold: float = 0.95,
+        ttl: int = 3600,
+        max_entries: int = 100,
+    ):
+        """
+        Initialize the cache.
+        Args:
+            embeddings (Optional[Embeddings]): Model used to embed queries. Defaults to the shared
+                                               embedding model, created on first use.
+            threshold (float): Minimum cosine similarity for a cached response to be served
+            ttl (int): Seconds an entry stays valid
+            max_entries (int): Entries kept per collection, oldest evicted first
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.max_entries))
+
+    @staticmethod
+    def _key(collection_name: str) -> str:
+        return f"{SEMANTIC_CACHE_PREFIX}:{collection_name}"
+
+    async def lookup(self, redis, collection_name: str, query: str) -> tuple[Optional[str], list[float]]:
+        """
+        Find a cached response for a semantically similar query.
+        Args:
+            redis: Redis connection, or None to use the in-process cache
+            collection_name (str): Collection the query is asked against
+            query (str): The user's query
+        Returns:
+            tuple[Optional[str], list[float]]: The cached response (None on a miss) and the query
+                                               embedding, to be passed back to store()
+        """
+        if self.embeddings is None:
+            self.embeddings = get_embeddings()
+        embedding = await self.embeddings.aembed_query(query)
+        entries = await self._recent_entries(redis, collection_name)
+        if not entries:
+            return None, embedding
+
+        now = time.time()
+        entries = [entry for entry in entries if entry["created_at"] + self.ttl > now]
+        if not entries:
+            return None, embedding
+
+        query_vector = _normalize(np.asarray(embedding, dtype=np.float32))
+        matrix = _normalize(np.stack([entry["embedding"] for entry in entries]))
+        scores = matrix @ query_vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None, embedding
+        return entries[best]["response"], embedding
+
+    async def store(self, redis, collection_name: str, query: str, embedding: list[float], response: str) -> None:
+        """
+        Cache a response.
+        Args:
+            redis: Redis connection, or None to use the in-process cache
+            collection_name (str): Collection the query was asked against
+            query (str): The user's query
+            embedding (list[float]): Query embedding returned by lookup()
+            response (str): The agent's response
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        created_at = time.time()
+        if redis is None:
+            entry = {"query": query, "response": response, "created_at": created_at, "embedding": vector}
+            self._local[collection_name].appendleft(entry)
+            return
+
+        payload = json.dumps(
+            {
+                "query": query,
+                "response": response,
+                "created_at": created_at,
+                "embedding": base64.b64encode(vector.tobytes()).decode(),
+            }
+        )
+        try:
+            key = self._key(collection_name)
+            async with redis.pipeline(transaction=False) as pipe:
+                await pipe.lpush(key, payload).ltrim(key, 0, self.max_entries - 1).expire(key, self.ttl).execute()
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
+
+    async def invalidate(self, redis, collection_name: str) -> None:
+        """
+        Drop every cached response of a collection.
+        Args:
+            redis: Redis connection, or None to use the in-process cache
+            collection_name (str): Collection whose documents changed
+        """
+        self._local.pop(collection_name, None)
+        if redis is not None:
+            await redis.delete(self._key(collection_name))
+
+    async def _recent_entries(self, redis, collection_name: str) -> list[dict]:
+        if redis is None:
+            return list(self._local.get(collection_name, ()))
+
+        try:
+            raw_entries = await redis.lrange(self._key(collection_name), 0, self.max_entries - 1)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return []
+
+        entries = []
+        for raw_entry in raw_entries:
+            entry = json.loads(raw_entry)
+            entry["embedding"] = np.frombuffer(base64.b64decode(entry["embedding"]), dtype=np.float32)
+            entries.append(entry)
+        return entries
+
+
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=SEMANTIC_CACHE_TTL,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
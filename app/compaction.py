@@ -0,0 +1,218 @@
+import hashlib
+import logging
+from threading import Lock
+from typing import Callable, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.cache.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of a conversation with the new messages. Keep names, numbers, "
+    "decisions and open questions; drop greetings and repetition. Reply with the summary only, "
+    "in at most {max_words} words."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def tiktoken_counter(model: str) -> Callable[[str], int]:
+    """
+    Count tokens the way the chat model does. The encoding is loaded on first use.
+    Args:
+        model (str): OpenAI model name
+    Returns:
+        Callable[[str], int]: Token counter
+    """
+    encoding = None
+
+    def count(text: str) -> int:
+        nonlocal encoding
+        if encoding is None:
+            import tiktoken
+
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        return len(encoding.encode(text))
+
+    return count
+
+
+class HistoryCompactor:
+    """
+    Keeps the chat history injected into agent prompts within a token budget.
+
+    The last keep_turns turns are passed verbatim; older turns are folded into a rolling summary.
+    The summary of each session is cached with a marker of the last message it covers, so each turn
+    only summarizes the messages that left the verbatim window since, never the whole conversation.
+    When the verbatim turns alone exceed the budget, the oldest of them are folded too; the latest
+    turn is always kept.
+
+    Summaries are cached per process. A worker without the summary of a session rebuilds it from
+    the older messages still in the session history.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Runnable] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        keep_turns: int = 3,
+        token_budget: int = 1500,
+        summary_max_tokens: int = 200,
+        cache_size: int = 10000,
+        ttl: Optional[float] = 900,
+    ):
+        """
+        Initialize the compactor.
+        Args:
+            summarizer (Optional[Runnable]): Chat model writing the summaries
+            token_counter (Optional[Callable[[str], int]]): Counts the tokens of a text. Defaults to about
+                                                           4 characters per token.
+            keep_turns (int): Most recent turns passed verbatim
+            token_budget (int): Maximum history tokens in a prompt
+            summary_max_tokens (int): Target length of the summary
+            cache_size (int): Sessions whose summary is cached
+            ttl (Optional[float]): Seconds a session's summary is cached after its last update
+        """
+        self.summarizer = summarizer
+        self.token_counter = token_counter or (lambda text: len(text) // 4)
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.summaries = LRUCache(maxsize=cache_size, ttl=ttl)
+        self._lock = Lock()
+        self.turns = 0
+        self.compacted_turns = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def count_tokens(self, messages: list[BaseMessage]) -> int:
+        return sum(self.token_counter(str(message.content)) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+    async def acompact(
+        self, session_id: str, messages: list[BaseMessage], config: Optional[RunnableConfig] = None
+    ) -> list[BaseMessage]:
+        """
+        Compact the history of a session for the next prompt.
+        Args:
+            session_id (str): Unique identifier of the session
+            messages (list[BaseMessage]): Full session history, oldest first
+            config (Optional[RunnableConfig]): Config of the agent run, passed on to the summarizer so
+                                               its calls carry the run's callbacks, tags and metadata
+        Returns:
+            list[BaseMessage]: A summary message, if any, followed by the verbatim recent messages
+        """
+        tokens_before = self.count_tokens(messages)
+        starts = [index for index, message in enumerate(messages) if isinstance(message, HumanMessage)]
+        if len(starts) <= self.keep_turns and tokens_before <= self.token_budget:
+            self._record(session_id, tokens_before, tokens_before)
+            return messages
+
+        summary, marker = self.summaries.get(session_id, ("", None))
+        folded = self._folded_until(messages, marker)
+        recent_start = max(starts[-self.keep_turns] if len(starts) >= self.keep_turns else 0, folded)
+        summary = await self._fold(summary, messages[folded:recent_start], config)
+        folded = max(folded, recent_start)
+
+        compacted = self._with_summary(summary, messages[folded:])
+        # Fold the oldest verbatim turns while over budget, keeping at least the latest turn.
+        while self.count_tokens(compacted) > self.token_budget:
+            next_start = next((start for start in starts if start > folded), None)
+            if next_start is None:
+                break
+            summary = await self._fold(summary, messages[folded:next_start], config)
+            folded = next_start
+            compacted = self._with_summary(summary, messages[folded:])
+
+        if folded:
+            self.summaries.set(session_id, (summary, self._marker(messages[folded - 1])))
+        self._record(session_id, tokens_before, self.count_tokens(compacted))
+        return compacted
+
+    async def acompact_input(self, inputs: dict, config: RunnableConfig) -> dict:
+        """
+        Runnable step replacing the chat_history of agent inputs with its compacted form.
+
+        When summarizing fails the history is passed unchanged, so the turn still gets answered.
+        """
+        session_id = config.get("configurable", {}).get("session_id")
+        if session_id is None or not inputs.get("chat_history"):
+            return inputs
+        try:
+            return {**inputs, "chat_history": await self.acompact(session_id, inputs["chat_history"], config)}
+        except Exception as e:
+            logger.warning(f"History compaction failed for {session_id}: {e}")
+            return inputs
+
+    def compact_input(self, inputs: dict) -> dict:
+        # Agents run asynchronously in the service; synchronous calls get the history unchanged.
+        return inputs
+
+    def stats(self) -> dict:
+        """
+        Get compaction counters.
+        Returns:
+            dict: turns, compacted_turns, prompt_tokens_before, prompt_tokens_after, prompt_tokens_saved
+                  and avg_prompt_tokens_saved per turn
+        """
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "turns": self.turns,
+                "compacted_turns": self.compacted_turns,
+                "prompt_tokens_before": self.tokens_before,
+                "prompt_tokens_after": self.tokens_after,
+                "prompt_tokens_saved": saved,
+                "avg_prompt_tokens_saved": saved / self.turns if self.turns else 0.0,
+            }
+
+    def _folded_until(self, messages: list[BaseMessage], marker: Optional[str]) -> int:
+        # Position after the last message covered by the cached summary, 0 if it is not in the history.
+        if marker is not None:
+            for index in range(len(messages) - 1, -1, -1):
+                if self._marker(messages[index]) == marker:
+                    return index + 1
+        return 0
+
+    async def _fold(self, summary: str, messages: list[BaseMessage], config: Optional[RunnableConfig] = None) -> str:
+        if not messages:
+            return summary
+        if self.summarizer is None:
+            raise RuntimeError("History compaction needs a summarizer model.")
+
+        transcript = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        result = await self.summarizer.ainvoke(
+            [
+                SystemMessage(SUMMARY_INSTRUCTIONS.format(max_words=self.summary_max_tokens * 3 // 4)),
+                HumanMessage(f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"),
+            ],
+            config,
+        )
+        return str(result.content)
+
+    @staticmethod
+    def _with_summary(summary: str, messages: list[BaseMessage]) -> list[BaseMessage]:
+        if not summary:
+            return list(messages)
+        return [SystemMessage(SUMMARY_PREFIX + summary), *messages]
+
+    @staticmethod
+    def _marker(message: BaseMessage) -> str:
+        return hashlib.sha256(f"{message.type}\x00{message.content}".encode()).hexdigest()
+
+    def _record(self, session_id: str, tokens_before: int, tokens_after: int) -> None:
+        with self._lock:
+            self.turns += 1
+            self.compacted_turns += tokens_after < tokens_before
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+        if tokens_after < tokens_before:
+            logger.info(
+                f"Compacted history of {session_id}: {tokens_before} -> {tokens_after} prompt tokens "
+                f"({tokens_before - tokens_after} saved)"
+            )
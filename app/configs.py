@@ -1,3 +1,4 @@
+import json
 import os
 
 from dotenv import load_dotenv
@@ -6,9 +7,16 @@ load_dotenv()
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+# Output size of EMBEDDING_MODEL; collections may store fewer, leading dimensions
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "3072"))
+# "sqlite", "redis" (shared through REDIS_URL) or "none"
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "sqlite")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+# Candidates fetched from each of the dense and sparse vectors, per result, before RRF fusion in hybrid collections
+HYBRID_PREFETCH_MULTIPLIER = int(os.getenv("HYBRID_PREFETCH_MULTIPLIER", "4"))
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "agentic_rag_db")
@@ -16,12 +24,99 @@ MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "agentic_rag_db")
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
+# tracing: "spans" records spans, latency and token counts in memory and writes them to MongoDB in batches
+# from a background task; "mlflow" autologs every run to MLflow synchronously, with models and input examples
+TRACING_MODE = os.getenv("TRACING_MODE", "spans")
+# fraction of agent runs traced, and characters kept of each span's inputs and outputs (0 keeps none)
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_MAX_PAYLOAD_CHARS = int(os.getenv("TRACING_MAX_PAYLOAD_CHARS", "1000"))
+TRACING_BATCH_SIZE = int(os.getenv("TRACING_BATCH_SIZE", "200"))
+TRACING_FLUSH_INTERVAL = float(os.getenv("TRACING_FLUSH_INTERVAL", "5"))
+TRACING_MAX_PENDING = int(os.getenv("TRACING_MAX_PENDING", "10000"))
+# seconds traces are kept in MongoDB
+TRACING_RETENTION = int(os.getenv("TRACING_RETENTION", str(7 * 24 * 3600)))
+# import the agent and create the model and Qdrant clients in the background after startup, not on the first query
+WARM_UP = os.getenv("WARM_UP", "true").lower() == "true"
 
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(100 * 1024 * 1024)))
+# bytes accepted per bulk upload, counting the files extracted from archives
+MAX_BULK_UPLOAD_SIZE = int(os.getenv("MAX_BULK_UPLOAD_SIZE", str(1024 * 1024 * 1024)))
+
+# ingestion
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "64"))
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "4"))
+INGESTION_EMBED_WORKERS = int(os.getenv("INGESTION_EMBED_WORKERS", "2"))
+# seconds a worker's claim on a job lasts; renewed while the job runs, other workers resume it once expired
+INGESTION_LEASE_SECONDS = float(os.getenv("INGESTION_LEASE_SECONDS", "60"))
+# processes parsing the files of bulk uploads, started on the first bulk job
+INGESTION_PARSE_PROCESSES = int(os.getenv("INGESTION_PARSE_PROCESSES", "2"))
+# CSV rows per document; each document lists its column names and row numbers in its metadata
+CSV_ROWS_PER_DOCUMENT = int(os.getenv("CSV_ROWS_PER_DOCUMENT", "1"))
+
+# agent
+AGENT_REGISTRY_SIZE = int(os.getenv("AGENT_REGISTRY_SIZE", "32"))
+# seconds a worker uses a registered agent before checking whether its collection settings changed
+AGENT_CONFIG_CHECK_INTERVAL = float(os.getenv("AGENT_CONFIG_CHECK_INTERVAL", "5"))
+# tool calls of one agent step run concurrently; sync tools share this many threads
+TOOL_THREADS = int(os.getenv("TOOL_THREADS", "8"))
+# seconds a tool call may take before the agent continues without its result, with per-tool overrides
+# as JSON, e.g. {"Weather": 5, "tavily_search_results_json": 10}
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+TOOL_TIMEOUTS = json.loads(os.getenv("TOOL_TIMEOUTS", "{}"))
+
+# conversations: conversation_tracker entries and session histories expire this long after the last turn
+CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", "900"))
+# "redis" (shared by all workers) or "memory" (per process)
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "redis")
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "20"))
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "10000"))
+HISTORY_LOCAL_TTL = float(os.getenv("HISTORY_LOCAL_TTL", "30"))
+# conversation turns are written to MongoDB in batches of up to this size, at least every interval
+CONVERSATION_LOG_BATCH_SIZE = int(os.getenv("CONVERSATION_LOG_BATCH_SIZE", "100"))
+CONVERSATION_LOG_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL", "1.0"))
+CONVERSATION_LOG_MAX_PENDING = int(os.getenv("CONVERSATION_LOG_MAX_PENDING", "10000"))
+# history compaction: older turns are folded into a rolling summary to keep prompts within the budget
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "3"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "200"))
+# admission control: concurrent and queued requests per sender, and token-bucket rate limits (0 disables a limit)
+ADMISSION_SENDER_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_SENDER_MAX_IN_FLIGHT", "2"))
+ADMISSION_SENDER_MAX_QUEUED = int(os.getenv("ADMISSION_SENDER_MAX_QUEUED", "4"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+RATE_LIMIT_SENDER_PER_MINUTE = float(os.getenv("RATE_LIMIT_SENDER_PER_MINUTE", "30"))
+RATE_LIMIT_SENDER_BURST = int(os.getenv("RATE_LIMIT_SENDER_BURST", "10"))
+RATE_LIMIT_COLLECTION_PER_MINUTE = float(os.getenv("RATE_LIMIT_COLLECTION_PER_MINUTE", "600"))
+RATE_LIMIT_COLLECTION_BURST = int(os.getenv("RATE_LIMIT_COLLECTION_BURST", "100"))
+
+# semantic answer cache
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100"))
+
+# retrieval cache: query embeddings and search results of the retriever, per process; searches are
+# invalidated when the collection changes in this process, and after RETRIEVAL_CACHE_TTL seconds elsewhere
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
 
 # search
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+# web search results are cached per normalized query; failures are cached briefly so they are not retried every turn
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_NEGATIVE_TTL = int(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "60"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "8"))
 
 # weather
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+OPENWEATHER_TIMEOUT = float(os.getenv("OPENWEATHER_TIMEOUT", "5"))
+OPENWEATHER_RETRIES = int(os.getenv("OPENWEATHER_RETRIES", "2"))
+# current weather is cached per normalized location for this many seconds
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))
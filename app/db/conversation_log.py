@@ -0,0 +1,61 @@
+from typing import Awaitable, Callable
+
+from app.configs import (
+    CONVERSATION_LOG_BATCH_SIZE,
+    CONVERSATION_LOG_FLUSH_INTERVAL,
+    CONVERSATION_LOG_MAX_PENDING,
+)
+from app.db.mongodb import add_conversation_turns_to_db, conversation_turn, get_mongodb
+from app.db.write_behind import WriteBehindBuffer
+from app.models.schema import Query
+
+
+async def write_to_mongodb(turns: list[dict]) -> None:
+    db = await get_mongodb()
+    await add_conversation_turns_to_db(db, turns)
+
+
+class ConversationLog(WriteBehindBuffer):
+    """
+    Log of the turns answered by /ask and /ask_stream, kept in the conversation_turns collection.
+
+    Each turn becomes one document with the sender, the collection, the query, the response and the
+    time it was logged, which is what GET /queries/history pages through. The documents reach
+    MongoDB through a WriteBehindBuffer, so a turn can be listed about a flush interval after it
+    was answered, and turns still buffered when the process dies are lost.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        writer: Callable[[list[dict]], Awaitable[None]] = write_to_mongodb,
+    ):
+        """
+        Initialize the buffer.
+        Args:
+            batch_size (int): Pending turns that trigger a write, and the maximum per insert_many
+            flush_interval (float): Seconds a turn waits at most before being written
+            max_pending (int): Turns buffered at most while writes fail
+            writer (Callable[[list[dict]], Awaitable[None]]): Writes a batch of turn documents
+        """
+        super().__init__(writer, batch_size, flush_interval, max_pending, name="conversation turns")
+
+    def add(self, sender_id: str, collection_name: str, query: Query, response: str) -> None:
+        """
+        Buffer a conversation turn. Returns immediately.
+        Args:
+            sender_id (str): Unique identifier of the user/sender
+            collection_name (str): Name of the collection being queried
+            query (Query): User's query object
+            response (str): The agent's response
+        """
+        self.append(conversation_turn(sender_id, collection_name, query, response))  # type: ignore
+
+
+conversation_log = ConversationLog(
+    batch_size=CONVERSATION_LOG_BATCH_SIZE,
+    flush_interval=CONVERSATION_LOG_FLUSH_INTERVAL,
+    max_pending=CONVERSATION_LOG_MAX_PENDING,
+)
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from app.configs import CONVERSATION_TTL
+
+
+def tracker_key(sender_id: str, collection_name: str) -> str:
+    return f"conversation_tracker:{sender_id}:{collection_name}"
+
+
+async def start_turn(redis, sender_id: str, collection_name: str) -> int:
+    """
+    Records the start of a turn in the conversation tracker, in one round trip.
+
+    The message count is incremented atomically with HINCRBY, so concurrent requests of the same
+    sender are all counted. The tracker entry expires CONVERSATION_TTL seconds after the last turn.
+
+    Args:
+        redis: Redis connection
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the collection being queried
+
+    Returns:
+        int: The message count including this turn
+    """
+    key = tracker_key(sender_id, collection_name)
+    pipe = redis.pipeline(transaction=True)
+    pipe.hincrby(key, "message_count", 1)
+    pipe.hset(key, mapping={"last_interaction": datetime.utcnow().isoformat(), "status": "ongoing"})
+    pipe.expire(key, CONVERSATION_TTL)
+    message_count, _, _ = await pipe.execute()
+    return int(message_count)
+
+
+async def finish_turn(redis, sender_id: str, collection_name: str, response: str) -> None:
+    """
+    Records the agent's response in the conversation tracker, in one round trip.
+
+    Args:
+        redis: Redis connection
+        sender_id (str): Unique identifier for the chat session/sender
+        collection_name (str): Name of the collection being queried
+        response (str): The agent's response
+    """
+    key = tracker_key(sender_id, collection_name)
+    pipe = redis.pipeline(transaction=True)
+    pipe.hset(key, mapping={"last_response": response, "status": "responded"})
+    pipe.expire(key, CONVERSATION_TTL)
+    await pipe.execute()
@@ -1,20 +1,287 @@
+import csv
 import logging
 import os
+import re
+import shutil
+import tarfile
+import zipfile
+import zlib
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator, Optional
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import UnstructuredFileLoader
+from langchain_core.documents import Document
 
+from app.configs import CSV_ROWS_PER_DOCUMENT
 from app.exceptions.preprocessor import (
     DataPreprocessorError,
     DocumentSplittingError,
     FileProcessingError,
+    FileTooLargeError,
     UnsupportedFileFormatError,
 )
 from app.models.schema import Docs
 
+if TYPE_CHECKING:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+Loader = Callable[[str], Iterator[Document]]
+
+# Metadata giving a document's position in its file, which changes when content is added before it.
+POSITIONAL_METADATA = frozenset({"first_row", "last_row", "page_number", "start_index"})
+
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+MARKDOWN_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def load_csv(file_path: str, rows_per_document: int = CSV_ROWS_PER_DOCUMENT) -> Iterator[Document]:
+    """Reads a CSV file row by row, yielding a document per group of rows with one "column: value" line per cell.
+    Args:
+        file_path (str): The path of the file, whose first row holds the column names.
+        rows_per_document (int, optional): The number of rows per document. Defaults to CSV_ROWS_PER_DOCUMENT.
+    Yields:
+        Document: The rows, with the source, columns and first and last row number (from 1) in their metadata.
+    """
+    with open(file_path, newline="", encoding="utf-8-sig", errors="replace") as file:
+        reader = csv.reader(file)
+        columns = next(reader, None)
+        if columns is None:
+            return
+        lines: list[str] = []
+        rows = first_row = 0
+        for row_number, row in enumerate(reader, start=1):
+            if not any(row):
+                continue
+            if rows:
+                lines.append("")
+            else:
+                first_row = row_number
+            lines.extend(f"{column}: {value}" for column, value in zip(columns, row) if value)
+            rows += 1
+            if rows == rows_per_document:
+                yield _csv_document(lines, file_path, columns, first_row, row_number)
+                lines, rows = [], 0
+        if rows:
+            yield _csv_document(lines, file_path, columns, first_row, row_number)
+
+
+def _csv_document(lines: list[str], file_path: str, columns: list[str], first_row: int, last_row: int) -> Document:
+    metadata = {"source": file_path, "columns": columns, "first_row": first_row, "last_row": last_row}
+    return Document(page_content="\n".join(lines), metadata=metadata)
+
+
+def load_markdown(file_path: str) -> Iterator[Document]:
+    """Reads a Markdown file line by line, yielding a document per section under a heading.
+    Headings inside fenced code blocks are ignored.
+    Args:
+        file_path (str): The path of the file.
+    Yields:
+        Document: The sections, starting with their heading, with the source and the titles of the section
+                  and its enclosing sections as "headers" in their metadata.
+    """
+    headers: list[tuple[int, str]] = []
+    lines: list[str] = []
+    in_fence = False
+
+    def section() -> Optional[Document]:
+        content = "".join(lines).strip()
+        if not content:
+            return None
+        return Document(page_content=content, metadata={"source": file_path, "headers": [t for _, t in headers]})
+
+    with open(file_path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if MARKDOWN_FENCE.match(line):
+                in_fence = not in_fence
+            heading = None if in_fence else MARKDOWN_HEADING.match(line)
+            if heading:
+                if doc := section():
+                    yield doc
+                level = len(heading.group(1))
+                headers = [(h, title) for h, title in headers if h < level] + [(level, heading.group(2))]
+                lines = []
+            lines.append(line)
+    if doc := section():
+        yield doc
+
+
+def load_unstructured(file_path: str) -> Iterator[Document]:
+    """Reads a file with Unstructured, which handles formats without a native loader such as docx.
+    Unstructured parses the whole file up front, but its elements are yielded as one document per
+    section starting at each title, so only one section is split and embedded at a time.
+    Args:
+        file_path (str): The path of the file.
+    Yields:
+        Document: One document per section of the file, with the page it starts on if known.
+    """
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
+    elements: list[Document] = []
+
+    def section() -> Document:
+        # Element metadata such as last_modified and element ids changes with every upload; keep the stable keys.
+        metadata = {"source": file_path}
+        if (page_number := elements[0].metadata.get("page_number")) is not None:
+            metadata["page_number"] = page_number
+        return Document(page_content="\n\n".join(element.page_content for element in elements), metadata=metadata)
+
+    for element in UnstructuredFileLoader(file_path, mode="elements").lazy_load():
+        if element.metadata.get("category") == "Title" and elements:
+            yield section()
+            elements = []
+        elements.append(element)
+    if elements:
+        yield section()
+
+
+def save_upload(source: BinaryIO, file_path: str, max_size: int, chunk_size: int = 1024 * 1024) -> int:
+    """Copies an uploaded file to disk chunk by chunk, so memory stays bounded whatever the file size.
+    Args:
+        source (BinaryIO): The uploaded file object.
+        file_path (str): The destination path. Removed again if the file is too large.
+        max_size (int): The maximum accepted size in bytes.
+        chunk_size (int, optional): The number of bytes copied at a time. Defaults to 1 MiB.
+    Returns:
+        int: The number of bytes written.
+    Raises:
+        FileTooLargeError: If the file is larger than max_size.
+    """
+    size = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while chunk := source.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"File exceeds the maximum upload size of {max_size} bytes.")
+                buffer.write(chunk)
+    except FileTooLargeError:
+        os.remove(file_path)
+        raise
+    return size
+
+
+ARCHIVE_EXTENSIONS = [".zip", ".tar", ".tar.gz", ".tgz"]
+
+
+def archive_extension(filename: str) -> Optional[str]:
+    """Returns the archive extension of a file name, e.g. ".tar.gz", or None if it is not a supported archive."""
+    name = filename.lower()
+    return next((extension for extension in ARCHIVE_EXTENSIONS if name.endswith(extension)), None)
+
+
+def extract_archive(
+    archive_path: str, directory: str, max_size: int, supported_extensions: list[str]
+) -> tuple[list[tuple[str, str]], list[str]]:
+    """Extracts the supported files of a zip or tar archive, streaming each member to disk.
+    Members are stored under numbered names in directory, so their paths inside the archive are never used
+    as file system paths.
+    Args:
+        archive_path (str): The path of the archive.
+        directory (str): The directory to extract into.
+        max_size (int): The maximum accepted size in bytes of all extracted files together.
+        supported_extensions (list[str]): Extensions of the members to extract.
+    Returns:
+        tuple[list[tuple[str, str]], list[str]]: (name in the archive, extracted path) of each extracted member,
+                                                 and the names of the skipped members.
+    Raises:
+        FileTooLargeError: If the extracted files exceed max_size.
+        FileProcessingError: If the archive cannot be read.
+    """
+    extracted: list[tuple[str, str]] = []
+    skipped: list[str] = []
+    size = 0
+
+    def extract(name: str, source: BinaryIO) -> None:
+        nonlocal size
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in supported_extensions:
+            skipped.append(name)
+            return
+        file_path = os.path.join(directory, f"{len(extracted)}{extension}")
+        size += save_upload(source, file_path, max_size - size)
+        extracted.append((name, file_path))
+
+    try:
+        if archive_path.lower().endswith(".zip"):
+            with zipfile.ZipFile(archive_path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        with archive.open(info) as source:
+                            extract(info.filename, source)
+        else:
+            with tarfile.open(archive_path) as archive:
+                for member in archive:
+                    if member.isfile():
+                        extract(member.name, archive.extractfile(member))  # type: ignore
+    except FileTooLargeError:
+        raise
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, RuntimeError, OSError) as e:
+        # Corrupt or truncated members, encrypted zips and unsupported compression all surface here.
+        raise FileProcessingError(f"Error reading archive: {e}")
+    return extracted, skipped
+
+
+def save_bulk_upload(
+    uploads: list[tuple[str, BinaryIO]], directory: str, max_size: int, supported_extensions: list[str]
+) -> list[dict]:
+    """Stores the files of a bulk upload, extracting zip and tar archives, within one size budget.
+    Args:
+        uploads (list[tuple[str, BinaryIO]]): The file name and file object of each uploaded file.
+        directory (str): The directory to store the files in. Each archive is extracted into a subdirectory.
+        max_size (int): The maximum accepted size in bytes of all stored and extracted files together.
+        supported_extensions (list[str]): Extensions of the files to store.
+    Returns:
+        list[dict]: The filename, file_path, status ("queued" or "rejected") and error of each uploaded file
+                    and archive member, in upload order.
+    Raises:
+        FileTooLargeError: If the files exceed max_size.
+    """
+    files: list[dict] = []
+    names: set[str] = set()
+    size = 0
+
+    def add(filename: str, file_path: Optional[str] = None, error: Optional[str] = None) -> None:
+        if error is None and filename in names:
+            error = "Duplicate file name"
+        if error is not None:
+            if file_path is not None:
+                os.remove(file_path)
+            files.append({"filename": filename, "file_path": None, "status": "rejected", "error": error})
+            return
+        names.add(filename)
+        files.append({"filename": filename, "file_path": file_path, "status": "queued", "error": None})
+
+    for index, (filename, source) in enumerate(uploads):
+        extension = archive_extension(filename) or os.path.splitext(filename)[1].lower()
+        if extension not in ARCHIVE_EXTENSIONS and extension not in supported_extensions:
+            add(filename, error="Unsupported file format")
+            continue
+
+        file_path = os.path.join(directory, f"{index}{extension}")
+        saved = save_upload(source, file_path, max_size - size)
+        if extension not in ARCHIVE_EXTENSIONS:
+            size += saved
+            add(filename, file_path)
+            continue
+
+        archive_directory = os.path.join(directory, str(index))
+        os.makedirs(archive_directory)
+        try:
+            extracted, skipped = extract_archive(file_path, archive_directory, max_size - size, supported_extensions)
+        except FileProcessingError as e:
+            shutil.rmtree(archive_directory, ignore_errors=True)
+            add(filename, error=str(e))
+            continue
+        finally:
+            os.remove(file_path)
+        for name, member_path in extracted:
+            size += os.path.getsize(member_path)
+            add(name, member_path)
+        for name in skipped:
+            add(name, error="Unsupported file format")
+    return files
+
 
 class DataPreprocessor:
     """
@@ -22,6 +289,8 @@ class DataPreprocessor:
     """
 
     SUPPORTED_EXTENSIONS = [".md", ".docx", ".csv"]
+    # Native loaders by extension; other supported formats go through Unstructured.
+    LOADERS: dict[str, Loader] = {".md": load_markdown, ".csv": load_csv, ".docx": load_unstructured}
 
     def __init__(
         self,
@@ -75,20 +344,39 @@ class DataPreprocessor:
         Returns:
             Docs: A list of documents extracted from the file.
         Raises:
-            FileProcessingError: If there is an error processing the file.
-            Exception: For any other unexpected errors during file processing.
+            FileProcessingError: If there is an error processing the file or it contains no elements.
+        """
+        return list(self._iter_files(file_path))
+
+    def _iter_files(self, file_path: str) -> Iterator[Document]:
+        """Lazily processes files such as markdown, docx, and csv, yielding documents as the loader produces them.
+        The loader is picked by extension from LOADERS, with Unstructured for any other extension.
+        Args:
+            file_path (str): The path of the file to process.
+        Yields:
+            Document: Documents extracted from the file.
         Raises:
-            FileProcessingError: If there is an error processing the file.
-            Exception: For any other unexpected errors during file processing.
+            FileProcessingError: If there is an error processing the file or it contains no elements.
         """
+        loader = self.LOADERS.get(os.path.splitext(file_path)[1].lower(), load_unstructured)
+        found = False
         try:
-            loader = UnstructuredFileLoader(file_path)
-            docs = loader.load()
-            if not docs:
-                raise FileProcessingError("No elements found in the file.")
-            return docs
+            for doc in loader(file_path):
+                found = True
+                yield doc
         except Exception as e:
             raise FileProcessingError(f"Error processing file '{file_path}': {e}")
+        if not found:
+            raise FileProcessingError(f"Error processing file '{file_path}': No elements found in the file.")
+
+    def _get_text_splitter(self) -> "RecursiveCharacterTextSplitter":
+        """Creates the tiktoken-based splitter configured with chunk_size and chunk_overlap."""
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+        )
 
     def _split_documents(self, docs: Docs) -> Docs:
         """Splits documents into smaller chunks.
@@ -104,10 +392,7 @@ class DataPreprocessor:
             Exception: For any other unexpected errors during document splitting.
         """
         try:
-            text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-            )
+            text_splitter = self._get_text_splitter()
             return text_splitter.split_documents(docs)
         except Exception as e:
             raise DocumentSplittingError(f"Error splitting documents: {e}")
@@ -127,3 +412,23 @@ class DataPreprocessor:
         except DataPreprocessorError as e:
             logger.error(f"Preprocessing error: {e}")
             raise  # Re-raise the exception to let the caller handle it
+
+    def iter_documents(self) -> Iterator[Document]:
+        """Preprocesses a data file as a stream, splitting each loaded document as soon as it is produced.
+        Yields:
+            Document: Chunks extracted from the file.
+        Raises:
+            DataPreprocessorError: If any error occurs during preprocessing.
+        """
+        try:
+            file_path = self._validate_file()
+            text_splitter = self._get_text_splitter()
+            for doc in self._iter_files(file_path):
+                try:
+                    chunks = text_splitter.split_documents([doc])
+                except Exception as e:
+                    raise DocumentSplittingError(f"Error splitting documents: {e}")
+                yield from chunks
+        except DataPreprocessorError as e:
+            logger.error(f"Preprocessing error: {e}")
+            raise
@@ -0,0 +1,157 @@
+import json
+from typing import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from app.cache.lru import LRUCache
+from app.configs import (
+    CONVERSATION_TTL,
+    HISTORY_BACKEND,
+    HISTORY_CACHE_SIZE,
+    HISTORY_LOCAL_TTL,
+    HISTORY_MAX_MESSAGES,
+)
+from app.db.redis import redis
+
+
+class SessionHistoryStore:
+    """
+    Bounded chat history of every session, in Redis with an in-process LRU tier on top.
+
+    Each session keeps only its last max_messages messages, in a Redis list that expires ttl
+    seconds after the last write, so all workers share the history and it survives restarts.
+    The LRU tier holds the messages of the most recently active sessions for local_ttl seconds,
+    which caps process memory regardless of how many senders there are. A worker may serve a
+    session's history up to local_ttl seconds stale when the same session also hits another worker.
+
+    Without Redis (the "memory" backend, or before Redis is connected) the LRU tier is the only
+    store. Synchronous access always only sees the LRU tier.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = 20,
+        ttl: int = 900,
+        local_size: int = 10000,
+        local_ttl: float = 30,
+        use_redis: bool = True,
+    ):
+        """
+        Initialize the store.
+        Args:
+            max_messages (int): Messages kept per session, oldest dropped first
+            ttl (int): Seconds a session's history is kept after its last message
+            local_size (int): Sessions kept in the in-process tier
+            local_ttl (float): Seconds a session stays in the in-process tier. Ignored without Redis,
+                               where sessions are kept for ttl seconds.
+            use_redis (bool): Whether to persist to Redis
+        """
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.local = LRUCache(maxsize=local_size, ttl=local_ttl if use_redis else ttl)
+
+    def _client(self):
+        return redis.redis if self.use_redis else None
+
+    @staticmethod
+    def key(session_id: str) -> str:
+        return f"chat_history:{session_id}"
+
+    def _window(self, current: list[BaseMessage], messages: Sequence[BaseMessage]) -> tuple[BaseMessage, ...]:
+        start = -self.max_messages
+        return tuple((current + list(messages))[start:])
+
+    def get_messages(self, session_id: str) -> list[BaseMessage]:
+        return list(self.local.get(session_id, ()))
+
+    def add_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        self.local.set(session_id, self._window(self.get_messages(session_id), messages))
+
+    async def aget_messages(self, session_id: str) -> list[BaseMessage]:
+        """
+        Get the history of a session, reading through to Redis on a local miss.
+        Args:
+            session_id (str): Unique identifier of the session
+        Returns:
+            list[BaseMessage]: The messages, oldest first
+        """
+        messages = self.local.get(session_id)
+        if messages is not None:
+            return list(messages)
+
+        client = self._client()
+        if client is None:
+            return []
+        stored = await client.lrange(self.key(session_id), 0, -1)
+        messages = messages_from_dict([json.loads(message) for message in stored])
+        self.local.set(session_id, tuple(messages))
+        return messages
+
+    async def aadd_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        """
+        Append messages to a session and refresh its expiry, in one Redis round trip.
+        Args:
+            session_id (str): Unique identifier of the session
+            messages (Sequence[BaseMessage]): Messages to append
+        """
+        current = await self.aget_messages(session_id)
+        self.local.set(session_id, self._window(current, messages))
+
+        client = self._client()
+        if client is None or not messages:
+            return
+        key = self.key(session_id)
+        pipe = client.pipeline(transaction=True)
+        pipe.rpush(key, *[json.dumps(message_to_dict(message)) for message in messages])
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+    def clear(self, session_id: str) -> None:
+        self.local.pop(session_id)
+
+    async def aclear(self, session_id: str) -> None:
+        self.local.pop(session_id)
+        client = self._client()
+        if client is not None:
+            await client.delete(self.key(session_id))
+
+
+class SessionHistory(BaseChatMessageHistory):
+    """
+    Chat history of one session, as handed to RunnableWithMessageHistory.
+    """
+
+    def __init__(self, store: SessionHistoryStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        return self.store.get_messages(self.session_id)
+
+    async def aget_messages(self) -> list[BaseMessage]:
+        return await self.store.aget_messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.add_messages(self.session_id, messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await self.store.aadd_messages(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+    async def aclear(self) -> None:
+        await self.store.aclear(self.session_id)
+
+
+session_history_store = SessionHistoryStore(
+    max_messages=HISTORY_MAX_MESSAGES,
+    ttl=CONVERSATION_TTL,
+    local_size=HISTORY_CACHE_SIZE,
+    local_ttl=HISTORY_LOCAL_TTL,
+    use_redis=HISTORY_BACKEND == "redis",
+)
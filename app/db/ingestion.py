@@ -0,0 +1,456 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import uuid
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from langchain_core.documents import Document
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.cache.semantic import semantic_cache
+from app.configs import (
+    INGESTION_BATCH_SIZE,
+    INGESTION_EMBED_WORKERS,
+    INGESTION_LEASE_SECONDS,
+    INGESTION_PARSE_PROCESSES,
+    INGESTION_QUEUE_SIZE,
+    INGESTION_WORKERS,
+)
+from app.db.data_handler import POSITIONAL_METADATA, DataPreprocessor
+from app.db.mongodb import (
+    add_many_uploaded_docs_to_db,
+    add_uploaded_docs_to_db,
+    claim_ingestion_job,
+    get_collection_config_from_db,
+    get_mongodb,
+    get_unfinished_ingestion_jobs,
+    release_ingestion_job_leases,
+    renew_ingestion_job_lease,
+    replace_uploaded_docs_in_db,
+    update_ingestion_job,
+)
+from app.db.redis import get_redis
+
+if TYPE_CHECKING:
+    from app.db.pipeline import IngestionPipeline, ProgressCallback
+    from app.db.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionJobQueue:
+    """
+    Worker pool processing document uploads in the background through an IngestionPipeline.
+
+    Job state lives in MongoDB, so jobs that were queued or running when the service stopped
+    are picked up again. A worker claims a job with a lease it renews while the job runs, so with
+    several service processes each job runs in one of them; jobs whose lease expired, because their
+    process died, are picked up by the others within a lease period. Point IDs are derived from
+    the job ID and chunk position, which makes re-running a job idempotent. Jobs uploaded with
+    upsert_by_source instead derive them from the collection, file name and chunk content: chunks
+    already stored are skipped, and those of earlier uploads of the file that are no longer in it
+    are deleted.
+
+    Bulk jobs parse their files in a process pool and feed the chunks of all files through one
+    pipeline, so embedding requests and upserts are full batches regardless of file sizes, and record
+    the documents of all files in one write. A file that cannot be parsed is reported as failed
+    without failing the job.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        batch_size: int = 64,
+        queue_size: int = 4,
+        embed_workers: int = 2,
+        parse_processes: int = 2,
+        preprocessor_class: type[DataPreprocessor] = DataPreprocessor,
+        lease: float = 60,
+    ):
+        """
+        Initialize the queue.
+        Args:
+            workers (int): Number of jobs processed concurrently
+            batch_size (int): Number of chunks embedded and upserted at a time
+            queue_size (int): Batches buffered between two stages of a job's pipeline
+            embed_workers (int): Embedding requests in flight per job
+            parse_processes (int): Processes parsing the files of bulk uploads
+            preprocessor_class (type[DataPreprocessor]): Preprocessor reading the uploaded files
+            lease (float): Seconds a claim on a job lasts; renewed every third of it while the job runs
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.embed_workers = embed_workers
+        self.parse_processes = parse_processes
+        self.preprocessor_class = preprocessor_class
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+
+    async def start(self) -> None:
+        """Start the workers, and queue the unfinished jobs no worker holds now and every lease period."""
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover()))
+
+    async def stop(self) -> None:
+        """Cancel the workers. Interrupted jobs stay unfinished and their leases are released for other workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            await release_ingestion_job_leases(await get_mongodb(), self.owner)
+        except Exception as e:
+            logger.warning(f"Could not release ingestion job leases: {e}")
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    async def submit(self, job_id: str) -> None:
+        """
+        Queue a job for processing.
+        Args:
+            job_id (str): Unique identifier of a job stored with add_ingestion_job_to_db
+        """
+        if self._queue is None:
+            raise RuntimeError("Ingestion queue is not started.")
+        await self._queue.put(job_id)
+
+    async def _recover(self) -> None:
+        while True:
+            try:
+                db = await get_mongodb()
+                for job in await get_unfinished_ingestion_jobs(db):
+                    logger.info(f"Queueing unclaimed ingestion job {job['_id']}")
+                    await self.submit(job["_id"])
+            except Exception as e:
+                logger.error(f"Could not look up unfinished ingestion jobs: {e}")
+            await asyncio.sleep(self.lease)
+
+    async def _heartbeat(self, db: AsyncIOMotorDatabase, job_id: str, job_task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                held = await renew_ingestion_job_lease(db, job_id, self.owner, self.lease)
+            except Exception as e:
+                logger.warning(f"Could not renew the lease on ingestion job {job_id}: {e}")
+                continue
+            if not held:
+                logger.warning(f"Lost the lease on ingestion job {job_id}, stopping it")
+                job_task.cancel()
+                return
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.process(job_id)
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def process(self, job_id: str) -> None:
+        """
+        Claim a job, then parse, embed and upsert its file or files, recording progress as it goes.
+        Args:
+            job_id (str): Unique identifier of the job
+        """
+
+        db = await get_mongodb()
+        job = await claim_ingestion_job(db, job_id, self.owner, self.lease)
+        if job is None:
+            # Finished, or being processed by another worker.
+            return
+        job_task = asyncio.current_task()
+        heartbeat = asyncio.create_task(self._heartbeat(db, job_id, job_task))  # type: ignore
+        try:
+            await self._process(db, job, job_id)
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise
+            # Another worker took the job over; it records the outcome.
+        finally:
+            heartbeat.cancel()
+
+    async def _process(self, db: AsyncIOMotorDatabase, job: dict, job_id: str) -> None:
+        from app.db.pipeline import IngestionPipeline
+        from app.db.vector_store import VectorStore
+
+        reset_progress = {
+            "progress": {
+                "chunks_parsed": 0,
+                "chunks_unchanged": 0,
+                "chunks_embedded": 0,
+                "chunks_upserted": 0,
+                "chunks_deleted": 0,
+            }
+        }
+        await update_ingestion_job(db, job_id, {"status": "running", "error": None, **reset_progress})
+        try:
+
+            async def report(counter: str, count: int) -> None:
+                await update_ingestion_job(db, job_id, progress={counter: count})
+
+            config = await get_collection_config_from_db(db, job["collection_name"])
+            vector_store = VectorStore(job["collection_name"], config)
+            pipeline = IngestionPipeline(
+                vector_store,
+                batch_size=self.batch_size,
+                queue_size=self.queue_size,
+                embed_workers=self.embed_workers,
+                progress=report,
+            )
+            if job.get("files") is not None:
+                result = await self._ingest_files(db, job, pipeline)
+            else:
+                result = await self._ingest_file(db, job, vector_store, pipeline, report)
+
+            await update_ingestion_job(db, job_id, {"status": "completed", "lease_until": None, **result})
+        except Exception as e:
+            await update_ingestion_job(db, job_id, {"status": "failed", "error": str(e), "lease_until": None})
+            # Chunks upserted before the failure are searchable too.
+            await self._invalidate_answers(job["collection_name"])
+            remove_file(job["file_path"])
+            raise
+        await self._invalidate_answers(job["collection_name"])
+        # A cancelled job skips this and keeps its files, so it can resume.
+        remove_file(job["file_path"])
+
+    @staticmethod
+    async def _invalidate_answers(collection_name: str) -> None:
+        # The job's outcome is recorded first: failing to reach Redis must not fail an ingested job.
+        try:
+            await semantic_cache.invalidate(await get_redis(), collection_name)
+        except Exception as e:
+            logger.warning(f"Could not invalidate the cached answers of {collection_name}: {e}")
+
+    async def _ingest_file(
+        self,
+        db: AsyncIOMotorDatabase,
+        job: dict,
+        vector_store: "VectorStore",
+        pipeline: "IngestionPipeline",
+        report: "ProgressCallback",
+    ) -> dict:
+        preprocessor = self.preprocessor_class(
+            os.path.dirname(job["file_path"]),
+            os.path.basename(job["file_path"]),
+            job["chunk_size"],
+            job["chunk_overlap"],
+        )
+        documents = with_source(preprocessor.iter_documents(), job["filename"])
+
+        if job.get("upsert_by_source"):
+            existing = await vector_store.aget_source_ids(job["filename"])
+            doc_ids = await pipeline.run(
+                documents, SourceChunkIds(job["collection_name"], job["filename"]), unchanged=existing
+            )
+            vanished = list(existing - set(doc_ids))
+            await vector_store.adelete_documents(vanished)
+            await report("chunks_deleted", len(vanished))
+            await replace_uploaded_docs_in_db(db, job["collection_name"], job["filename"], doc_ids)  # type: ignore
+        else:
+            doc_ids = await pipeline.run(
+                documents, lambda index, doc: str(uuid.uuid5(uuid.UUID(job["_id"]), str(index)))
+            )
+            await add_uploaded_docs_to_db(db, job["collection_name"], job["filename"], doc_ids)  # type: ignore
+        return {"doc_ids": doc_ids}
+
+    async def _ingest_files(self, db: AsyncIOMotorDatabase, job: dict, pipeline: "IngestionPipeline") -> dict:
+        files = [file for file in job["files"] if file["status"] != "rejected"]
+        for file in files:
+            file.update(status="queued", chunks=0, error=None)
+
+        chunk_ids = BulkChunkIds(job["_id"])
+        documents = iter_parsed_files(
+            self._get_parse_pool(),
+            files,
+            job["chunk_size"],
+            job["chunk_overlap"],
+            self.preprocessor_class,
+            ahead=self.parse_processes * 2,
+        )
+        await pipeline.run(documents, chunk_ids)
+
+        for file in files:
+            if file["status"] == "queued":
+                file["status"] = "completed"
+        await add_many_uploaded_docs_to_db(db, job["collection_name"], chunk_ids.ids)
+        return {"files": job["files"]}
+
+    def _get_parse_pool(self) -> Executor:
+        if self._parse_pool is None:
+            # Spawned rather than forked: the service process runs threads, whose locks a fork would copy.
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._parse_pool
+
+
+def parse_file(
+    preprocessor_class: type[DataPreprocessor], file_path: str, filename: str, chunk_size: int, chunk_overlap: int
+) -> list[Document]:
+    """
+    Parse and split one file of a bulk upload. Runs in a parse process.
+    Args:
+        preprocessor_class (type[DataPreprocessor]): Preprocessor reading the file
+        file_path (str): Path of the stored file
+        filename (str): Name of the file as uploaded, recorded as the source of its chunks
+        chunk_size (int): The size of the chunks
+        chunk_overlap (int): The overlap between chunks
+    Returns:
+        list[Document]: Chunks of the file
+    """
+    preprocessor = preprocessor_class(
+        os.path.dirname(file_path), os.path.basename(file_path), chunk_size, chunk_overlap
+    )
+    return list(with_source(iter(preprocessor.preprocess()), filename))
+
+
+def iter_parsed_files(
+    pool: Executor,
+    files: list[dict],
+    chunk_size: int,
+    chunk_overlap: int,
+    preprocessor_class: type[DataPreprocessor] = DataPreprocessor,
+    ahead: int = 4,
+) -> Iterator[Document]:
+    """
+    Parse files in a pool and yield their chunks, file after file in the given order, so the chunks
+    of consecutive files share embedding batches. At most `ahead` files are parsed or held ahead of
+    the one being yielded. Each file dict gets its "chunks" count, or "failed" status and "error"
+    when it cannot be parsed; the other files carry on.
+    Args:
+        pool (Executor): Pool running parse_file
+        files (list[dict]): filename and file_path of each file
+        chunk_size (int): The size of the chunks
+        chunk_overlap (int): The overlap between chunks
+        preprocessor_class (type[DataPreprocessor]): Preprocessor reading the files
+        ahead (int): Files parsed concurrently
+    Yields:
+        Document: The chunks of all files
+    """
+    queued = iter(files)
+    pending: deque[tuple[dict, Future]] = deque()
+
+    def submit_next() -> None:
+        file = next(queued, None)
+        if file is not None:
+            future = pool.submit(
+                parse_file, preprocessor_class, file["file_path"], file["filename"], chunk_size, chunk_overlap
+            )
+            pending.append((file, future))
+
+    for _ in range(max(ahead, 1)):
+        submit_next()
+    while pending:
+        file, future = pending.popleft()
+        submit_next()
+        try:
+            chunks = future.result()
+        except Exception as e:
+            logger.warning(f"Could not parse {file['filename']}: {e}")
+            file.update(status="failed", error=str(e))
+            continue
+        file["chunks"] = len(chunks)
+        yield from chunks
+
+
+def remove_file(file_path: str) -> None:
+    """
+    Remove a processed upload, or the directory of a bulk upload, if it still exists.
+    Args:
+        file_path (str): Path of the upload
+    """
+    if os.path.isdir(file_path):
+        shutil.rmtree(file_path, ignore_errors=True)
+    elif os.path.exists(file_path):
+        os.remove(file_path)
+
+
+class SourceChunkIds:
+    """
+    Point IDs of the chunks of an uploaded file, derived from the collection, the file name and the
+    chunk content and metadata. Uploading the same file again gives its unchanged chunks the IDs
+    they already have. Repeated identical chunks are told apart by their occurrence count.
+
+    Positional metadata such as CSV row numbers is left out, so inserting content does not change
+    the IDs of the chunks after it. Those chunks are not rewritten and keep their earlier positions.
+    """
+
+    def __init__(self, collection_name: str, filename: str):
+        """
+        Initialize the ID generator for one upload.
+        Args:
+            collection_name (str): Name of the collection the file is uploaded to
+            filename (str): Name of the file as uploaded
+        """
+        self.namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"{collection_name}/{filename}")
+        self._seen: Counter[str] = Counter()
+
+    def __call__(self, index: int, doc: Document) -> str:
+        metadata = {key: value for key, value in doc.metadata.items() if key not in POSITIONAL_METADATA}
+        content = doc.page_content + json.dumps(metadata, sort_keys=True, default=str)
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        occurrence = self._seen[digest]
+        self._seen[digest] += 1
+        return str(uuid.uuid5(self.namespace, f"{digest}:{occurrence}"))
+
+
+class BulkChunkIds:
+    """
+    Point IDs of the chunks of a bulk upload, derived from the job ID, the file name and the chunk's
+    position in its file, so re-running the job is idempotent whatever order the files finish in.
+    Collects the IDs of each file.
+    """
+
+    def __init__(self, job_id: str):
+        """
+        Initialize the ID generator for one job.
+        Args:
+            job_id (str): Unique identifier of the job
+        """
+        self.namespace = uuid.UUID(job_id)
+        self.ids: dict[str, list[str]] = defaultdict(list)
+
+    def __call__(self, index: int, doc: Document) -> str:
+        source = doc.metadata["source"]
+        ids = self.ids[source]
+        ids.append(str(uuid.uuid5(self.namespace, f"{source}/{len(ids)}")))
+        return ids[-1]
+
+
+def with_source(docs: Iterator[Document], filename: str) -> Iterator[Document]:
+    """
+    Record the uploaded file name, rather than the stored upload path, as the source of each chunk.
+    Args:
+        docs (Iterator[Document]): Chunks of the upload
+        filename (str): Name of the file as uploaded
+    Yields:
+        Document: The chunks with their source metadata set
+    """
+    for doc in docs:
+        doc.metadata["source"] = filename
+        yield doc
+
+
+ingestion_queue = IngestionJobQueue(
+    workers=INGESTION_WORKERS,
+    batch_size=INGESTION_BATCH_SIZE,
+    queue_size=INGESTION_QUEUE_SIZE,
+    embed_workers=INGESTION_EMBED_WORKERS,
+    parse_processes=INGESTION_PARSE_PROCESSES,
+    lease=INGESTION_LEASE_SECONDS,
+)
@@ -1,12 +1,26 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
 
-from app.configs import MONGO_DB_NAME, MONGO_URL
-from app.models.schema import DocIds, Query, Response
+from app.configs import MONGO_DB_NAME, MONGO_URL, TRACING_RETENTION
+from app.models.schema import (
+    CollectionConfig,
+    DocIds,
+    Query,
+    Response,
+    RetrievalSettings,
+)
 
+COLLECTION_CONVERSATION_TURNS = "conversation_turns"
+# Before conversation_turns, each sender's turns with a collection were pushed onto one document here.
 COLLECTION_CONVERSATIONS = "conversations"
 COLLECTION_DOCUMENT_UPLOADS = "document_uploads"
+COLLECTION_INGESTION_JOBS = "ingestion_jobs"
+COLLECTION_CONFIGS = "collection_configs"
+COLLECTION_TRACES = "traces"
 
 
 class MongoDB:
@@ -28,6 +42,19 @@ class MongoDB:
 mongodb = MongoDB()
 
 
+async def create_indexes(db: AsyncIOMotorDatabase) -> None:
+    """
+    Create the indexes the queries rely on. Existing indexes are left as they are.
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+    """
+    await db[COLLECTION_CONVERSATION_TURNS].create_index(
+        [("sender_id", ASCENDING), ("collection_name", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]
+    )
+    await db[COLLECTION_TRACES].create_index("start_time", expireAfterSeconds=TRACING_RETENTION)
+    await db[COLLECTION_INGESTION_JOBS].create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+
+
 async def get_mongodb() -> AsyncIOMotorDatabase:
     """
     Get MongoDB database connection
@@ -41,41 +68,128 @@ async def get_mongodb() -> AsyncIOMotorDatabase:
     return mongodb.db
 
 
-async def add_conversation_to_db(
-    db: AsyncIOMotorDatabase,
-    sender_id: str,
-    collection_name: str,
-    query: Query,
-    response: Response,
-) -> dict:
+def conversation_turn(sender_id: str, collection_name: str, query: Query, response: Response) -> dict:
     """
-    Add conversation to database
+    Build the document of one conversation turn
     Args:
-        db (AsyncIOMotorDatabase): Database connection object
         sender_id (str): Unique identifier of the user/sender
         collection_name (str): Name of the collection being queried
         query (Query): User's query object
         response (Response): LLM Agent response object
     Returns:
-        dict: dictionary containing number of modified documents
-              {"modified_count": int}
+        dict: The turn document, timestamped now
+    """
+    return {
+        "sender_id": sender_id,
+        "collection_name": collection_name,
+        "query": query.model_dump(),
+        "response": response,
+        "timestamp": datetime.utcnow(),
+    }
+
+
+async def add_conversation_turns_to_db(db: AsyncIOMotorDatabase, turns: list[dict]) -> dict:
+    """
+    Add a batch of conversation turns to database in one round trip
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        turns (list[dict]): Turn documents built with conversation_turn
+    Returns:
+        dict: dictionary containing the number of inserted turns
+              {"inserted_count": int}
     Raises:
-        Exception: If there is an error adding conversation to database
+        Exception: If there is an error adding the turns to database
     """
     try:
-        conversation_entry = {
-            "query": query.model_dump(),
-            "response": response,
-            "timestamp": datetime.utcnow(),
-        }
-        result = await db[COLLECTION_CONVERSATIONS].update_one(
-            {"sender_id": sender_id, "collection_name": collection_name},
-            {"$push": {"conversations": conversation_entry}},
-            upsert=True,
-        )
-        return {"modified_count": result.modified_count}
+        result = await db[COLLECTION_CONVERSATION_TURNS].insert_many(turns, ordered=False)
+        return {"inserted_count": len(result.inserted_ids)}
+    except Exception as e:
+        raise Exception(f"Failed to add conversation turns: {e}")
+
+
+async def add_traces_to_db(db: AsyncIOMotorDatabase, traces: list[dict]) -> dict:
+    """
+    Add a batch of agent traces to database in one round trip
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        traces (list[dict]): Trace documents built by the span tracer
+    Returns:
+        dict: dictionary containing the number of inserted traces
+              {"inserted_count": int}
+    Raises:
+        Exception: If there is an error adding the traces to database
+    """
+    try:
+        result = await db[COLLECTION_TRACES].insert_many(traces, ordered=False)
+        return {"inserted_count": len(result.inserted_ids)}
     except Exception as e:
-        raise Exception(f"Failed to add conversation: {e}")
+        raise Exception(f"Failed to add traces: {e}")
+
+
+async def get_conversation_history_from_db(
+    db: AsyncIOMotorDatabase,
+    sender_id: str,
+    collection_name: str,
+    limit: int = 20,
+    before: Optional[datetime] = None,
+    before_id: Optional[ObjectId] = None,
+) -> list[dict]:
+    """
+    Get a page of conversation turns, newest first. Turns are ordered by timestamp and then _id,
+    so turns sharing a timestamp are neither skipped nor repeated across pages.
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        sender_id (str): Unique identifier of the user/sender
+        collection_name (str): Name of the collection being queried
+        limit (int): Maximum number of turns returned
+        before (Optional[datetime]): Only return turns older than this timestamp, i.e. the timestamp
+                                     of the last turn of the previous page
+        before_id (Optional[ObjectId]): The _id of the last turn of the previous page, to also return
+                                        the turns with timestamp before that come after it
+    Returns:
+        list[dict]: The turns, with _id, query, response and timestamp
+    """
+    criteria: dict = {"sender_id": sender_id, "collection_name": collection_name}
+    if before is not None and before_id is not None:
+        criteria["$or"] = [{"timestamp": {"$lt": before}}, {"timestamp": before, "_id": {"$lt": before_id}}]
+    elif before is not None:
+        criteria["timestamp"] = {"$lt": before}
+    cursor = (
+        db[COLLECTION_CONVERSATION_TURNS]
+        .find(criteria, {"query": 1, "response": 1, "timestamp": 1})
+        .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
+
+
+async def migrate_conversations(db: AsyncIOMotorDatabase) -> int:
+    """
+    Move the turns of the old conversations collection into conversation_turns, one document per
+    sender and collection at a time. Turns are tagged with the document they came from, so a
+    migration interrupted between inserting them and deleting it is redone without duplicates.
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+    Returns:
+        int: The number of turns moved
+    """
+    moved = 0
+    async for conversation in db[COLLECTION_CONVERSATIONS].find():
+        turns = [
+            {
+                "sender_id": conversation["sender_id"],
+                "collection_name": conversation["collection_name"],
+                **turn,
+                "migrated_from": conversation["_id"],
+            }
+            for turn in conversation.get("conversations", [])
+        ]
+        await db[COLLECTION_CONVERSATION_TURNS].delete_many({"migrated_from": conversation["_id"]})
+        if turns:
+            await db[COLLECTION_CONVERSATION_TURNS].insert_many(turns)
+        await db[COLLECTION_CONVERSATIONS].delete_one({"_id": conversation["_id"]})
+        moved += len(turns)
+    return moved
 
 
 async def add_uploaded_docs_to_db(
@@ -110,6 +224,63 @@ async def add_uploaded_docs_to_db(
         raise Exception(f"Failed to add uploaded docs: {e}")
 
 
+async def add_many_uploaded_docs_to_db(
+    db: AsyncIOMotorDatabase,
+    collection_name: str,
+    uploads: dict[str, DocIds],
+) -> dict:
+    """
+    Add the documents of several uploaded files to database in one request
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        collection_name (str): Name of the collection the files are uploaded to
+        uploads (dict[str, DocIds]): UUIDs of the documents of each uploaded file name
+    Returns:
+        dict: dictionary containing the inserted documents' IDs
+              {"inserted_ids": list[ObjectId]} on success
+    Raises:
+        Exception: If there is an error adding documents to database
+    """
+    if not uploads:
+        return {"inserted_ids": []}
+    try:
+        now = datetime.utcnow()
+        upload_entries = [
+            {"collection_name": collection_name, "filename": filename, "doc_ids": doc_ids, "uploaded_at": now}
+            for filename, doc_ids in uploads.items()
+        ]
+        result = await db[COLLECTION_DOCUMENT_UPLOADS].insert_many(upload_entries, ordered=False)
+        return {"inserted_ids": result.inserted_ids}
+    except Exception as e:
+        raise Exception(f"Failed to add uploaded docs: {e}")
+
+
+async def replace_uploaded_docs_in_db(
+    db: AsyncIOMotorDatabase,
+    collection_name: str,
+    filename: str,
+    doc_ids: DocIds,
+) -> dict:
+    """
+    Record the documents of a re-uploaded file in place of those of its earlier uploads
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        collection_name (str): Name of the collection the file is uploaded to
+        filename (str): uploaded file name
+        doc_ids (DocIds): UUIDs of all documents of the file's current version
+    Returns:
+        dict: dictionary containing the inserted document's ID
+              {"inserted_id": ObjectId} on success
+    Raises:
+        Exception: If there is an error replacing the documents in database
+    """
+    try:
+        await db[COLLECTION_DOCUMENT_UPLOADS].delete_many({"collection_name": collection_name, "filename": filename})
+        return await add_uploaded_docs_to_db(db, collection_name, filename, doc_ids)
+    except Exception as e:
+        raise Exception(f"Failed to replace uploaded docs: {e}")
+
+
 async def delete_docs_from_db(db: AsyncIOMotorDatabase, collection_name: str, ids: DocIds) -> dict:
     """
     Delete documents from database
@@ -137,3 +308,241 @@ async def delete_docs_from_db(db: AsyncIOMotorDatabase, collection_name: str, id
         }
     except Exception as e:
         raise Exception(f"Failed to delete documents: {e}")
+
+
+async def add_ingestion_job_to_db(
+    db: AsyncIOMotorDatabase,
+    job_id: str,
+    collection_name: str,
+    filename: str,
+    file_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    upsert_by_source: bool = False,
+    files: Optional[list[dict]] = None,
+) -> dict:
+    """
+    Add a queued ingestion job to database
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        job_id (str): Unique identifier of the job
+        collection_name (str): Name of the collection the documents are uploaded to
+        filename (str): uploaded file name
+        file_path (str): Path of the stored upload the job processes
+        chunk_size (int): The size of chunks to break the data into
+        chunk_overlap (int): The overlap between chunks
+        upsert_by_source (bool): Replace the documents of earlier uploads of the same file name, writing
+                                 only the chunks that changed
+        files (Optional[list[dict]]): For a bulk upload, the filename, file_path and status of each file;
+                                      file_path is then the directory holding them
+    Returns:
+        dict: The job document
+    Raises:
+        Exception: If there is an error adding the job to database
+    """
+    try:
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "collection_name": collection_name,
+            "filename": filename,
+            "file_path": file_path,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "upsert_by_source": upsert_by_source,
+            "files": files,
+            "status": "queued",
+            "owner": None,
+            "lease_until": None,
+            "progress": {"chunks_parsed": 0, "chunks_embedded": 0, "chunks_upserted": 0},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await db[COLLECTION_INGESTION_JOBS].insert_one(job)
+        return job
+    except Exception as e:
+        raise Exception(f"Failed to add ingestion job: {e}")
+
+
+async def update_ingestion_job(
+    db: AsyncIOMotorDatabase,
+    job_id: str,
+    fields: Optional[dict] = None,
+    progress: Optional[dict] = None,
+) -> None:
+    """
+    Update the state of an ingestion job
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        job_id (str): Unique identifier of the job
+        fields (Optional[dict]): Fields to set, e.g. {"status": "running"}
+        progress (Optional[dict]): Progress counters to increment, e.g. {"chunks_embedded": 64}
+    Raises:
+        Exception: If there is an error updating the job
+    """
+    try:
+        update: dict = {"$set": {**(fields or {}), "updated_at": datetime.utcnow()}}
+        if progress:
+            update["$inc"] = {f"progress.{counter}": value for counter, value in progress.items()}
+        await db[COLLECTION_INGESTION_JOBS].update_one({"_id": job_id}, update)
+    except Exception as e:
+        raise Exception(f"Failed to update ingestion job: {e}")
+
+
+async def get_ingestion_job(db: AsyncIOMotorDatabase, job_id: str) -> Optional[dict]:
+    """
+    Get an ingestion job from database
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        job_id (str): Unique identifier of the job
+    Returns:
+        Optional[dict]: The job document, or None if it does not exist
+    """
+    return await db[COLLECTION_INGESTION_JOBS].find_one({"_id": job_id})
+
+
+async def get_unfinished_ingestion_jobs(db: AsyncIOMotorDatabase) -> list[dict]:
+    """
+    Get the ingestion jobs that were queued or running and are not leased by a worker, oldest first
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+    Returns:
+        list[dict]: The unfinished job documents
+    """
+    cursor = db[COLLECTION_INGESTION_JOBS].find(claimable_job_filter(datetime.utcnow())).sort("created_at", 1)
+    return await cursor.to_list(length=None)
+
+
+def claimable_job_filter(now: datetime) -> dict:
+    """Unfinished jobs no worker holds a lease on, or whose lease expired."""
+    return {
+        "status": {"$in": ["queued", "running"]},
+        "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+    }
+
+
+async def claim_ingestion_job(db: AsyncIOMotorDatabase, job_id: str, owner: str, lease: float) -> Optional[dict]:
+    """
+    Take an unfinished job for processing, unless another worker holds an unexpired lease on it
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        job_id (str): Unique identifier of the job
+        owner (str): Identifier of the claiming worker
+        lease (float): Seconds the claim lasts unless renewed
+    Returns:
+        Optional[dict]: The claimed job document, or None if it is finished, missing or held by another worker
+    """
+    now = datetime.utcnow()
+    return await db[COLLECTION_INGESTION_JOBS].find_one_and_update(
+        {"_id": job_id, **claimable_job_filter(now)},
+        {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=lease)}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def renew_ingestion_job_lease(db: AsyncIOMotorDatabase, job_id: str, owner: str, lease: float) -> bool:
+    """
+    Extend the lease of a worker on a job
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        job_id (str): Unique identifier of the job
+        owner (str): Identifier of the worker holding the lease
+        lease (float): Seconds the lease lasts from now
+    Returns:
+        bool: Whether the worker still held the lease
+    """
+    result = await db[COLLECTION_INGESTION_JOBS].update_one(
+        {"_id": job_id, "owner": owner},
+        {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=lease)}},
+    )
+    return result.matched_count == 1
+
+
+async def release_ingestion_job_leases(db: AsyncIOMotorDatabase, owner: str) -> None:
+    """
+    Give up the leases of a worker, so other workers can resume its unfinished jobs right away
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        owner (str): Identifier of the worker
+    """
+    await db[COLLECTION_INGESTION_JOBS].update_many({"owner": owner}, {"$set": {"owner": None, "lease_until": None}})
+
+
+async def add_collection_config_to_db(
+    db: AsyncIOMotorDatabase, collection_name: str, config: CollectionConfig, replace: bool = False
+) -> CollectionConfig:
+    """
+    Record the settings of a collection. Settings already recorded are kept unless replace is set.
+    Every change increments the version of the settings, which tells agents built with them apart.
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        collection_name (str): Name of the collection
+        config (CollectionConfig): Settings the collection is created with
+        replace (bool): Overwrite recorded settings, which belong to an earlier collection of the same name
+    Returns:
+        CollectionConfig: The settings in effect for the collection
+    Raises:
+        Exception: If there is an error adding the settings to database
+    """
+    try:
+        document = {**config.model_dump(mode="json"), "created_at": datetime.utcnow()}
+        await db[COLLECTION_CONFIGS].update_one(
+            {"_id": collection_name},
+            {"$set": document, "$inc": {"version": 1}} if replace else {"$setOnInsert": {**document, "version": 1}},
+            upsert=True,
+        )
+        return await get_collection_config_from_db(db, collection_name)
+    except Exception as e:
+        raise Exception(f"Failed to add collection config: {e}")
+
+
+async def update_collection_retrieval_settings_in_db(
+    db: AsyncIOMotorDatabase, collection_name: str, settings: RetrievalSettings
+) -> CollectionConfig:
+    """
+    Replace the retrieval settings of a collection. Its other settings are kept.
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        collection_name (str): Name of the collection
+        settings (RetrievalSettings): How the retriever tool searches the collection from now on
+    Returns:
+        CollectionConfig: The settings in effect for the collection
+    Raises:
+        Exception: If there is an error updating the settings
+    """
+    try:
+        await db[COLLECTION_CONFIGS].update_one(
+            {"_id": collection_name},
+            {"$set": {"retrieval": settings.model_dump(mode="json")}, "$inc": {"version": 1}},
+            upsert=True,
+        )
+        return await get_collection_config_from_db(db, collection_name)
+    except Exception as e:
+        raise Exception(f"Failed to update retrieval settings: {e}")
+
+
+async def get_collection_config_from_db(db: AsyncIOMotorDatabase, collection_name: str) -> CollectionConfig:
+    """
+    Get the settings of a collection
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        collection_name (str): Name of the collection
+    Returns:
+        CollectionConfig: The recorded settings, or the defaults for collections created without any
+    """
+    document = await db[COLLECTION_CONFIGS].find_one({"_id": collection_name})
+    return CollectionConfig.model_validate(document or {})
+
+
+async def get_collection_config_version_from_db(db: AsyncIOMotorDatabase, collection_name: str) -> Optional[int]:
+    """
+    Get the version of the settings of a collection, incremented whenever they change
+    Args:
+        db (AsyncIOMotorDatabase): Database connection object
+        collection_name (str): Name of the collection
+    Returns:
+        Optional[int]: The version, or None for collections whose settings were never recorded or changed
+    """
+    document = await db[COLLECTION_CONFIGS].find_one({"_id": collection_name}, {"version": 1})
+    return document.get("version") if document else None
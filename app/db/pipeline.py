@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from itertools import islice
+from typing import Awaitable, Callable, Collection, Iterator, Optional
+
+from langchain_core.documents import Document
+
+from app.db.vector_store import VectorStore
+
+ProgressCallback = Callable[[str, int], Awaitable[None]]
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """
+    Streams documents into a collection through concurrent parse, embed and upsert stages.
+
+    Parsing and splitting run in a thread and fill a bounded queue of batches; embedding
+    workers turn batches into vectors; a writer upserts them into Qdrant. Each stage waits
+    when the next one falls behind, so at most about (queue_size x 2 + embed_workers + 1)
+    batches are held in memory regardless of the file size. Chunks whose point ID is listed as
+    unchanged are neither embedded nor written.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        batch_size: int = 64,
+        queue_size: int = 4,
+        embed_workers: int = 2,
+        progress: Optional[ProgressCallback] = None,
+    ):
+        """
+        Initialize the pipeline.
+        Args:
+            vector_store (VectorStore): Collection the documents are written to
+            batch_size (int): Number of chunks per embedding request and upsert
+            queue_size (int): Batches buffered between two stages
+            embed_workers (int): Embedding requests in flight at once
+            progress (Optional[ProgressCallback]): Awaited with ("chunks_parsed" | "chunks_unchanged" |
+                                                   "chunks_embedded" | "chunks_upserted", count) after each batch
+        """
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.embed_workers = embed_workers
+        self.progress = progress
+
+    async def run(
+        self,
+        documents: Iterator[Document],
+        doc_id: Callable[[int, Document], str],
+        unchanged: Collection[str] = (),
+    ) -> list[str]:
+        """
+        Run the pipeline to completion.
+        Args:
+            documents (Iterator[Document]): Lazily produced chunks. Iterated in a worker thread.
+            doc_id (Callable[[int, Document], str]): Point ID of a chunk, given its position and content
+            unchanged (Collection[str]): Point IDs already stored with the same content, which are skipped
+        Returns:
+            list[str]: Point IDs of all chunks, written or unchanged, in document order
+        Raises:
+            Exception: The first error raised by any stage; the other stages are cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        all_ids: list[str] = []
+        stop = threading.Event()
+
+        def parse() -> None:
+            iterator = iter(documents)
+            start = 0
+            while not stop.is_set() and (batch := list(islice(iterator, self.batch_size))):
+                ids = [doc_id(start + offset, doc) for offset, doc in enumerate(batch)]
+                all_ids.extend(ids)
+                changed = [index for index, point_id in enumerate(ids) if point_id not in unchanged]
+                item = ([batch[index] for index in changed], [ids[index] for index in changed])
+                asyncio.run_coroutine_threadsafe(self._put_parsed(batches, item, len(batch)), loop).result()
+                start += len(batch)
+
+        async def parse_stage() -> None:
+            await asyncio.to_thread(parse)
+            for _ in range(self.embed_workers):
+                await batches.put(_DONE)
+
+        async def embed_stage() -> None:
+            while (item := await batches.get()) is not _DONE:
+                batch, ids = item
+                vectors = await self.vector_store.aembed_documents(batch)
+                await self._report("chunks_embedded", len(batch))
+                await embedded.put((batch, vectors, ids))
+
+        async def embed_workers_stage() -> None:
+            await asyncio.gather(*[embed_stage() for _ in range(self.embed_workers)])
+            await embedded.put(_DONE)
+
+        async def upsert_stage() -> None:
+            while (item := await embedded.get()) is not _DONE:
+                batch, vectors, ids = item
+                await self.vector_store.aupsert_documents(batch, vectors, ids)
+                await self._report("chunks_upserted", len(batch))
+
+        tasks = [
+            asyncio.create_task(parse_stage()),
+            asyncio.create_task(embed_workers_stage()),
+            asyncio.create_task(upsert_stage()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Unblock a parse thread waiting for queue space so it can see the stop flag
+            while not batches.empty():
+                batches.get_nowait()
+            raise
+
+        return all_ids
+
+    async def _put_parsed(self, batches: asyncio.Queue, item: tuple, parsed: int) -> None:
+        if item[0]:
+            await batches.put(item)
+        await self._report("chunks_parsed", parsed)
+        if parsed > len(item[0]):
+            await self._report("chunks_unchanged", parsed - len(item[0]))
+
+    async def _report(self, counter: str, count: int) -> None:
+        if self.progress is not None:
+            await self.progress(counter, count)
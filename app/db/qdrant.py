@@ -0,0 +1,71 @@
+from threading import Lock
+from typing import Any, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.configs import (
+    EMBEDDING_CACHE_BACKEND,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MODEL,
+    QDRANT_URL,
+    REDIS_URL,
+)
+
+
+class Qdrant:
+    """
+    Qdrant clients and the cache-backed embedding model shared by all collections.
+
+    Nothing is created, or even imported, until connect() is called: on first use, or ahead of
+    it when the service warms up. Attributes set before connecting are kept, which lets tests
+    substitute in-memory clients and fake embeddings.
+    """
+
+    def __init__(self):
+        self.client: Any = None
+        self.async_client: Any = None
+        self.embeddings: Optional[Embeddings] = None
+        self.embedding_cache: Any = None
+        self._lock = Lock()
+
+    def connect(self) -> "Qdrant":
+        if self.client is not None and self.async_client is not None and self.embeddings is not None:
+            return self
+        with self._lock:
+            if self.client is None or self.async_client is None:
+                from qdrant_client import AsyncQdrantClient, QdrantClient
+
+                if self.client is None:
+                    self.client = QdrantClient(location=QDRANT_URL)
+                if self.async_client is None:
+                    self.async_client = AsyncQdrantClient(location=QDRANT_URL)
+            if self.embeddings is None:
+                from langchain_openai import OpenAIEmbeddings
+
+                from app.cache.embeddings import cache_embeddings, create_byte_store
+
+                self.embeddings, self.embedding_cache = cache_embeddings(
+                    OpenAIEmbeddings(model=EMBEDDING_MODEL),
+                    create_byte_store(EMBEDDING_CACHE_BACKEND, EMBEDDING_CACHE_PATH, REDIS_URL),
+                    namespace=EMBEDDING_MODEL,
+                )
+        return self
+
+    async def close(self):
+        if self.async_client is not None:
+            await self.async_client.close()
+        if self.client is not None:
+            self.client.close()
+
+
+qdrant = Qdrant()
+
+
+def get_embeddings() -> Embeddings:
+    """
+    Returns the shared embedding model, creating it on first use.
+
+    Returns:
+        Embeddings: The cache-backed embedding model used by every collection
+    """
+    return qdrant.connect().embeddings  # type: ignore[return-value]
@@ -0,0 +1,70 @@
+import re
+import zlib
+from collections import Counter
+
+from langchain_qdrant.sparse_embeddings import SparseEmbeddings, SparseVector
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase terms.
+
+    Compound identifiers such as product codes (``XK-4821``, ``v2.1.0``) are kept whole and
+    their parts are emitted too, so exact codes and partial mentions both match.
+    Args:
+        text (str): Text to tokenize
+    Returns:
+        list[str]: Terms in order of appearance
+    """
+    terms = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(match)
+        parts = re.split(r"[-./]", match)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+
+def term_index(term: str) -> int:
+    """Stable sparse dimension of a term, identical across processes."""
+    return zlib.crc32(term.encode()) & 0x7FFFFFFF
+
+
+class BM25SparseEmbeddings(SparseEmbeddings):
+    """
+    BM25-style sparse vectors for Qdrant hybrid search.
+
+    Documents carry the BM25 term-frequency component with length normalization; queries carry
+    a weight of 1 per term. The IDF component is applied by Qdrant at query time, through the
+    IDF modifier of the sparse vector, so it always reflects the current collection.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_length: float = 256.0):
+        """
+        Initialize the encoder.
+        Args:
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization strength
+            avg_doc_length (float): Expected number of terms per chunk
+        """
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+    def embed_documents(self, texts: list[str]) -> list[SparseVector]:
+        return [self._embed_document(text) for text in texts]
+
+    def embed_query(self, text: str) -> SparseVector:
+        indices = sorted({term_index(term) for term in tokenize(text)})
+        return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+    def _embed_document(self, text: str) -> SparseVector:
+        terms = tokenize(text)
+        length_norm = self.k1 * (1 - self.b + self.b * len(terms) / self.avg_doc_length)
+        weights: Counter = Counter()
+        for term, frequency in Counter(terms).items():
+            weights[term_index(term)] += frequency * (self.k1 + 1) / (frequency + length_norm)
+        indices = sorted(weights)
+        return SparseVector(indices=indices, values=[weights[index] for index in indices])
@@ -1,17 +1,125 @@
-from typing import Any
+from typing import Any, Callable, Hashable, Optional
 from uuid import uuid4
 
+import numpy as np
 from langchain.tools.retriever import create_retriever_tool
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+from langchain_qdrant import RetrievalMode as QdrantRetrievalMode
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    FieldCondition,
+    Filter,
+    Fusion,
+    FusionQuery,
+    MatchValue,
+    Modifier,
+    PointIdsList,
+    PointStruct,
+    Prefetch,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    SparseVector,
+    SparseVectorParams,
+    VectorParams,
+)
 
-from app.configs import EMBEDDING_MODEL, QDRANT_URL
+from app.cache.retrieval import retrieval_cache
+from app.compaction import tiktoken_counter
+from app.configs import EMBEDDING_DIMENSIONS, HYBRID_PREFETCH_MULTIPLIER, OPENAI_MODEL
+from app.db.qdrant import qdrant
+from app.db.sparse import BM25SparseEmbeddings
+from app.models.schema import (
+    CollectionConfig,
+    Quantization,
+    RetrievalMode,
+    RetrievalSettings,
+)
 
-client = QdrantClient(location=QDRANT_URL)
+sparse_embeddings = BM25SparseEmbeddings()
 
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Keeps the leading dimensions of a Matryoshka embedding model's vectors, re-normalized.
+
+    This is what the OpenAI `dimensions` parameter does server-side; truncating locally lets collections
+    of every size share one embedding cache entry per text.
+    """
+
+    def __init__(self, embeddings: Embeddings, dimensions: int):
+        """
+        Wrap an embedding model.
+        Args:
+            embeddings (Embeddings): Model producing full-size vectors
+            dimensions (int): Number of leading dimensions to keep
+        """
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def _truncate(self, vectors: list[list[float]]) -> list[list[float]]:
+        truncated = np.asarray(vectors, dtype=np.float32)[:, : self.dimensions]
+        norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+        return (truncated / np.where(norms == 0, 1, norms)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._truncate(self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._truncate([self.embeddings.embed_query(text)])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._truncate(await self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self._truncate([await self.embeddings.aembed_query(text)])[0]
+
+
+def maximal_marginal_relevance(
+    query_embedding: list[float], candidates: np.ndarray, k: int, lambda_mult: float = 0.5
+) -> list[int]:
+    """
+    Pick k candidates, one at a time, that are similar to the query and dissimilar to those already picked.
+    Args:
+        query_embedding (list[float]): Embedding of the query
+        candidates (np.ndarray): Candidate embeddings, one per row
+        k (int): Number of candidates to pick
+        lambda_mult (float): Weight of query similarity against diversity, between 0 and 1
+    Returns:
+        list[int]: Row indices of the picked candidates, in the order they were picked
+    """
+    if len(candidates) == 0:
+        return []
+    vectors = np.asarray(candidates, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    relevance = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+    picked = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to any picked one, updated with one matrix-vector product per pick.
+    redundancy = vectors @ vectors[picked[0]]
+    while len(picked) < min(k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[picked] = -np.inf
+        pick = int(np.argmax(scores))
+        picked.append(pick)
+        redundancy = np.maximum(redundancy, vectors @ vectors[pick])
+    return picked
+
+
+# Shared by all collections; the encoding is loaded on the first retrieval with a token budget.
+context_token_counter = tiktoken_counter(OPENAI_MODEL)
 
 
 class VectorStore:
@@ -19,31 +127,113 @@ class VectorStore:
     Class for managing vector store operations.
     """
 
-    def __init__(self, collection_name: str):
+    def __init__(self, collection_name: str, config: Optional[CollectionConfig] = None):
         """
         Initialize the VectorStore with a collection name.
         Args:
             collection_name (str) : vector database collection
+            config (Optional[CollectionConfig]) : settings the collection was created with. Defaults to dense retrieval.
         """
         if not isinstance(collection_name, str):
             raise ValueError("collection_name must be a string.")
 
         self.collection_name = collection_name
-        self.client = client
-        self.embeddings = embeddings
+        self.config = config or CollectionConfig()
+        qdrant.connect()
+        self.client = qdrant.client
+        self.async_client = qdrant.async_client
+        self.embeddings = qdrant.embeddings
+        if self.config.storage.dimensions < EMBEDDING_DIMENSIONS:
+            self.embeddings = TruncatedEmbeddings(qdrant.embeddings, self.config.storage.dimensions)
+        self.sparse_embeddings = sparse_embeddings
+        self.retrieval_cache = retrieval_cache
+        # Counts tokens like the chat model, to keep retrieved context within max_context_tokens
+        self.token_counter: Callable[[str], int] = context_token_counter
+
+    @property
+    def hybrid(self) -> bool:
+        return self.config.retrieval_mode == RetrievalMode.HYBRID
 
-    def create_collection(self) -> None:
+    def create_collection(self) -> bool:
         """
-        Create a new collection in the vector store.
+        Create a new collection in the vector store, unless it exists.
+
+        The dense vector follows the collection's storage profile. Hybrid collections also get a sparse
+        BM25 vector; Qdrant applies its IDF weighting at query time.
+        Returns:
+            bool: Whether the collection was created
         """
         if not isinstance(self.collection_name, str):
             raise ValueError("collection_name must be a string.")
 
         if not self.client.collection_exists(self.collection_name):
+            sparse_vectors_config = None
+            if self.hybrid:
+                sparse_vectors_config = {
+                    QdrantVectorStore.SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)
+                }
+            storage = self.config.storage
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(size=3072, distance=Distance.COSINE),
+                vectors_config=VectorParams(size=storage.dimensions, distance=Distance.COSINE, on_disk=storage.on_disk),
+                sparse_vectors_config=sparse_vectors_config,
+                quantization_config=self._quantization_config(),
             )
+            self.retrieval_cache.invalidate(self.collection_name)
+            return True
+        return False
+
+    def collection_mismatches(self) -> list[str]:
+        """
+        Compare the existing Qdrant collection with the retrieval mode and storage profile of the settings.
+        Returns:
+            list[str]: A description of each setting the collection was created with differently
+        """
+        collection = self.client.get_collection(self.collection_name).config
+        vectors = collection.params.vectors
+        if isinstance(vectors, dict):
+            vectors = vectors.get(QdrantVectorStore.VECTOR_NAME)
+        hybrid = QdrantVectorStore.SPARSE_VECTOR_NAME in (collection.params.sparse_vectors or {})
+        quantization = Quantization.NONE
+        if isinstance(collection.quantization_config, ScalarQuantization):
+            quantization = Quantization.INT8
+        elif isinstance(collection.quantization_config, BinaryQuantization):
+            quantization = Quantization.BINARY
+
+        storage = self.config.storage
+        existing = {
+            "dimensions": vectors.size if vectors is not None else None,
+            "retrieval_mode": (RetrievalMode.HYBRID if hybrid else RetrievalMode.DENSE).value,
+            "quantization": quantization.value,
+            "on_disk": bool(vectors.on_disk) if vectors is not None else False,
+        }
+        requested = {
+            "dimensions": storage.dimensions,
+            "retrieval_mode": self.config.retrieval_mode.value,
+            "quantization": storage.quantization.value,
+            "on_disk": storage.on_disk,
+        }
+        return [
+            f"{key} is {existing[key]}, not {requested[key]}" for key in requested if existing[key] != requested[key]
+        ]
+
+    def _quantization_config(self) -> Optional[ScalarQuantization | BinaryQuantization]:
+        # The quantized vectors always stay in RAM, also when the originals are on disk.
+        if self.config.storage.quantization == Quantization.INT8:
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.config.storage.quantization == Quantization.BINARY:
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def _search_params(self) -> Optional[SearchParams]:
+        # Search the quantized vectors for oversampling x k candidates, then rescore them with the originals.
+        if self.config.storage.quantization == Quantization.NONE:
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(rescore=True, oversampling=self.config.storage.oversampling)
+        )
 
     def get_vector_store(self) -> QdrantVectorStore:
         """
@@ -51,6 +241,14 @@ class VectorStore:
         Returns:
             QdrantVectorStore: The vector store for the specified collection.
         """
+        if self.hybrid:
+            return QdrantVectorStore(
+                collection_name=self.collection_name,
+                client=self.client,
+                embedding=self.embeddings,
+                sparse_embedding=self.sparse_embeddings,
+                retrieval_mode=QdrantRetrievalMode.HYBRID,
+            )
         vector_store = QdrantVectorStore(
             collection_name=self.collection_name,
             client=self.client,
@@ -72,8 +270,49 @@ class VectorStore:
         vector_store = self.get_vector_store()
         ids = [str(uuid4()) for _ in range(len(docs))]
         vector_store.add_documents(documents=docs, ids=ids)
+        self.retrieval_cache.invalidate(self.collection_name)
         return ids
 
+    async def aembed_documents(self, docs: list[Document]) -> list[list[float]]:
+        """
+        Asynchronously embed documents without writing them to the vector store.
+        Args:
+            docs (list[Document]): Documents to embed.
+        Returns:
+            list[list[float]]: One embedding per document.
+        """
+        return await self.embeddings.aembed_documents([doc.page_content for doc in docs])
+
+    async def aupsert_documents(self, docs: list[Document], vectors: list[list[float]], ids: list[str]) -> None:
+        """
+        Asynchronously write already embedded documents to the vector store.
+        Args:
+            docs (list[Document]): Documents to write.
+            vectors (list[list[float]]): Embeddings of the documents.
+            ids (list[str]): Point IDs of the documents. Existing points with the same IDs are replaced.
+        """
+        point_vectors: list[dict] = [{QdrantVectorStore.VECTOR_NAME: vector} for vector in vectors]
+        if self.hybrid:
+            sparse_vectors = self.sparse_embeddings.embed_documents([doc.page_content for doc in docs])
+            for point_vector, sparse_vector in zip(point_vectors, sparse_vectors):
+                point_vector[QdrantVectorStore.SPARSE_VECTOR_NAME] = SparseVector(
+                    indices=sparse_vector.indices, values=sparse_vector.values
+                )
+
+        points = [
+            PointStruct(
+                id=doc_id,
+                vector=point_vector,
+                payload={
+                    QdrantVectorStore.CONTENT_KEY: doc.page_content,
+                    QdrantVectorStore.METADATA_KEY: doc.metadata,
+                },
+            )
+            for doc, point_vector, doc_id in zip(docs, point_vectors, ids)
+        ]
+        await self.async_client.upsert(collection_name=self.collection_name, points=points)
+        self.retrieval_cache.invalidate(self.collection_name)
+
     def delete_documents(self, ids: list[str]) -> None:
         """
         Delete documents from the vector store.
@@ -85,34 +324,233 @@ class VectorStore:
 
         vector_store = self.get_vector_store()
         vector_store.delete(ids)
+        self.retrieval_cache.invalidate(self.collection_name)
+
+    async def adelete_documents(self, ids: list[str]) -> None:
+        """
+        Asynchronously delete documents from the vector store in one request.
+        Args:
+            ids (list[str]): List of document IDs to be deleted.
+        """
+        if not ids:
+            return
+        await self.async_client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=ids))
+        self.retrieval_cache.invalidate(self.collection_name)
 
-    def retrieve(self, query: str, k: int = 2) -> Any:
+    async def aget_source_ids(self, source: str, page_size: int = 1000) -> set[str]:
+        """
+        Asynchronously get the IDs of the documents stored from a source file, without their payloads or vectors.
+        Args:
+            source (str): File name recorded as the "source" metadata of the documents.
+            page_size (int, optional): IDs fetched per request. Defaults to 1000.
+        Returns:
+            set[str]: The document IDs.
+        """
+        source_filter = Filter(
+            must=[FieldCondition(key=f"{QdrantVectorStore.METADATA_KEY}.source", match=MatchValue(value=source))]
+        )
+        ids: set[str] = set()
+        offset = None
+        while True:
+            points, offset = await self.async_client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=source_filter,
+                limit=page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    def retrieve(
+        self, query: str, k: int = 2, filter: Optional[Filter] = None, settings: Optional[RetrievalSettings] = None
+    ) -> Any:
         """
         Retrieve documents from the vector store based on a query.
+
+        Query embeddings and search results are served from the retrieval cache when the same search
+        ran recently and the collection has not changed since.
         Args:
             query (str): The query string.
             k (int, optional): The number of documents to retrieve. Defaults to 2.
+            filter (Optional[Filter], optional): Payload conditions the documents must match.
+            settings (Optional[RetrievalSettings], optional): Threshold, MMR and token budget of the
+                                                              search, overriding k.
         Returns:
             Any: The retrieved documents.
         Raises:
             ValueError: If the query is not a string or k is not a positive integer.
         """
+        settings, key, documents = self._cached_search(query, k, filter, settings)
+        if documents is not None:
+            return documents
+
+        query_embedding = self._cached_query_embedding(query)
+        if query_embedding is None:
+            query_embedding = self._cache_query_embedding(query, self.embeddings.embed_query(query))
+
+        result = self.client.query_points(**self._query_arguments(query, query_embedding, settings, filter))
+        return self._cache_search(key, result.points, query_embedding, settings)
+
+    async def aretrieve(
+        self, query: str, k: int = 2, filter: Optional[Filter] = None, settings: Optional[RetrievalSettings] = None
+    ) -> list[Document]:
+        """
+        Asynchronously retrieve documents from the vector store based on a query, through the retrieval cache.
+        Args:
+            query (str): The query string.
+            k (int, optional): The number of documents to retrieve. Defaults to 2.
+            filter (Optional[Filter], optional): Payload conditions the documents must match.
+            settings (Optional[RetrievalSettings], optional): Threshold, MMR and token budget of the
+                                                              search, overriding k.
+        Returns:
+            list[Document]: The retrieved documents.
+        Raises:
+            ValueError: If the query is not a string or k is not a positive integer.
+        """
+        settings, key, documents = self._cached_search(query, k, filter, settings)
+        if documents is not None:
+            return documents
+
+        query_embedding = self._cached_query_embedding(query)
+        if query_embedding is None:
+            query_embedding = self._cache_query_embedding(query, await self.embeddings.aembed_query(query))
+
+        result = await self.async_client.query_points(**self._query_arguments(query, query_embedding, settings, filter))
+        return self._cache_search(key, result.points, query_embedding, settings)
+
+    # The steps of retrieve and aretrieve around their embedding and Qdrant calls, shared by both.
+
+    def _cached_search(
+        self, query: str, k: int, filter: Optional[Filter], settings: Optional[RetrievalSettings]
+    ) -> tuple[RetrievalSettings, Hashable, Optional[list[Document]]]:
+        """Validate a search and look it up in the retrieval cache: its settings, cache key and cached documents."""
         if not isinstance(query, str):
             raise ValueError("query must be a string.")
         if not isinstance(k, int) or k <= 0:
             raise ValueError("k must be a positive integer.")
 
-        vector_store = self.get_vector_store()
-        return vector_store.similarity_search(query, k=k)
+        settings = settings or RetrievalSettings(k=k)
+        key = self.retrieval_cache.results_key(self.collection_name, query, settings, self._filter_key(filter))
+        return settings, key, self.retrieval_cache.get_results(key)
 
-    def content_retriever_tool(self):
+    def _cached_query_embedding(self, query: str) -> Optional[list[float]]:
+        return self.retrieval_cache.embeddings.get(
+            self.retrieval_cache.embedding_key(query, self.config.storage.dimensions)
+        )
+
+    def _cache_query_embedding(self, query: str, query_embedding: list[float]) -> list[float]:
+        key = self.retrieval_cache.embedding_key(query, self.config.storage.dimensions)
+        self.retrieval_cache.embeddings.set(key, query_embedding)
+        return query_embedding
+
+    def _cache_search(
+        self, key: Hashable, points: list, query_embedding: list[float], settings: RetrievalSettings
+    ) -> list[Document]:
+        documents = self._select(points, query_embedding, settings)
+        self.retrieval_cache.set_results(key, documents)
+        return documents
+
+    @staticmethod
+    def _filter_key(filter: Optional[Filter]) -> Optional[str]:
+        return filter.model_dump_json(exclude_none=True) if filter is not None else None
+
+    def _query_arguments(
+        self, query: str, query_embedding: list[float], settings: RetrievalSettings, filter: Optional[Filter] = None
+    ) -> dict:
+        """
+        Build the query_points arguments of a search.
+
+        Dense collections search the embedding directly. Hybrid collections prefetch candidates from
+        the dense and the sparse vectors and fuse both rankings with Reciprocal Rank Fusion. With MMR,
+        fetch_k candidates are fetched with their dense vectors for re-ranking.
+        """
+        limit = max(settings.fetch_k, settings.k) if settings.mmr else settings.k
+        arguments: dict = {
+            "collection_name": self.collection_name,
+            "limit": limit,
+            "with_payload": True,
+            "with_vectors": settings.mmr,
+            "query_filter": filter,
+        }
+        if not self.hybrid:
+            return {
+                **arguments,
+                "query": query_embedding,
+                "search_params": self._search_params(),
+                "score_threshold": settings.score_threshold,
+            }
+
+        sparse_query = self.sparse_embeddings.embed_query(query)
+        prefetch_limit = limit * HYBRID_PREFETCH_MULTIPLIER
+        return {
+            **arguments,
+            "prefetch": [
+                Prefetch(
+                    query=query_embedding,
+                    using=QdrantVectorStore.VECTOR_NAME,
+                    filter=filter,
+                    limit=prefetch_limit,
+                    params=self._search_params(),
+                    score_threshold=settings.score_threshold,
+                ),
+                Prefetch(
+                    query=SparseVector(indices=sparse_query.indices, values=sparse_query.values),
+                    using=QdrantVectorStore.SPARSE_VECTOR_NAME,
+                    filter=filter,
+                    limit=prefetch_limit,
+                ),
+            ],
+            "query": FusionQuery(fusion=Fusion.RRF),
+        }
+
+    def _select(self, points: list, query_embedding: list[float], settings: RetrievalSettings) -> list[Document]:
+        """
+        Turn the points of a search into the documents returned: re-ranked with MMR over their vectors
+        when enabled, cut to k, then to the token budget. The best document is kept regardless of the budget.
+        """
+        if settings.mmr and points:
+            vectors = [
+                point.vector.get(QdrantVectorStore.VECTOR_NAME) if isinstance(point.vector, dict) else point.vector
+                for point in points
+            ]
+            order = maximal_marginal_relevance(query_embedding, np.asarray(vectors), settings.k, settings.mmr_lambda)
+            points = [points[index] for index in order]
+        documents = self._to_documents(points[: settings.k])
+        if settings.max_context_tokens is None:
+            return documents
+
+        within_budget, tokens = [], 0
+        for document in documents:
+            tokens += self.token_counter(document.page_content)
+            if within_budget and tokens > settings.max_context_tokens:
+                break
+            within_budget.append(document)
+        return within_budget
+
+    def _to_documents(self, points: list) -> list[Document]:
+        return [
+            QdrantVectorStore._document_from_point(
+                point,
+                self.collection_name,
+                QdrantVectorStore.CONTENT_KEY,
+                QdrantVectorStore.METADATA_KEY,
+            )
+            for point in points
+        ]
+
+    def content_retriever_tool(self, settings: Optional[RetrievalSettings] = None):
         """
         Create a retriever tool for the vector store.
+        Args:
+            settings (Optional[RetrievalSettings], optional): How the tool searches. Defaults to the
+                                                              collection's retrieval settings.
         Returns:
             Any: The retriever tool.
         """
-        vector_store = self.get_vector_store()
-        retriever = vector_store.as_retriever()
+        retriever = QdrantRetriever(vector_store=self, settings=settings or self.config.retrieval)
         retriever_tool = create_retriever_tool(
             retriever,
             name="query_tool",
@@ -120,3 +558,20 @@ class VectorStore:
         )
 
         return retriever_tool
+
+
+class QdrantRetriever(BaseRetriever):
+    """
+    Retriever over a VectorStore that uses the async Qdrant client when invoked asynchronously.
+    """
+
+    vector_store: VectorStore
+    settings: RetrievalSettings = RetrievalSettings()
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return self.vector_store.retrieve(query, settings=self.settings)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return await self.vector_store.aretrieve(query, settings=self.settings)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Write-behind buffer handing documents to a writer in batches from a background task.
+
+    Callers append documents without waiting for the writer. The background task writes them as
+    soon as batch_size documents are pending, and otherwise every flush_interval seconds. Failed
+    batches are retried on the next flush; beyond max_pending buffered documents the oldest are
+    dropped, so an unavailable store cannot exhaust memory. Stopping flushes whatever is left.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[list[dict]], Awaitable[None]],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        name: str = "documents",
+    ):
+        """
+        Initialize the buffer.
+        Args:
+            writer (Callable[[list[dict]], Awaitable[None]]): Writes a batch of documents
+            batch_size (int): Pending documents that trigger a write, and the maximum per batch
+            flush_interval (float): Seconds a document waits at most before being written
+            max_pending (int): Documents buffered at most while writes fail
+            name (str): What the documents are, for log messages
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = writer
+        self.name = name
+        self._pending: deque = deque(maxlen=max_pending)
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        """Start the background writer."""
+        self._ready = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background writer and write the pending documents."""
+        # Let an in-flight write finish rather than cancelling it, so no popped batch is lost.
+        self._stopping = True
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def append(self, document: dict) -> None:
+        """
+        Buffer a document. Returns immediately.
+        Args:
+            document (dict): The document to write
+        """
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+            logger.warning(f"Buffer of {self.name} is full, dropping the oldest")
+        self._pending.append(document)
+        if len(self._pending) >= self.batch_size:
+            self._ready.set()
+
+    async def flush(self) -> None:
+        """Write all pending documents, batch_size at a time. A failed batch stays pending."""
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                await self.writer(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} {self.name}: {e}")
+                # Documents appended during the write may have filled the buffer; the batch is older, so
+                # its oldest documents make way. extendleft alone would push out the newest instead.
+                overflow = max(len(batch) - (self._pending.maxlen - len(self._pending)), 0)
+                if overflow:
+                    self.dropped += overflow
+                    logger.warning(f"Buffer of {self.name} is full, dropping the oldest {overflow}")
+                self._pending.extendleft(reversed(batch[overflow:]))
+                return
+            self.written += len(batch)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._ready.clear()
+            await self.flush()
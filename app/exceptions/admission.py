@@ -0,0 +1,18 @@
+class AdmissionError(Exception):
+    """Base class for requests turned away by admission control."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(AdmissionError):
+    """Raised when a sender or collection has used up its request rate."""
+
+    pass
+
+
+class TooManyInFlightRequests(AdmissionError):
+    """Raised when a sender already has the maximum number of requests running and queued."""
+
+    pass
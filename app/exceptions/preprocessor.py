@@ -26,3 +26,9 @@ class DocumentSplittingError(DataPreprocessorError):
     """Raised when there is an error in splitting documents."""
 
     pass
+
+
+class FileTooLargeError(DataPreprocessorError):
+    """Raised when an uploaded file exceeds the maximum accepted size."""
+
+    pass
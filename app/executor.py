@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Optional
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+from langchain_core.callbacks import AsyncCallbackManagerForChainRun
+from langchain_core.tools import BaseTool, StructuredTool, Tool
+
+from app.configs import TOOL_THREADS
+
+logger = logging.getLogger(__name__)
+
+# Sync tools run here instead of the event loop's default executor, so they cannot take over its threads.
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+
+
+def is_async_tool(tool: BaseTool) -> bool:
+    """Whether a tool has a native async implementation rather than the default one running _run in a thread."""
+    if isinstance(tool, (Tool, StructuredTool)):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+class ToolTimings:
+    """
+    Per-tool call counters: calls, timeouts, and total and maximum wall time.
+    """
+
+    def __init__(self):
+        self._tools: dict[str, dict] = {}
+        self._lock = Lock()
+
+    def record(self, tool: str, wall_time: float, timed_out: bool) -> None:
+        with self._lock:
+            stats = self._tools.setdefault(tool, {"calls": 0, "timeouts": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["timeouts"] += timed_out
+            stats["total_seconds"] += wall_time
+            stats["max_seconds"] = max(stats["max_seconds"], wall_time)
+
+    def stats(self) -> dict:
+        """
+        Get the tool counters.
+        Returns:
+            dict: calls, timeouts, total_seconds, max_seconds and avg_seconds per tool name
+        """
+        with self._lock:
+            return {
+                tool: {**stats, "avg_seconds": stats["total_seconds"] / stats["calls"]}
+                for tool, stats in self._tools.items()
+            }
+
+
+tool_timings = ToolTimings()
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that runs the tool calls of one agent step concurrently, each with a timeout.
+
+    Run asynchronously, the tool calls the model requests in one step are dispatched together:
+    async tools on the event loop, sync tools on the bounded tool_executor. A tool that exceeds its
+    timeout is abandoned and the model gets the results of the other tools with a note that this
+    one did not answer. Each call's wall time is recorded in tool_timings and emitted to the run's
+    tracers as a "tool_timing" custom event. Synchronous runs execute tools one after another.
+    """
+
+    tool_timeout: Optional[float] = 20.0
+    """Seconds a tool call may take; None waits indefinitely"""
+    tool_timeouts: Dict[str, float] = {}
+    """Timeouts of individual tools by name, overriding tool_timeout"""
+
+    async def _aperform_agent_action(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[AsyncCallbackManagerForChainRun] = None,
+    ) -> AgentStep:
+        tool = name_to_tool_map.get(agent_action.tool)
+        timeout = self.tool_timeouts.get(agent_action.tool, self.tool_timeout)
+        if tool is not None and not is_async_tool(tool):
+            context = contextvars.copy_context()
+            call = asyncio.get_running_loop().run_in_executor(
+                tool_executor,
+                context.run,
+                self._perform_agent_action,
+                name_to_tool_map,
+                color_mapping,
+                agent_action,
+                run_manager.get_sync() if run_manager else None,
+            )
+        else:
+            call = super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            step = await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"Tool {agent_action.tool} timed out after {timeout} seconds")
+            step = AgentStep(
+                action=agent_action,
+                observation=f"The {agent_action.tool} tool did not respond within {timeout} seconds. "
+                "Answer with the other results, and say that this information is unavailable.",
+            )
+        wall_time = time.perf_counter() - start
+
+        tool_timings.record(agent_action.tool, wall_time, timed_out)
+        if run_manager:
+            await run_manager.get_child().on_custom_event(
+                "tool_timing",
+                {"tool": agent_action.tool, "wall_time": wall_time, "timed_out": timed_out},
+            )
+        return step
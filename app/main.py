@@ -1,19 +1,65 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.db.mongodb import mongodb
+from app.configs import WARM_UP
+from app.db.conversation_log import conversation_log
+from app.db.ingestion import ingestion_queue
+from app.db.mongodb import create_indexes, get_mongodb, migrate_conversations, mongodb
+from app.db.qdrant import qdrant
 from app.db.redis import redis
 from app.routes import knowledgebases, queries
+from app.tools.weather_tool import weather_client
+from app.tracing import trace_exporter
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """
+    Import the agent with its langchain, OpenAI and Qdrant dependencies, and create the chat model,
+    the Qdrant clients and, in "mlflow" tracing mode, MLflow autologging ahead of the first query.
+
+    Runs in a thread once the service is up, so /health answers while this loads. A query arriving
+    earlier does whatever is still missing itself.
+    """
+    from app import agent
+
+    qdrant.connect()
+    agent.get_llm()
+    agent.configure_tracing()
+
+
+async def run_warm_up() -> None:
+    try:
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        logger.warning(f"Warm-up failed, clients will be created on first use: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await mongodb.connect()
+    await create_indexes(await get_mongodb())
+    if moved := await migrate_conversations(await get_mongodb()):
+        logger.info(f"Moved {moved} conversation turns to conversation_turns")
     await redis.connect()
+    await ingestion_queue.start()
+    await conversation_log.start()
+    await trace_exporter.start()
+    warm_up_task = asyncio.create_task(run_warm_up()) if WARM_UP else None
     yield
+    if warm_up_task is not None:
+        await warm_up_task
+    await conversation_log.stop()
+    await trace_exporter.stop()
+    await ingestion_queue.stop()
     await mongodb.close()
     await redis.close()
+    await qdrant.close()
+    await weather_client.aclose()
 
 
 app = FastAPI(lifespan=lifespan)
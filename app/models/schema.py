@@ -1,6 +1,11 @@
+from enum import Enum
+from typing import Optional
+
 from langchain_core.documents import Document
 from pydantic import BaseModel, Field
 
+from app.configs import EMBEDDING_DIMENSIONS
+
 
 class Query(BaseModel):
     query: str = Field(
@@ -36,3 +41,72 @@ class GetCurrentWeatherCheckInput(BaseModel):
         ...,
         description="The name of the location name for which we need to find the weather",
     )
+
+
+class RetrievalMode(str, Enum):
+    DENSE = "dense"
+    HYBRID = "hybrid"
+
+
+class Quantization(str, Enum):
+    NONE = "none"
+    INT8 = "int8"
+    BINARY = "binary"
+
+
+class StorageProfile(BaseModel):
+    dimensions: int = Field(
+        EMBEDDING_DIMENSIONS,
+        gt=0,
+        le=EMBEDDING_DIMENSIONS,
+        description="Leading (Matryoshka) dimensions of the embedding to store, e.g. 256 or 1024",
+    )
+    quantization: Quantization = Field(
+        Quantization.NONE,
+        description="Compressed copy of the vectors kept in RAM for search: int8 (4x smaller) or binary (32x smaller)",
+    )
+    oversampling: float = Field(
+        2.0,
+        ge=1.0,
+        description="Candidates searched per result in the quantized index, then rescored with the original vectors",
+    )
+    on_disk: bool = Field(
+        False,
+        description="Keep the original vectors on disk; with quantization, only the quantized index stays in RAM",
+    )
+
+
+class RetrievalSettings(BaseModel):
+    k: int = Field(4, gt=0, description="Chunks the retriever tool returns at most")
+    score_threshold: Optional[float] = Field(
+        None,
+        description="Minimum cosine similarity of a chunk to the query; hybrid collections apply it to dense hits",
+    )
+    mmr: bool = Field(
+        False,
+        description="Re-rank the fetch_k best candidates with Maximal Marginal Relevance, so near-duplicates give way",
+    )
+    mmr_lambda: float = Field(
+        0.5, ge=0.0, le=1.0, description="MMR trade-off between relevance (1.0) and diversity (0.0)"
+    )
+    fetch_k: int = Field(20, gt=0, description="Candidates fetched for MMR re-ranking")
+    max_context_tokens: Optional[int] = Field(
+        None,
+        gt=0,
+        description="Token budget of the returned chunks; lower-ranked chunks beyond it are left out",
+    )
+
+
+class CollectionConfig(BaseModel):
+    retrieval_mode: RetrievalMode = Field(
+        RetrievalMode.DENSE,
+        description="dense: embedding similarity only. hybrid: embedding and BM25 keyword scores fused with RRF",
+    )
+    storage: StorageProfile = Field(
+        default_factory=StorageProfile,
+        description="How the dense vectors are stored",
+    )
+    retrieval: RetrievalSettings = Field(
+        default_factory=RetrievalSettings,
+        description="How the retriever tool searches the collection",
+    )
@@ -1,32 +1,132 @@
+import asyncio
 import os
+import shutil
+from typing import Optional
+from uuid import uuid4
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from pydantic import ValidationError
 
-from app.db.data_handler import DataPreprocessor
-from app.db.mongodb import add_uploaded_docs_to_db, delete_docs_from_db, get_mongodb
-from app.db.vector_store import VectorStore
-from app.models.schema import DocIds
+from app.cache.retrieval import retrieval_cache
+from app.cache.semantic import semantic_cache
+from app.configs import (
+    EMBEDDING_DIMENSIONS,
+    MAX_BULK_UPLOAD_SIZE,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_DIR,
+)
+from app.db.data_handler import DataPreprocessor, save_bulk_upload, save_upload
+from app.db.ingestion import ingestion_queue
+from app.db.mongodb import (
+    add_collection_config_to_db,
+    add_ingestion_job_to_db,
+    delete_docs_from_db,
+    get_ingestion_job,
+    get_mongodb,
+    update_collection_retrieval_settings_in_db,
+)
+from app.db.qdrant import qdrant
+from app.db.redis import get_redis
+from app.exceptions.preprocessor import FileTooLargeError
+from app.models.schema import (
+    CollectionConfig,
+    DocIds,
+    Quantization,
+    RetrievalMode,
+    RetrievalSettings,
+    StorageProfile,
+)
 
 router = APIRouter()
 
-UPLOAD_DIR = "upload"
+# VectorStore and the agent registry are imported by the handlers using them, see warm_up in app/main.py.
 
 
 @router.post("/create_collection")
-def create_collection(collection_name: str) -> dict:
+async def create_collection(
+    collection_name: str,
+    retrieval_mode: RetrievalMode = RetrievalMode.DENSE,
+    dimensions: int = EMBEDDING_DIMENSIONS,
+    quantization: Quantization = Quantization.NONE,
+    oversampling: float = 2.0,
+    on_disk: bool = False,
+    retrieval: Optional[RetrievalSettings] = None,
+) -> dict:
     """
-    Creates a new Qdrant collection.
+    Creates a new Qdrant collection. Creating an existing collection again with the same retrieval mode
+    and storage profile succeeds and keeps its recorded settings; other settings are rejected with 409.
 
     Args:
         collection_name (str): The name of the collection to create.
+        retrieval_mode (RetrievalMode): "dense" for embedding search, or "hybrid" to also store BM25
+                                        keyword vectors and fuse both rankings at query time.
+        dimensions (int): Leading embedding dimensions to store, e.g. 256 or 1024 instead of all of them.
+        quantization (Quantization): "int8" or "binary" to search a compressed in-RAM copy of the vectors.
+        oversampling (float): Candidates per result searched in the quantized vectors before rescoring.
+        on_disk (bool): Keep the original vectors on disk instead of in RAM.
+        retrieval (Optional[RetrievalSettings]): How the retriever tool searches the collection: k,
+                                                 score threshold, MMR and context token budget.
 
     Returns:
-        dict: A dictionary containing a success message.
+        dict: A dictionary containing a success message and the settings in effect for the collection.
+    """
+
+    try:
+        storage = StorageProfile(
+            dimensions=dimensions, quantization=quantization, oversampling=oversampling, on_disk=on_disk
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    from app.agent import invalidate_agent
+    from app.db.vector_store import VectorStore
+
+    requested = CollectionConfig(
+        retrieval_mode=retrieval_mode, storage=storage, retrieval=retrieval or RetrievalSettings()
+    )
+    vector_store = VectorStore(collection_name, requested)
+    created = await asyncio.to_thread(vector_store.create_collection)
+    if not created:
+        # Settings are only recorded as the Qdrant collection really is, e.g. for collections created before them.
+        mismatches = await asyncio.to_thread(vector_store.collection_mismatches)
+        if mismatches:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Collection {collection_name} already exists with other settings: {'; '.join(mismatches)}",
+            )
+
+    db = await get_mongodb()
+    config = await add_collection_config_to_db(db, collection_name, requested, replace=created)
+    invalidate_agent(collection_name)
+    return {
+        "message": f"{collection_name} collection {'created successfully' if created else 'already exists'}!",
+        **config.model_dump(mode="json"),
+    }
+
+
+@router.post("/retrieval_settings")
+async def update_retrieval_settings(collection_name: str, settings: RetrievalSettings) -> dict:
     """
+    Changes how the retriever tool searches a collection. The collection's agent is rebuilt on its next query,
+    in other workers within AGENT_CONFIG_CHECK_INTERVAL seconds.
+
+    Args:
+        collection_name (str): The name of the collection.
+        settings (RetrievalSettings): k, score threshold, MMR and context token budget of the retriever tool.
 
-    vector_store = VectorStore(collection_name)
-    vector_store.create_collection()
-    return {"message": f"{collection_name} collection created successfully!"}
+    Returns:
+        dict: A dictionary containing a success message and the settings in effect for the collection.
+    """
+
+    from app.agent import invalidate_agent
+
+    db = await get_mongodb()
+    config = await update_collection_retrieval_settings_in_db(db, collection_name, settings)
+    invalidate_agent(collection_name)
+    return {
+        "message": f"Retrieval settings of {collection_name} updated successfully!",
+        **config.model_dump(mode="json"),
+    }
 
 
 @router.post("/upload_docs")
@@ -35,56 +135,152 @@ async def upload_docs(
     collection_name: str = Form(...),
     chunk_size: int = Form(1000),
     chunk_overlap: int = Form(50),
+    upsert_by_source: bool = Form(False),
 ) -> dict:
     """
-    Uploads preprocessed data with embeddings to a Qdrant collection.
+    Queues an uploaded file for ingestion into a Qdrant collection.
 
     Args:
         file (UploadFile): The uploaded file containing data.
         collection_name (str): The name of the Qdrant collection to upload the data to.
         chunk_size (int): The size of chunks to break the data into.
         chunk_overlap (int): The overlap between chunks.
+        upsert_by_source (bool): Replace earlier uploads of the same file name, embedding only the
+                                 chunks that changed and deleting those no longer in the file.
 
     Returns:
-        dict: A dictionary containing the upload status message.
+        dict: A dictionary containing the ingestion job ID, to be polled at /knowledgebases/jobs/{job_id}.
     """
 
     filename = file.filename
-    content = await file.read()
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in DataPreprocessor.SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file format: {filename}")
+    if file.size is not None and file.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_SIZE} bytes")
 
-    # Save the uploaded file temporarily
+    # Keep the upload until the job has processed it, so an interrupted job can resume.
+    # The stored name is derived from the job ID, so concurrent uploads of the same file never collide.
+    job_id = str(uuid4())
     os.makedirs(UPLOAD_DIR, exist_ok=True)
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    file_path = os.path.join(UPLOAD_DIR, f"{job_id}{extension}")
 
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        await asyncio.to_thread(save_upload, file.file, file_path, MAX_UPLOAD_SIZE)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        # Process the file to generate document chunks
-        preprocessor = DataPreprocessor(UPLOAD_DIR, filename, chunk_size, chunk_overlap)
-        docs = preprocessor.preprocess()
+    try:
+        db = await get_mongodb()
+        await add_ingestion_job_to_db(
+            db, job_id, collection_name, filename, file_path, chunk_size, chunk_overlap, upsert_by_source
+        )
+        await ingestion_queue.submit(job_id)
+        return {"job_id": job_id, "status": "queued"}
 
-        if docs is None:
-            raise HTTPException(status_code=400, detail="Invalid file format")
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=500, detail=f"Document upload failed: {str(e)}")
 
-        # Upload the processed data to Qdrant
-        vector_store = VectorStore(collection_name)
-        doc_ids = vector_store.add_documents(docs)
 
-        # Save metadata in MongoDB
-        db = await get_mongodb()
-        await add_uploaded_docs_to_db(db, collection_name, filename, doc_ids)  # type: ignore
+@router.post("/upload_docs_bulk")
+async def upload_docs_bulk(
+    files: list[UploadFile] = File(...),
+    collection_name: str = Form(...),
+    chunk_size: int = Form(1000),
+    chunk_overlap: int = Form(50),
+) -> dict:
+    """
+    Queues many uploaded files, or zip and tar archives of them, for ingestion into a Qdrant collection as one job.
+
+    Args:
+        files (list[UploadFile]): The uploaded files and archives.
+        collection_name (str): The name of the Qdrant collection to upload the data to.
+        chunk_size (int): The size of chunks to break the data into.
+        chunk_overlap (int): The overlap between chunks.
+
+    Returns:
+        dict: A dictionary containing the ingestion job ID, to be polled at /knowledgebases/jobs/{job_id},
+              and the filename, status ("queued" or "rejected") and error of each file and archive member.
+    """
 
-        # Remove the temporary file after successful processing
-        os.remove(file_path)
-        return {"message": "Embeddings uploaded successfully!"}
+    job_id = str(uuid4())
+    directory = os.path.join(UPLOAD_DIR, job_id)
+    os.makedirs(directory, exist_ok=True)
 
+    try:
+        entries = await asyncio.to_thread(
+            save_bulk_upload,
+            [(file.filename or "", file.file) for file in files],
+            directory,
+            MAX_BULK_UPLOAD_SIZE,
+            DataPreprocessor.SUPPORTED_EXTENSIONS,
+        )
+    except FileTooLargeError:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(
+            status_code=413, detail=f"Files exceed the maximum bulk upload size of {MAX_BULK_UPLOAD_SIZE} bytes"
+        )
     except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(status_code=500, detail=f"Document upload failed: {str(e)}")
+
+    results = [{"filename": entry["filename"], "status": entry["status"], "error": entry["error"]} for entry in entries]
+    queued = sum(entry["status"] == "queued" for entry in entries)
+    if not queued:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise HTTPException(status_code=400, detail={"message": "No supported files uploaded", "files": results})
+
+    try:
+        db = await get_mongodb()
+        await add_ingestion_job_to_db(
+            db, job_id, collection_name, f"{queued} files", directory, chunk_size, chunk_overlap, files=entries
+        )
+        await ingestion_queue.submit(job_id)
+        return {"job_id": job_id, "status": "queued", "files": results}
+
+    except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Document upload failed: {str(e)}")
 
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """
+    Reports the status and progress of an ingestion job.
+
+    Args:
+        job_id (str): The ingestion job ID returned by /knowledgebases/upload_docs.
+
+    Returns:
+        dict: A dictionary containing the job status and its chunks_parsed, chunks_embedded
+              and chunks_upserted progress counters, and for upsert_by_source jobs chunks_unchanged
+              and chunks_deleted. Bulk jobs also list the filename, status, chunks and error of each file.
+    """
+
+    db = await get_mongodb()
+    job = await get_ingestion_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+
+    return {
+        "job_id": job["_id"],
+        "collection_name": job["collection_name"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "files": (
+            [{key: file.get(key) for key in ("filename", "status", "chunks", "error")} for file in job["files"]]
+            if job.get("files") is not None
+            else None
+        ),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
 @router.delete("/delete_docs")
 async def delete_docs(collection_name: str, ids: DocIds) -> dict:
     """
@@ -98,15 +294,45 @@ async def delete_docs(collection_name: str, ids: DocIds) -> dict:
         dict: A dictionary containing a success message.
     """
 
+    from app.agent import invalidate_agent
+    from app.db.vector_store import VectorStore
+
     try:
         # Delete documents from Qdrant
         vector_store = VectorStore(collection_name)
-        vector_store.delete_documents(ids)
+        await vector_store.adelete_documents(ids.ids)
+        invalidate_agent(collection_name)
+        await semantic_cache.invalidate(await get_redis(), collection_name)
 
         # Remove metadata from MongoDB
         db = await get_mongodb()
-        result = await delete_docs_from_db(db, collection_name, ids)
+        result = await delete_docs_from_db(db, collection_name, ids.ids)  # type: ignore
         return result
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Document deletion failed: {str(e)}")
+
+
+@router.get("/embedding_cache")
+def embedding_cache_stats() -> dict:
+    """
+    Returns the embedding cache counters.
+
+    Returns:
+        dict: A dictionary containing hits, misses, hit rate and bytes saved, or a message when caching is disabled.
+    """
+    embedding_cache = qdrant.connect().embedding_cache
+    if embedding_cache is None:
+        return {"message": "Embedding cache is disabled"}
+    return embedding_cache.stats()
+
+
+@router.get("/retrieval_cache")
+def retrieval_cache_stats() -> dict:
+    """
+    Returns the counters of the query embedding and search result caches of this worker.
+
+    Returns:
+        dict: Size, hits, misses, evictions and hit rate of the "embeddings" and "results" levels.
+    """
+    return retrieval_cache.stats()
@@ -1,15 +1,27 @@
+import json
 import logging
+import math
 from datetime import datetime
+from typing import AsyncIterator, Optional
 
+from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi import Query as QueryParam
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
-from app.agent import ask_agent
-from app.db.mongodb import add_conversation_to_db, get_mongodb
+from app.admission import admission
+from app.db.conversation_log import conversation_log
+from app.db.conversation_tracker import finish_turn, start_turn
+from app.db.mongodb import get_conversation_history_from_db, get_mongodb
 from app.db.redis import get_redis
+from app.exceptions.admission import AdmissionError
 from app.models.schema import Query
 
 router = APIRouter()
 
+# The agent modules are imported by the handlers using them, see warm_up in app/main.py.
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -29,38 +41,214 @@ async def ask(
         collection_name (str): The collection name for the agent to use.
 
     Returns:
-        dict: A dictionary containing the agent's response.
+        dict: A dictionary containing the agent's response and whether it was served from the cache.
     """
+    from app.agent import ask_agent_cached
+
     try:
-        conversation_key = f"conversation_tracker:{sender_id}:{collection_name}"
-        conversation_data = await redis.hgetall(conversation_key)
+        async with admission.admitted(redis, sender_id, collection_name):
+            await start_turn(redis, sender_id, collection_name)
 
-        if not conversation_data:
-            conversation_data = {
-                "message_count": 1,
-                "last_interaction": datetime.utcnow().isoformat(),
-                "status": "ongoing",
-            }
-            await redis.hset(conversation_key, mapping=conversation_data)
-            await redis.expire(conversation_key, 900)
-        else:
-            conversation_data["message_count"] = int(conversation_data.get("message_count", 0)) + 1
-            conversation_data["last_interaction"] = datetime.utcnow().isoformat()
-            await redis.hset(conversation_key, mapping=conversation_data)
-            await redis.expire(conversation_key, 900)
+            response, cache_hit = await ask_agent_cached(redis, query, sender_id, collection_name)
 
-        response = ask_agent(query, sender_id, collection_name)
+            conversation_log.add(sender_id, collection_name, query, response)
 
-        db = await get_mongodb()
+            await finish_turn(redis, sender_id, collection_name, response)
 
-        await add_conversation_to_db(db, sender_id, collection_name, query, response)  # type: ignore
+        return {"response": response, "cache_hit": cache_hit}
+    except AdmissionError as e:
+        raise too_many_requests(e)
+    except Exception as e:
+        logger.error(f"Error in ask endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        conversation_data.update({"last_response": response, "status": "responded"})
 
-        await redis.hset(conversation_key, mapping=conversation_data)
-        await redis.expire(conversation_key, 900)
+@router.post("/ask_stream")
+async def ask_stream(
+    query: Query,
+    sender_id: str,
+    collection_name: str,
+    redis=Depends(get_redis),
+) -> StreamingResponse:
+    """
+    Handles queries and streams the agent's progress as Server-Sent Events.
 
-        return {"response": response}
+    Args:
+        query (Query): The query object containing the user's query.
+        collection_name (str): The collection name for the agent to use.
+
+    Returns:
+        StreamingResponse: An event stream of "token", "tool_start", "tool_end" and "tool_timing" events,
+                           terminated by an "end" event with the full response and cache_hit flag,
+                           or an "error" event.
+    """
+    from app.agent import astream_agent, lookup_cached_answer, store_answer
+
+    try:
+        await admission.admit(redis, sender_id, collection_name)
+    except AdmissionError as e:
+        raise too_many_requests(e)
+    try:
+        await start_turn(redis, sender_id, collection_name)
     except Exception as e:
-        logger.error(f"Error in ask endpoint: {e}")
+        admission.release(sender_id)
+        logger.error(f"Error in ask_stream endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+    released = False
+
+    def release() -> None:
+        # Called when the stream ends and again after the response; only the first call frees the slot.
+        nonlocal released
+        if not released:
+            released = True
+            admission.release(sender_id)
+
+    async def event_stream() -> AsyncIterator[str]:
+        # The sender's slot is held until the stream ends or the client disconnects.
+        try:
+            cached_response, query_embedding = await lookup_cached_answer(redis, query, sender_id, collection_name)
+            if cached_response is not None:
+                events = cached_events(cached_response)
+            else:
+                events = astream_agent(query, sender_id, collection_name)
+
+            async for event in events:
+                if event["event"] == "end":
+                    event["data"]["cache_hit"] = cached_response is not None
+                yield format_sse(event["event"], event["data"])
+                if event["event"] == "end":
+                    response = event["data"]["response"]
+                    if cached_response is None:
+                        await store_answer(redis, query, collection_name, query_embedding, response)
+                    conversation_log.add(sender_id, collection_name, query, response)
+                    await finish_turn(redis, sender_id, collection_name, response)
+        except Exception as e:
+            logger.error(f"Error in ask_stream endpoint: {e}")
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            release()
+
+    # The background task also runs when the client disconnects before the stream starts.
+    return StreamingResponse(event_stream(), media_type="text/event-stream", background=BackgroundTask(release))
+
+
+@router.get("/history")
+async def history(
+    sender_id: str,
+    collection_name: str,
+    limit: int = QueryParam(20, ge=1, le=100),
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+) -> dict:
+    """
+    Returns a page of a sender's conversation turns with a collection, newest first.
+
+    Args:
+        sender_id (str): The sender whose conversation is returned.
+        collection_name (str): The collection the conversation was held with.
+        limit (int): The maximum number of turns per page.
+        before (Optional[datetime]): Returns turns older than this; pass next_before of the previous page.
+        before_id (Optional[str]): Pass next_before_id of the previous page along with next_before, so
+                                   turns sharing its timestamp are continued rather than skipped.
+
+    Returns:
+        dict: A dictionary containing the turns and next_before and next_before_id, the cursor of the
+              next page (None on the last page). Turns written in the last second may not be listed yet.
+    """
+    if before_id is not None and not ObjectId.is_valid(before_id):
+        raise HTTPException(status_code=422, detail=f"Invalid before_id: {before_id}")
+
+    db = await get_mongodb()
+    turns = await get_conversation_history_from_db(
+        db, sender_id, collection_name, limit, before, ObjectId(before_id) if before_id is not None else None
+    )
+    last = turns[-1] if len(turns) == limit else None
+    return {
+        "turns": [{key: value for key, value in turn.items() if key != "_id"} for turn in turns],
+        "next_before": last["timestamp"] if last else None,
+        "next_before_id": str(last["_id"]) if last else None,
+    }
+
+
+@router.get("/agent_registry")
+def agent_registry_stats() -> dict:
+    """
+    Returns the agent registry counters used to size AGENT_REGISTRY_SIZE.
+
+    Returns:
+        dict: A dictionary containing size, hits, misses and evictions of the registry.
+    """
+    from app.agent import agent_registry
+
+    return agent_registry.stats()
+
+
+@router.get("/tool_timings")
+def tool_timings_stats() -> dict:
+    """
+    Returns the wall time and timeout counters of the agent tools.
+
+    Returns:
+        dict: A dictionary of calls, timeouts and total, average and maximum seconds per tool.
+    """
+    from app.executor import tool_timings
+
+    return tool_timings.stats()
+
+
+@router.get("/history_compaction")
+def history_compaction_stats() -> dict:
+    """
+    Returns the chat history compaction counters.
+
+    Returns:
+        dict: A dictionary containing the number of turns, how many were compacted, and the history
+              prompt tokens before and after compaction, in total and saved per turn.
+    """
+    from app.agent import history_compactor
+
+    return history_compactor.stats()
+
+
+def too_many_requests(error: AdmissionError) -> HTTPException:
+    """
+    Builds the 429 response for a request turned away by admission control.
+
+    Args:
+        error (AdmissionError): The rejection
+
+    Returns:
+        HTTPException: A 429 error with a Retry-After header in whole seconds
+    """
+    logger.warning(f"Rejected request: {error}")
+    return HTTPException(
+        status_code=429, detail=str(error), headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
+
+async def cached_events(response: str) -> AsyncIterator[dict]:
+    """
+    Yields a cached response as the terminal event of an agent stream.
+
+    Args:
+        response (str): The cached response
+
+    Yields:
+        dict: A single "end" event
+    """
+    yield {"event": "end", "data": {"response": response}}
+
+
+def format_sse(event: str, data) -> str:
+    """
+    Formats an event as a Server-Sent Events message.
+
+    Args:
+        event (str): Event name
+        data: JSON serializable event payload
+
+    Returns:
+        str: The SSE message
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.admission import SenderConcurrencyLimiter, SingleFlight, coalescing_key
+from app.exceptions.admission import TooManyInFlightRequests
+from app.models.schema import Query
+
+
+def test_sender_limiter_queues_then_rejects_and_forgets_idle_senders():
+    async def scenario():
+        limiter = SenderConcurrencyLimiter(max_in_flight=1, max_queued=1, queue_timeout=1)
+        await limiter.acquire("alice")
+        queued = asyncio.create_task(limiter.acquire("alice"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(TooManyInFlightRequests):
+            await limiter.acquire("alice")
+        await limiter.acquire("bob")
+
+        limiter.release("alice")
+        await queued
+        limiter.release("alice")
+        limiter.release("bob")
+        assert limiter._senders == {}
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_shares_one_execution():
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "42"
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do(("docs", "q"), answer) for _ in range(3)])
+        assert calls == [1] and len(flight) == 0
+        assert [result for result, _ in results] == ["42"] * 3
+        assert [shared for _, shared in results] == [False, True, True]
+
+    asyncio.run(scenario())
+
+
+def test_coalescing_key_keeps_senders_apart():
+    assert coalescing_key("docs", "alice", "What is  the refund policy?") == coalescing_key(
+        "docs", "alice", "what is the refund policy?"
+    )
+    assert coalescing_key("docs", "alice", "refunds?") != coalescing_key("docs", "bob", "refunds?")
+
+
+def test_stream_slot_is_released_when_the_client_leaves_before_the_stream_starts(monkeypatch):
+    from app.routes import queries
+
+    async def start_turn(redis, sender_id, collection_name):
+        return 1
+
+    monkeypatch.setattr(queries, "start_turn", start_turn)
+
+    async def scenario():
+        response = await queries.ask_stream(Query(query="hello"), "alice", "docs", redis=None)
+        assert queries.admission.concurrency._senders["alice"]["running"] == 1
+        # Starlette runs the background task after a disconnect even if the body was never iterated.
+        await response.background()
+        await response.background()
+        assert "alice" not in queries.admission.concurrency._senders
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.compaction import HistoryCompactor
+
+
+def conversation(turns: int) -> list:
+    messages = []
+    for turn in range(turns):
+        messages += [HumanMessage(f"question {turn} " * 20), AIMessage(f"answer {turn} " * 20)]
+    return messages
+
+
+def test_compaction_keeps_recent_turns_and_summarizes_incrementally():
+    requests = []
+
+    def summarize(messages):
+        requests.append(messages[-1].content)
+        return AIMessage(f"summary of turns 0-{len(requests)}")
+
+    compactor = HistoryCompactor(RunnableLambda(summarize), keep_turns=2, token_budget=10000)
+
+    compacted = asyncio.run(compactor.acompact("alice", conversation(4)))
+    assert compacted[0] == SystemMessage("Summary of the earlier conversation: summary of turns 0-1")
+    assert compacted[1:] == conversation(4)[4:]
+
+    # The next turn only folds the turn that left the verbatim window.
+    compacted = asyncio.run(compactor.acompact("alice", conversation(5)))
+    assert compacted[0].content.endswith("summary of turns 0-2")
+    assert compacted[1:] == conversation(5)[6:]
+    assert "question 1" in requests[0] and "question 2" not in requests[0]
+    assert "question 2" in requests[1] and "question 1" not in requests[1]
+
+    stats = compactor.stats()
+    assert stats["compacted_turns"] == 2 and stats["prompt_tokens_saved"] > 0
+
+
+def test_compaction_folds_verbatim_turns_over_budget():
+    compactor = HistoryCompactor(FakeListChatModel(responses=["short"]), keep_turns=3, token_budget=150)
+
+    compacted = asyncio.run(compactor.acompact("alice", conversation(3)))
+    assert compactor.count_tokens(compacted) <= 150
+    assert compacted[-2:] == conversation(3)[-2:]
+
+
+def test_summarizer_runs_with_the_agent_run_config():
+    tags = []
+
+    def summarize(messages, config):
+        tags.append(config.get("tags"))
+        return AIMessage("summary")
+
+    compactor = HistoryCompactor(RunnableLambda(summarize), keep_turns=1, token_budget=10000)
+    config = {"configurable": {"session_id": "alice"}, "tags": ["agent-turn"]}
+
+    inputs = asyncio.run(compactor.acompact_input({"chat_history": conversation(2)}, config))
+    assert inputs["chat_history"][0].content.endswith("summary")
+    assert tags == [["agent-turn"]]
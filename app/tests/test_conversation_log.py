@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.db.conversation_log import ConversationLog
+from app.db.mongodb import (
+    COLLECTION_CONVERSATIONS,
+    add_conversation_turns_to_db,
+    conversation_turn,
+    get_conversation_history_from_db,
+    migrate_conversations,
+)
+from app.models.schema import Query
+
+
+def test_conversation_log_writes_full_batches_and_flushes_on_stop():
+    batches = []
+
+    async def writer(turns):
+        batches.append([turn["query"]["query"] for turn in turns])
+
+    async def scenario():
+        log = ConversationLog(batch_size=2, flush_interval=60, writer=writer)
+        await log.start()
+        for turn in range(3):
+            log.add("alice", "docs", Query(query=f"q{turn}"), f"a{turn}")
+            await asyncio.sleep(0.01)
+        assert batches == [["q0", "q1"]]
+
+        await log.stop()
+        assert batches == [["q0", "q1"], ["q2"]]
+
+    asyncio.run(scenario())
+
+
+def test_conversation_log_retries_failed_batches():
+    attempts = []
+
+    async def writer(turns):
+        attempts.append(len(turns))
+        if len(attempts) == 1:
+            raise ConnectionError("mongodb unavailable")
+
+    async def scenario():
+        log = ConversationLog(batch_size=10, writer=writer)
+        log.add("alice", "docs", Query(query="q"), "a")
+        await log.flush()
+        await log.flush()
+        assert attempts == [1, 1] and log.written == 1
+
+    asyncio.run(scenario())
+
+
+def test_history_pages_through_turns_sharing_a_timestamp():
+    db = AsyncMongoMockClient()["test"]
+    now = datetime(2026, 1, 1)
+    turns = [conversation_turn("alice", "docs", Query(query=f"q{i}"), f"a{i}") for i in range(5)]
+    for turn in turns:
+        turn["timestamp"] = now
+
+    async def scenario():
+        await add_conversation_turns_to_db(db, turns)
+        seen, before, before_id = [], None, None
+        while True:
+            page = await get_conversation_history_from_db(db, "alice", "docs", 2, before, before_id)
+            seen += [turn["query"]["query"] for turn in page]
+            if len(page) < 2:
+                return seen
+            before, before_id = page[-1]["timestamp"], page[-1]["_id"]
+
+    assert asyncio.run(scenario()) == ["q4", "q3", "q2", "q1", "q0"]
+
+
+def test_old_conversation_documents_are_moved_to_turns():
+    db = AsyncMongoMockClient()["test"]
+    entries = [
+        {"query": {"query": f"q{i}"}, "response": f"a{i}", "timestamp": datetime(2026, 1, 1, i)} for i in range(3)
+    ]
+
+    async def scenario():
+        await db[COLLECTION_CONVERSATIONS].insert_one(
+            {"sender_id": "alice", "collection_name": "docs", "conversations": entries}
+        )
+        assert await migrate_conversations(db) == 3
+        assert await migrate_conversations(db) == 0
+        return await get_conversation_history_from_db(db, "alice", "docs")
+
+    assert [turn["response"] for turn in asyncio.run(scenario())] == ["a2", "a1", "a0"]
+
+
+def test_full_buffer_drops_the_oldest_turns_of_a_failed_batch():
+    async def writer(turns):
+        # Newer turns arrive while the write is in flight, then it fails.
+        for turn in range(3, 6):
+            log.add("alice", "docs", Query(query=f"q{turn}"), f"a{turn}")
+        raise ConnectionError("mongodb unavailable")
+
+    log = ConversationLog(batch_size=3, max_pending=4, writer=writer)
+    for turn in range(3):
+        log.add("alice", "docs", Query(query=f"q{turn}"), f"a{turn}")
+
+    asyncio.run(log.flush())
+    assert [turn["query"]["query"] for turn in log._pending] == ["q2", "q3", "q4", "q5"]
+    assert log.dropped == 2
@@ -0,0 +1,16 @@
+import asyncio
+
+from app.db.conversation_tracker import start_turn, tracker_key
+from benchmarks.fakes import LatencyRedis
+
+
+def test_concurrent_turns_of_a_sender_are_all_counted():
+    redis = LatencyRedis(latency=0)
+
+    async def scenario():
+        return await asyncio.gather(*[start_turn(redis, "alice", "docs") for _ in range(50)])
+
+    # Each pipeline yields for its round trip, so a read-modify-write counter would lose increments here.
+    assert sorted(asyncio.run(scenario())) == list(range(1, 51))
+    assert redis.hashes[tracker_key("alice", "docs")]["message_count"] == "50"
+    assert redis.round_trips == 50
@@ -0,0 +1,50 @@
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.cache.embeddings import SQLiteByteStore, cache_embeddings, create_byte_store
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_embedding_cache_embeds_only_new_chunks(tmp_path):
+    underlying = CountingEmbeddings(size=8)
+    embeddings, store = cache_embeddings(underlying, SQLiteByteStore(str(tmp_path / "cache.sqlite3")), "model")
+
+    first = embeddings.embed_documents(["a", "b"])
+    second = embeddings.embed_documents(["a", "b", "c"])
+    query = embeddings.embed_query("a")
+
+    assert underlying.calls == 3
+    # Cached vectors round-trip through float32, which is what the OpenAI API returns.
+    assert np.allclose(second[:2], first)
+    assert np.allclose(query, first[0])
+    stats = store.stats()
+    assert stats["hits"] == 3
+    assert stats["bytes_saved"] == 3 * 8 * 4
+
+
+def test_embedding_cache_is_namespaced_by_model(tmp_path):
+    store = SQLiteByteStore(str(tmp_path / "cache.sqlite3"))
+    underlying = CountingEmbeddings(size=8)
+    small, _ = cache_embeddings(underlying, store, "small")
+    large, _ = cache_embeddings(underlying, store, "large")
+
+    small.embed_documents(["a"])
+    large.embed_documents(["a"])
+
+    assert underlying.calls == 2
+
+
+def test_redis_backend_is_available():
+    store = create_byte_store("redis", "", "redis://localhost:6379")
+    assert store.namespace == "embedding_cache"
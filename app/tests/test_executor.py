@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
+
+from app.executor import ParallelAgentExecutor, is_async_tool
+
+
+def sleeper(name: str, seconds: float, use_async: bool) -> StructuredTool:
+    def run(query: str) -> str:
+        time.sleep(seconds)
+        return f"{name} result"
+
+    async def arun(query: str) -> str:
+        await asyncio.sleep(seconds)
+        return f"{name} result"
+
+    return StructuredTool.from_function(
+        func=run, coroutine=arun if use_async else None, name=name, description=f"{name} tool"
+    )
+
+
+def plan(inputs: dict):
+    if inputs["intermediate_steps"]:
+        return AgentFinish({"output": [step for _, step in inputs["intermediate_steps"]]}, "")
+    return [AgentAction(tool, {"query": "q"}, "") for tool in ("retriever", "weather", "search")]
+
+
+def test_tool_calls_of_a_step_run_concurrently_with_timeouts():
+    tools = [sleeper("retriever", 0.2, True), sleeper("weather", 0.2, False), sleeper("search", 5, True)]
+    assert is_async_tool(tools[0]) and not is_async_tool(tools[1])
+    executor = ParallelAgentExecutor(
+        agent=RunnableLambda(plan), tools=tools, tool_timeout=1, tool_timeouts={"search": 0.3}
+    )
+
+    events = []
+    timings = []
+
+    class Recorder(BaseCallbackHandler):
+        def on_tool_start(self, serialized, input_str, **kwargs):
+            events.append("start")
+
+        def on_tool_end(self, output, **kwargs):
+            events.append("end")
+
+        def on_custom_event(self, name, data, **kwargs):
+            timings.append(data)
+
+    result = asyncio.run(executor.ainvoke({"input": "q"}, config={"callbacks": [Recorder()]}))
+    observations = result["output"]
+
+    # All three calls started before the first finished, and the hung search did not hold up the step.
+    assert events[:3] == ["start"] * 3
+    assert [timing["timed_out"] for timing in timings] == [False, False, True]
+    assert max(timing["wall_time"] for timing in timings) < 0.6
+    assert observations[:2] == ["retriever result", "weather result"]
+    assert "did not respond within 0.3 seconds" in observations[2]
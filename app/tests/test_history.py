@@ -0,0 +1,59 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.db import history
+from app.db.history import SessionHistoryStore
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+        self.expiry = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def lrange(self, key, start, end):
+        return [value.encode() for value in self.lists.get(key, [])]
+
+    async def delete(self, key):
+        self.lists.pop(key, None)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def rpush(self, key, *values):
+        self.commands.append(lambda: self.redis.lists.setdefault(key, []).extend(values))
+
+    def ltrim(self, key, start, end):
+        self.commands.append(lambda: self.redis.lists.__setitem__(key, self.redis.lists[key][start:]))
+
+    def expire(self, key, seconds):
+        self.commands.append(lambda: self.redis.expiry.__setitem__(key, seconds))
+
+    async def execute(self):
+        return [command() for command in self.commands]
+
+
+def test_history_keeps_a_window_of_recent_messages():
+    store = SessionHistoryStore(max_messages=3, use_redis=False)
+    for turn in range(3):
+        asyncio.run(store.aadd_messages("alice", [HumanMessage(f"q{turn}"), AIMessage(f"a{turn}")]))
+
+    assert [message.content for message in asyncio.run(store.aget_messages("alice"))] == ["a1", "q2", "a2"]
+    assert asyncio.run(store.aget_messages("bob")) == []
+
+
+def test_history_is_shared_through_redis(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr(history.redis, "redis", fake_redis)
+    asyncio.run(SessionHistoryStore(ttl=900).aadd_messages("alice", [HumanMessage("hi"), AIMessage("hello")]))
+
+    # A second worker, with an empty in-process tier, reads the history from Redis.
+    other_worker = SessionHistoryStore(ttl=900, local_size=1)
+    assert [message.content for message in asyncio.run(other_worker.aget_messages("alice"))] == ["hi", "hello"]
+    assert fake_redis.expiry == {"chat_history:alice": 900}
@@ -0,0 +1,32 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import QdrantClient
+
+from app.db import vector_store
+from app.db.qdrant import qdrant
+from app.db.sparse import tokenize
+from app.models.schema import CollectionConfig, RetrievalMode
+
+
+def test_tokenize_keeps_codes_and_their_parts():
+    assert tokenize("Order XK-4821 now") == ["order", "xk-4821", "xk", "4821", "now"]
+
+
+@pytest.fixture
+def hybrid_store(monkeypatch):
+    monkeypatch.setattr(qdrant, "client", QdrantClient(location=":memory:"))
+    monkeypatch.setattr(qdrant, "embeddings", DeterministicFakeEmbedding(size=3072))
+    store = vector_store.VectorStore("docs", CollectionConfig(retrieval_mode=RetrievalMode.HYBRID))
+    store.create_collection()
+    return store
+
+
+def test_hybrid_retrieval_finds_exact_codes(hybrid_store):
+    docs = [Document(page_content=f"Replacement filter model FX-{100 + i} for the air purifier") for i in range(20)]
+    hybrid_store.add_documents(docs)
+
+    # The fake dense embedding is random per text, so only the sparse ranking can surface the code. It ranks
+    # first there, and after fusion only the few points ranked highest by the dense vector can tie or beat it.
+    results = hybrid_store.retrieve("which purifier takes FX-113?", k=4)
+    assert docs[13].page_content in [doc.page_content for doc in results]
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from mongomock_motor import AsyncMongoMockClient
+from qdrant_client import QdrantClient
+
+from app.db import ingestion
+from app.db.ingestion import IngestionJobQueue
+from app.db.mongodb import (
+    COLLECTION_INGESTION_JOBS,
+    add_ingestion_job_to_db,
+    claim_ingestion_job,
+    get_unfinished_ingestion_jobs,
+    renew_ingestion_job_lease,
+)
+from app.db.qdrant import qdrant
+
+
+def test_a_job_is_claimed_by_one_worker_until_its_lease_expires():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        await add_ingestion_job_to_db(db, "job", "docs", "faq.md", "uploads/job.md", 1000, 50)
+
+        assert (await claim_ingestion_job(db, "job", "worker-a", lease=60))["owner"] == "worker-a"
+        assert await claim_ingestion_job(db, "job", "worker-b", lease=60) is None
+        assert await get_unfinished_ingestion_jobs(db) == []
+        assert not await renew_ingestion_job_lease(db, "job", "worker-b", lease=60)
+
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        await db[COLLECTION_INGESTION_JOBS].update_one({"_id": "job"}, {"$set": {"lease_until": expired}})
+        assert [job["_id"] for job in await get_unfinished_ingestion_jobs(db)] == ["job"]
+        assert (await claim_ingestion_job(db, "job", "worker-b", lease=60))["owner"] == "worker-b"
+        assert not await renew_ingestion_job_lease(db, "job", "worker-a", lease=60)
+
+    asyncio.run(scenario())
+
+
+def test_a_worker_stops_a_job_whose_lease_was_taken_over(monkeypatch):
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        await add_ingestion_job_to_db(db, "job", "docs", "faq.md", "uploads/job.md", 1000, 50)
+        queue = IngestionJobQueue(lease=0.03)
+        processed = []
+
+        async def get_mongodb():
+            return db
+
+        async def process(db, job, job_id):
+            processed.append(job_id)
+            # Another worker claims the job, as if this worker had stalled past its lease.
+            await db[COLLECTION_INGESTION_JOBS].update_one({"_id": job_id}, {"$set": {"owner": "other"}})
+            await asyncio.sleep(1)
+            processed.append("finished")
+
+        monkeypatch.setattr(ingestion, "get_mongodb", get_mongodb)
+        monkeypatch.setattr(queue, "_process", process)
+        await asyncio.wait_for(queue.process("job"), timeout=0.5)
+        assert processed == ["job"]
+
+    asyncio.run(scenario())
+
+
+def test_a_job_is_completed_even_if_the_answer_cache_cannot_be_invalidated(monkeypatch):
+    monkeypatch.setattr(qdrant, "client", QdrantClient(location=":memory:"))
+    monkeypatch.setattr(qdrant, "embeddings", DeterministicFakeEmbedding(size=3072))
+
+    async def get_redis():
+        raise ConnectionError("redis unavailable")
+
+    async def ingest_file(db, job, vector_store, pipeline, report):
+        return {"doc_ids": ["chunk"]}
+
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        await add_ingestion_job_to_db(db, "job", "docs", "faq.md", "uploads/job.md", 1000, 50)
+        queue = IngestionJobQueue()
+        monkeypatch.setattr(ingestion, "get_redis", get_redis)
+        monkeypatch.setattr(queue, "_ingest_file", ingest_file)
+
+        await queue._process(db, await db[COLLECTION_INGESTION_JOBS].find_one({"_id": "job"}), "job")
+        return await db[COLLECTION_INGESTION_JOBS].find_one({"_id": "job"})
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "completed" and job["doc_ids"] == ["chunk"]
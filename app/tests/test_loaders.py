@@ -0,0 +1,97 @@
+import pytest
+from langchain_community import document_loaders
+from langchain_core.documents import Document
+
+from app.db.data_handler import (
+    DataPreprocessor,
+    load_csv,
+    load_markdown,
+    load_unstructured,
+)
+from app.db.ingestion import SourceChunkIds, with_source
+from app.exceptions.preprocessor import FileProcessingError
+
+
+def test_csv_rows_become_documents_with_column_metadata(tmp_path):
+    file_path = tmp_path / "products.csv"
+    file_path.write_text('﻿name,price,notes\nKettle,25,\n\nToaster,40,"two slots, steel"\nLamp,15,desk\n')
+
+    rows = list(load_csv(str(file_path)))
+    assert [doc.page_content for doc in rows] == [
+        "name: Kettle\nprice: 25",
+        "name: Toaster\nprice: 40\nnotes: two slots, steel",
+        "name: Lamp\nprice: 15\nnotes: desk",
+    ]
+    assert rows[1].metadata == {
+        "source": str(file_path),
+        "columns": ["name", "price", "notes"],
+        "first_row": 3,
+        "last_row": 3,
+    }
+
+    groups = list(load_csv(str(file_path), rows_per_document=2))
+    assert [(doc.metadata["first_row"], doc.metadata["last_row"]) for doc in groups] == [(1, 3), (4, 4)]
+
+
+def test_markdown_sections_carry_their_headings(tmp_path):
+    file_path = tmp_path / "guide.md"
+    file_path.write_text(
+        "Intro text.\n# Setup\nInstall it.\n## Linux\nUse apt.\n```\n# not a heading\n```\n# Usage ##\nRun it.\n"
+    )
+
+    sections = list(load_markdown(str(file_path)))
+    assert [doc.metadata["headers"] for doc in sections] == [[], ["Setup"], ["Setup", "Linux"], ["Usage"]]
+    assert sections[2].page_content == "## Linux\nUse apt.\n```\n# not a heading\n```"
+
+
+def test_preprocessor_picks_the_loader_by_extension(tmp_path):
+    (tmp_path / "empty.csv").write_text("name,price\n")
+    (tmp_path / "notes.md").write_text("# Notes\nText.\n")
+
+    assert DataPreprocessor(str(tmp_path), "notes.md")._process_files(str(tmp_path / "notes.md"))[0].metadata == {
+        "source": str(tmp_path / "notes.md"),
+        "headers": ["Notes"],
+    }
+    with pytest.raises(FileProcessingError, match="No elements"):
+        DataPreprocessor(str(tmp_path), "empty.csv")._process_files(str(tmp_path / "empty.csv"))
+
+
+def test_inserting_a_csv_row_keeps_the_ids_of_the_other_rows(tmp_path):
+    rows = [f"item {i},{i}" for i in range(50)]
+    file_path = tmp_path / "items.csv"
+
+    def chunk_ids():
+        ids = SourceChunkIds("docs", "items.csv")
+        return [ids(index, doc) for index, doc in enumerate(with_source(load_csv(str(file_path)), "items.csv"))]
+
+    file_path.write_text("name,price\n" + "\n".join(rows))
+    before = chunk_ids()
+    file_path.write_text("name,price\n" + "\n".join(["new item,1"] + rows))
+    after = chunk_ids()
+
+    assert after[1:] == before
+
+
+def test_unstructured_elements_are_grouped_into_sections(monkeypatch):
+    class ElementLoader:
+        def __init__(self, file_path, mode):
+            assert mode == "elements"
+            self.file_path = file_path
+
+        def lazy_load(self):
+            for category, text, page in [
+                ("NarrativeText", "Preface.", 1),
+                ("Title", "Setup", 1),
+                ("NarrativeText", "Install it.", 2),
+                ("Title", "Usage", 3),
+            ]:
+                yield Document(text, metadata={"category": category, "page_number": page, "last_modified": "now"})
+
+    monkeypatch.setattr(document_loaders, "UnstructuredFileLoader", ElementLoader)
+
+    sections = list(load_unstructured("guide.docx"))
+    assert [(doc.page_content, doc.metadata) for doc in sections] == [
+        ("Preface.", {"source": "guide.docx", "page_number": 1}),
+        ("Setup\n\nInstall it.", {"source": "guide.docx", "page_number": 1}),
+        ("Usage", {"source": "guide.docx", "page_number": 3}),
+    ]
@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -15,3 +18,11 @@ def test_health():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_importing_the_app_defers_heavy_modules():
+    # Workers must answer /health before langchain, OpenAI, Qdrant and MLflow are loaded.
+    code = "import sys, app.main; print(' '.join(sorted(set(sys.modules) & set(sys.argv[1:]))))"
+    heavy = ["mlflow", "langchain_openai", "langchain_qdrant", "qdrant_client", "langchain.agents", "unstructured"]
+    result = subprocess.run([sys.executable, "-c", code, *heavy], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
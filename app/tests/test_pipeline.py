@@ -0,0 +1,101 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import Distance, VectorParams
+
+from app.db import vector_store
+from app.db.data_handler import DataPreprocessor
+from app.db.ingestion import BulkChunkIds, SourceChunkIds, iter_parsed_files
+from app.db.pipeline import IngestionPipeline
+from app.db.qdrant import qdrant
+from app.exceptions.preprocessor import FileProcessingError
+
+
+@pytest.fixture
+def store(monkeypatch):
+    client = AsyncQdrantClient(location=":memory:")
+    asyncio.run(client.create_collection("docs", vectors_config=VectorParams(size=8, distance=Distance.COSINE)))
+    monkeypatch.setattr(qdrant, "async_client", client)
+    monkeypatch.setattr(qdrant, "embeddings", DeterministicFakeEmbedding(size=8))
+    return vector_store.VectorStore("docs")
+
+
+def test_pipeline_writes_every_chunk_in_order(store):
+    progress = {}
+
+    async def report(counter, count):
+        progress[counter] = progress.get(counter, 0) + count
+
+    docs = (Document(page_content=f"chunk {i}") for i in range(25))
+    pipeline = IngestionPipeline(store, batch_size=4, queue_size=1, embed_workers=3, progress=report)
+    ids = asyncio.run(pipeline.run(docs, lambda index, doc: f"00000000-0000-0000-0000-{index:012d}"))
+
+    assert ids == [f"00000000-0000-0000-0000-{index:012d}" for index in range(25)]
+    assert progress == {"chunks_parsed": 25, "chunks_embedded": 25, "chunks_upserted": 25}
+    assert asyncio.run(store.async_client.count("docs")).count == 25
+
+
+def test_pipeline_propagates_parse_errors(store):
+    def docs():
+        yield Document(page_content="chunk")
+        raise ValueError("broken file")
+
+    pipeline = IngestionPipeline(store, batch_size=1)
+    with pytest.raises(ValueError, match="broken file"):
+        asyncio.run(pipeline.run(docs(), lambda index, doc: f"00000000-0000-0000-0000-{index:012d}"))
+
+
+def test_reupload_embeds_only_new_chunks_and_deletes_vanished_ones(store):
+    async def upload(texts):
+        docs = (Document(page_content=text, metadata={"source": "faq.txt"}) for text in texts)
+        existing = await store.aget_source_ids("faq.txt")
+        progress = {}
+
+        async def report(counter, count):
+            progress[counter] = progress.get(counter, 0) + count
+
+        pipeline = IngestionPipeline(store, batch_size=2, progress=report)
+        ids = await pipeline.run(docs, SourceChunkIds("docs", "faq.txt"), unchanged=existing)
+        await store.adelete_documents(list(existing - set(ids)))
+        return ids, progress
+
+    first, _ = asyncio.run(upload(["a", "b", "c", "b"]))
+    assert len(set(first)) == 4
+
+    second, progress = asyncio.run(upload(["a", "b", "d", "b"]))
+    assert [second[0], second[1], second[3]] == [first[0], first[1], first[3]]
+    assert progress["chunks_unchanged"] == 3 and progress["chunks_embedded"] == 1
+    assert asyncio.run(store.aget_source_ids("faq.txt")) == set(second)
+
+
+class LinePreprocessor(DataPreprocessor):
+    SUPPORTED_EXTENSIONS = [".txt"]
+
+    def preprocess(self):
+        lines = open(os.path.join(self.data_dir, self.data_file)).read().splitlines()
+        if not lines:
+            raise FileProcessingError("No elements found in the file.")
+        return [Document(page_content=line) for line in lines]
+
+
+def test_bulk_files_share_batches_and_fail_individually(store, tmp_path):
+    files = []
+    for name, text in [("a.txt", "a1\na2\na3"), ("empty.txt", ""), ("b.txt", "b1\nb2")]:
+        (tmp_path / name).write_text(text)
+        files.append({"filename": name, "file_path": str(tmp_path / name), "status": "queued"})
+
+    chunk_ids = BulkChunkIds("00000000-0000-0000-0000-000000000001")
+    with ThreadPoolExecutor(2) as pool:
+        documents = iter_parsed_files(pool, files, 100, 0, LinePreprocessor, ahead=2)
+        ids = asyncio.run(IngestionPipeline(store, batch_size=4).run(documents, chunk_ids))
+
+    assert [file.get("chunks") for file in files] == [3, None, 2]
+    assert files[1]["status"] == "failed" and "No elements" in files[1]["error"]
+    assert {source: len(source_ids) for source, source_ids in chunk_ids.ids.items()} == {"a.txt": 3, "b.txt": 2}
+    assert ids == chunk_ids.ids["a.txt"] + chunk_ids.ids["b.txt"]
+    assert asyncio.run(store.async_client.count("docs")).count == 5
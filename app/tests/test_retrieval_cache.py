@@ -0,0 +1,46 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import FieldCondition, Filter, MatchValue
+
+from app.cache.retrieval import RetrievalCache
+from app.db import vector_store
+from app.db.qdrant import qdrant
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text: str) -> list[float]:
+        self.queries += 1
+        return super().embed_query(text)
+
+
+def test_repeated_searches_skip_embedding_and_qdrant_until_the_collection_changes(monkeypatch):
+    client = QdrantClient(location=":memory:")
+    embeddings = CountingEmbeddings(size=3072)
+    monkeypatch.setattr(qdrant, "client", client)
+    monkeypatch.setattr(qdrant, "embeddings", embeddings)
+    store = vector_store.VectorStore("docs")
+    store.retrieval_cache = RetrievalCache()
+    store.create_collection()
+    store.add_documents([Document(page_content=f"chunk {i}", metadata={"part": i % 2}) for i in range(6)])
+
+    searches = []
+    query_points = client.query_points
+    monkeypatch.setattr(client, "query_points", lambda **kwargs: searches.append(kwargs) or query_points(**kwargs))
+
+    first = store.retrieve("chunk 3", k=2)
+    first[0].metadata["changed"] = True
+    again = store.retrieve("  chunk   3 ", k=2)
+    assert [doc.page_content for doc in again] == [doc.page_content for doc in first]
+    assert "changed" not in again[0].metadata
+    assert len(searches) == 1 and embeddings.queries == 1
+
+    part_filter = Filter(must=[FieldCondition(key="metadata.part", match=MatchValue(value=0))])
+    assert all(doc.metadata["part"] == 0 for doc in store.retrieve("chunk 3", k=2, filter=part_filter))
+    assert len(searches) == 2 and embeddings.queries == 1
+
+    store.add_documents([Document(page_content="chunk 3", metadata={"part": 1})])
+    assert [doc.page_content for doc in store.retrieve("chunk 3", k=2)] == ["chunk 3", "chunk 3"]
+    assert len(searches) == 3 and embeddings.queries == 1
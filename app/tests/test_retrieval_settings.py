@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from mongomock_motor import AsyncMongoMockClient
+from qdrant_client import QdrantClient
+
+from app.cache.lru import LRUCache
+from app.cache.retrieval import RetrievalCache
+from app.db import vector_store
+from app.db.mongodb import (
+    add_collection_config_to_db,
+    update_collection_retrieval_settings_in_db,
+)
+from app.db.qdrant import qdrant
+from app.models.schema import CollectionConfig, RetrievalSettings
+
+
+def test_mmr_prefers_a_diverse_candidate_over_a_near_duplicate():
+    candidates = np.array([[1.0, 0.0, 0.0], [0.99, 0.1, 0.0], [0.6, 0.0, 0.8]])
+
+    assert vector_store.maximal_marginal_relevance([1.0, 0.0, 0.0], candidates, k=2, lambda_mult=1.0) == [0, 1]
+    assert vector_store.maximal_marginal_relevance([1.0, 0.0, 0.0], candidates, k=2, lambda_mult=0.3) == [0, 2]
+
+
+def test_retrieval_settings_apply_threshold_mmr_and_token_budget(monkeypatch):
+    monkeypatch.setattr(qdrant, "client", QdrantClient(location=":memory:"))
+    monkeypatch.setattr(qdrant, "embeddings", DeterministicFakeEmbedding(size=3072))
+    store = vector_store.VectorStore("docs")
+    store.retrieval_cache = RetrievalCache()
+    # Count tokens without tiktoken, whose encoding is downloaded on first use.
+    store.token_counter = lambda text: len(text) // 4
+    store.create_collection()
+    # Three copies of the answer, the fake embedding gives identical texts identical vectors.
+    store.add_documents([Document(page_content="refund policy " * 20) for _ in range(3)])
+    store.add_documents([Document(page_content=f"unrelated chunk {i}") for i in range(5)])
+
+    plain = store.retrieve("refund policy " * 20, settings=RetrievalSettings(k=3))
+    assert [doc.page_content for doc in plain] == ["refund policy " * 20] * 3
+
+    diverse = store.retrieve("refund policy " * 20, settings=RetrievalSettings(k=3, mmr=True, fetch_k=8))
+    assert [doc.page_content for doc in diverse].count("refund policy " * 20) == 1
+
+    above_threshold = store.retrieve("refund policy " * 20, settings=RetrievalSettings(k=8, score_threshold=0.9))
+    assert len(above_threshold) == 3
+
+    within_budget = store.retrieve("refund policy " * 20, settings=RetrievalSettings(k=3, max_context_tokens=100))
+    assert len(within_budget) == 1
+
+
+def test_agents_pick_up_settings_changed_through_another_worker(monkeypatch):
+    from app import agent
+
+    db = AsyncMongoMockClient()["test"]
+
+    async def get_mongodb():
+        return db
+
+    builds = []
+
+    def build_agent(collection_name, config):
+        builds.append(config.retrieval.k)
+        return f"agent with k={config.retrieval.k}"
+
+    monkeypatch.setattr(agent, "get_mongodb", get_mongodb)
+    monkeypatch.setattr(agent, "build_agent", build_agent)
+    monkeypatch.setattr(agent, "agent_registry", LRUCache())
+
+    async def scenario():
+        await add_collection_config_to_db(db, "docs", CollectionConfig())
+        assert await agent.get_agent("docs") == "agent with k=4"
+
+        # Another worker changes the settings; this worker does not hear of it.
+        await update_collection_retrieval_settings_in_db(db, "docs", RetrievalSettings(k=8))
+        assert await agent.get_agent("docs") == "agent with k=4"
+
+        monkeypatch.setattr(agent, "AGENT_CONFIG_CHECK_INTERVAL", 0)
+        agent.register_agent("docs", "agent with k=4", version=1)
+        assert await agent.get_agent("docs") == "agent with k=8"
+        assert await agent.get_agent("docs") == "agent with k=8"
+        assert builds == [4, 8]
+
+    asyncio.run(scenario())
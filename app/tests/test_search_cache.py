@@ -0,0 +1,38 @@
+import asyncio
+
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+
+from app.tools.tavily_search import CachedTavilySearchResults, SearchCache
+
+
+class FakeTavily(TavilySearchAPIWrapper):
+    calls: list = []
+    delay: float = 0.0
+
+    async def results_async(self, query, *args, **kwargs):
+        self.calls.append(query)
+        await asyncio.sleep(self.delay)
+        if "fail" in query:
+            raise ConnectionError("tavily unavailable")
+        return [{"url": "https://example.com", "content": query}]
+
+
+def test_search_results_and_failures_are_cached_by_normalized_query():
+    api = FakeTavily(tavily_api_key="key", calls=[])
+    tool = CachedTavilySearchResults(api_wrapper=api, cache=SearchCache())
+
+    async def scenario():
+        first = await tool.ainvoke({"query": "Latest  FX rates"})
+        assert await tool.ainvoke({"query": "latest fx rates "}) == first
+        assert "tavily unavailable" in await tool.ainvoke({"query": "fail"})
+        assert "tavily unavailable" in await tool.ainvoke({"query": "Fail"})
+
+    asyncio.run(scenario())
+    assert api.calls == ["Latest  FX rates", "fail"]
+
+
+def test_slow_searches_time_out():
+    api = FakeTavily(tavily_api_key="key", calls=[], delay=1)
+    tool = CachedTavilySearchResults(api_wrapper=api, cache=SearchCache(), timeout=0.05)
+
+    assert "timed out" in asyncio.run(tool.ainvoke({"query": "slow"}))
@@ -0,0 +1,62 @@
+import asyncio
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.cache.semantic import SemanticCache
+from app.db.history import SessionHistoryStore
+from app.models.schema import Query
+
+
+def make_cache(**kwargs) -> SemanticCache:
+    return SemanticCache(DeterministicFakeEmbedding(size=32), **kwargs)
+
+
+def test_semantic_cache_hit_for_same_query_and_collection():
+    async def scenario():
+        cache = make_cache()
+        response, embedding = await cache.lookup(None, "docs", "what is the refund policy?")
+        assert response is None
+
+        await cache.store(None, "docs", "what is the refund policy?", embedding, "30 days")
+        assert (await cache.lookup(None, "docs", "what is the refund policy?"))[0] == "30 days"
+        assert (await cache.lookup(None, "other", "what is the refund policy?"))[0] is None
+        assert (await cache.lookup(None, "docs", "how do I reset my password?"))[0] is None
+
+    asyncio.run(scenario())
+
+
+def test_semantic_cache_invalidate_and_size_cap():
+    async def scenario():
+        cache = make_cache(max_entries=1)
+        _, first = await cache.lookup(None, "docs", "first")
+        await cache.store(None, "docs", "first", first, "one")
+        _, second = await cache.lookup(None, "docs", "second")
+        await cache.store(None, "docs", "second", second, "two")
+        assert (await cache.lookup(None, "docs", "first"))[0] is None
+        assert (await cache.lookup(None, "docs", "second"))[0] == "two"
+
+        await cache.invalidate(None, "docs")
+        assert (await cache.lookup(None, "docs", "second"))[0] is None
+
+    asyncio.run(scenario())
+
+
+def test_answers_are_only_cached_and_served_without_chat_history(monkeypatch):
+    from app import agent
+
+    monkeypatch.setattr(agent, "semantic_cache", make_cache())
+    monkeypatch.setattr(agent, "session_history_store", SessionHistoryStore(use_redis=False))
+    query = Query(query="what is the refund policy?")
+
+    async def scenario():
+        _, embedding = await agent.lookup_cached_answer(None, query, "alice", "docs")
+        await agent.store_answer(None, query, "docs", embedding, "30 days")
+        assert (await agent.lookup_cached_answer(None, query, "bob", "docs"))[0] == "30 days"
+
+        # Bob's question is now part of his conversation; answers for him are neither served nor stored.
+        assert await agent.lookup_cached_answer(None, query, "bob", "docs") == (None, None)
+        await agent.get_session_history("carol").aadd_messages([HumanMessage("I bought a kettle"), AIMessage("ok")])
+        assert await agent.lookup_cached_answer(None, query, "carol", "docs") == (None, None)
+
+    asyncio.run(scenario())
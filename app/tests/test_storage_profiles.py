@@ -0,0 +1,72 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from mongomock_motor import AsyncMongoMockClient
+from qdrant_client import QdrantClient
+
+from app.db import vector_store
+from app.db.qdrant import qdrant
+from app.models.schema import (
+    CollectionConfig,
+    Quantization,
+    RetrievalMode,
+    StorageProfile,
+)
+from app.routes import knowledgebases
+
+
+def test_truncated_embeddings_keep_normalized_leading_dimensions():
+    full = DeterministicFakeEmbedding(size=64)
+    truncated = vector_store.TruncatedEmbeddings(full, 16).embed_query("hello")
+
+    expected = np.asarray(full.embed_query("hello"))[:16]
+    assert np.allclose(truncated, expected / np.linalg.norm(expected))
+
+
+def test_quantized_collection_uses_profile_dimensions(monkeypatch):
+    monkeypatch.setattr(qdrant, "client", QdrantClient(location=":memory:"))
+    monkeypatch.setattr(qdrant, "embeddings", DeterministicFakeEmbedding(size=3072))
+    storage = StorageProfile(dimensions=256, quantization=Quantization.INT8, on_disk=True)
+    store = vector_store.VectorStore("docs", CollectionConfig(storage=storage))
+    store.create_collection()
+
+    docs = [Document(page_content=f"chunk {i}") for i in range(10)]
+    store.add_documents(docs)
+
+    params = store.client.get_collection("docs").config.params.vectors
+    assert params.size == 256 and params.on_disk
+    assert store.retrieve("chunk 3", k=1)[0].page_content == "chunk 3"
+
+
+def test_creating_an_existing_collection_keeps_its_settings(monkeypatch):
+    monkeypatch.setattr(qdrant, "client", QdrantClient(location=":memory:"))
+    monkeypatch.setattr(qdrant, "embeddings", DeterministicFakeEmbedding(size=3072))
+    db = AsyncMongoMockClient()["test"]
+
+    async def get_mongodb():
+        return db
+
+    monkeypatch.setattr(knowledgebases, "get_mongodb", get_mongodb)
+
+    async def scenario():
+        created = await knowledgebases.create_collection("docs", dimensions=256)
+        assert created["storage"]["dimensions"] == 256
+        with pytest.raises(HTTPException) as error:
+            await knowledgebases.create_collection("docs", retrieval_mode=RetrievalMode.HYBRID, dimensions=512)
+        assert error.value.status_code == 409
+        assert "dimensions is 256, not 512" in error.value.detail and "retrieval_mode is dense" in error.value.detail
+
+        # A config recorded for an earlier collection of the same name is replaced when it is created again.
+        qdrant.client.delete_collection("docs")
+        recreated = await knowledgebases.create_collection("docs", retrieval_mode=RetrievalMode.HYBRID)
+        assert recreated["retrieval_mode"] == "hybrid"
+        assert (await knowledgebases.create_collection("docs", retrieval_mode=RetrievalMode.HYBRID)) == {
+            **recreated,
+            "message": "docs collection already exists!",
+        }
+
+    asyncio.run(scenario())
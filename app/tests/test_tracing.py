@@ -0,0 +1,42 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.tracing import SpanTracer
+
+
+def traced_chain():
+    reply = AIMessage(
+        content="a long answer " * 20, usage_metadata={"input_tokens": 12, "output_tokens": 30, "total_tokens": 42}
+    )
+    llm = GenericFakeChatModel(messages=iter([reply]))
+    return RunnableLambda(lambda inputs: inputs["input"]).with_config(run_name="prepare") | llm
+
+
+def test_span_tracer_exports_one_trace_with_latency_tokens_and_truncated_payloads():
+    traces = []
+    tracer = SpanTracer(traces.append, max_payload_chars=10)
+    config = {"callbacks": [tracer], "metadata": {"sender_id": "alice", "collection_name": "docs"}}
+
+    asyncio.run(traced_chain().ainvoke({"input": "what is the refund policy?"}, config=config))
+
+    [trace] = traces
+    assert trace["sender_id"] == "alice" and trace["collection_name"] == "docs"
+    assert trace["total_tokens"] == 42 and trace["input_tokens"] == 12
+    assert trace["latency"] >= 0 and trace["error"] is None
+    root, prepare, llm = trace["spans"]
+    assert prepare["name"] == "prepare" and prepare["parent_id"] == root["span_id"]
+    assert llm["type"] == "llm" and llm["total_tokens"] == 42
+    assert all(len(span["outputs"]) <= 13 for span in trace["spans"])
+    assert not tracer._traces and not tracer._spans
+
+
+def test_span_tracer_samples_top_level_runs():
+    traces = []
+    tracer = SpanTracer(traces.append, sample_rate=0.0)
+
+    traced_chain().invoke({"input": "hello"}, config={"callbacks": [tracer]})
+
+    assert traces == [] and not tracer._spans
@@ -0,0 +1,89 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from app.db.data_handler import save_bulk_upload, save_upload
+from app.exceptions.preprocessor import FileTooLargeError
+
+
+def test_save_upload_copies_in_chunks(tmp_path):
+    file_path = str(tmp_path / "upload.md")
+    size = save_upload(io.BytesIO(b"x" * 10), file_path, max_size=10, chunk_size=3)
+
+    assert size == 10
+    assert open(file_path, "rb").read() == b"x" * 10
+
+
+def test_save_upload_rejects_large_files(tmp_path):
+    file_path = str(tmp_path / "upload.md")
+    with pytest.raises(FileTooLargeError):
+        save_upload(io.BytesIO(b"x" * 11), file_path, max_size=10, chunk_size=3)
+
+    assert not os.path.exists(file_path)
+
+
+def test_save_bulk_upload_extracts_archives_and_rejects_unsupported_files(tmp_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("docs/faq.md", "# FAQ")
+        zip_file.writestr("../escape.md", "# Escape")
+        zip_file.writestr("logo.png", b"png")
+    archive.seek(0)
+    uploads = [
+        ("kb.zip", archive),
+        ("notes.md", io.BytesIO(b"# Notes")),
+        ("faq.md", io.BytesIO(b"# Old")),
+        ("a.exe", io.BytesIO()),
+    ]
+
+    files = save_bulk_upload(uploads, str(tmp_path), max_size=1000, supported_extensions=[".md"])
+
+    assert [(file["filename"], file["status"]) for file in files] == [
+        ("docs/faq.md", "queued"),
+        ("../escape.md", "queued"),
+        ("logo.png", "rejected"),
+        ("notes.md", "queued"),
+        ("faq.md", "queued"),
+        ("a.exe", "rejected"),
+    ]
+    assert all(os.path.dirname(file["file_path"]).startswith(str(tmp_path)) for file in files if file["file_path"])
+    assert open(files[1]["file_path"]).read() == "# Escape"
+    assert not os.path.exists(tmp_path / "0.zip")
+
+    with pytest.raises(FileTooLargeError):
+        save_bulk_upload([("notes.md", io.BytesIO(b"x" * 101))], str(tmp_path), 100, [".md"])
+
+
+def test_save_bulk_upload_rejects_unreadable_archives(tmp_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("faq.md", "".join(f"line {i}\n" for i in range(2000)))
+    corrupt = bytearray(archive.getvalue())
+    corrupt[100:120] = b"\xff" * 20  # inside the deflated data of the member
+    encrypted = bytearray(archive.getvalue())
+    encrypted[encrypted.index(b"PK\x01\x02") + 8] |= 1  # the encryption flag of the member
+
+    tarball = io.BytesIO()
+    with tarfile.open(fileobj=tarball, mode="w:gz") as tar_file:
+        member = tarfile.TarInfo("notes.md")
+        member.size = 5000
+        tar_file.addfile(member, io.BytesIO(os.urandom(5000)))
+    uploads = [
+        ("corrupt.zip", io.BytesIO(bytes(corrupt))),
+        ("encrypted.zip", io.BytesIO(bytes(encrypted))),
+        ("truncated.tar.gz", io.BytesIO(tarball.getvalue()[:-2000])),
+        ("notes.md", io.BytesIO(b"# Notes")),
+    ]
+
+    files = save_bulk_upload(uploads, str(tmp_path), max_size=100_000, supported_extensions=[".md"])
+
+    assert [(file["filename"], file["status"]) for file in files] == [
+        ("corrupt.zip", "rejected"),
+        ("encrypted.zip", "rejected"),
+        ("truncated.tar.gz", "rejected"),
+        ("notes.md", "queued"),
+    ]
+    assert sorted(os.listdir(tmp_path)) == ["3.md"]
@@ -0,0 +1,40 @@
+import asyncio
+
+import httpx
+
+from app.tools.weather_tool import WeatherClient, normalize_location
+from benchmarks.mock_openweather import MockOpenWeather
+
+
+def test_normalize_location():
+    assert normalize_location("  London ,  UK ") == normalize_location("london,uk") == "london,uk"
+
+
+def test_weather_client_retries_caches_and_coalesces():
+    mock = MockOpenWeather(failures=1)
+    client = WeatherClient(url=mock.url(), api_key="key", transport=httpx.ASGITransport(app=mock.app))
+
+    async def scenario():
+        results = await asyncio.gather(*[client.aget(location) for location in ("Paris", " paris", "PARIS")])
+        assert results[0] == results[1] == results[2]
+        assert await client.aget("Paris ") == results[0]
+        await client.aclose()
+
+    asyncio.run(scenario())
+    # One failed attempt and one retry, shared by all lookups.
+    assert mock.requests == {"paris": 2}
+
+
+def test_weather_client_works_again_after_being_closed():
+    mock = MockOpenWeather()
+    client = WeatherClient(url=mock.url(), api_key="key", transport=httpx.ASGITransport(app=mock.app))
+
+    # Two app lifespans in one process, each closing the client at shutdown.
+    for location in ("Paris", "Rome"):
+
+        async def lifespan():
+            await client.aget(location)
+            await client.aclose()
+
+        asyncio.run(lifespan())
+    assert mock.requests == {"paris": 1, "rome": 1}
@@ -1,16 +1,176 @@
+import asyncio
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
 from langchain_community.tools.tavily_search.tool import TavilySearchResults
 from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
+
+from app.cache.lru import LRUCache
+from app.configs import (
+    SEARCH_CACHE_NEGATIVE_TTL,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    SEARCH_TIMEOUT,
+    TAVILY_API_KEY,
+)
+from app.db.redis import redis
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_PREFIX = "search_cache"
+
+# Synchronous searches run here so they can be abandoned after the timeout.
+search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse its whitespace, so trivially different spellings share an entry."""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    Search result cache shared through Redis, or held in an in-process LRU when Redis is not connected.
+
+    Entries are either {"results": [...]} or, for failed searches, {"error": "..."}; failures are
+    kept for negative_ttl seconds only.
+    """
+
+    def __init__(self, ttl: int = 3600, negative_ttl: int = 60, local_size: int = 1024):
+        """
+        Initialize the cache.
+        Args:
+            ttl (int): Seconds search results are reused
+            negative_ttl (int): Seconds a failed search is answered with its error instead of retried
+            local_size (int): Entries kept in the in-process tier
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local = LRUCache(maxsize=local_size, ttl=ttl)
+
+    @staticmethod
+    def key(query: str, options: dict) -> str:
+        payload = json.dumps({"query": normalize_query(query), **options}, sort_keys=True)
+        return f"{SEARCH_CACHE_PREFIX}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    async def aget(self, key: str) -> Optional[dict]:
+        client = redis.redis
+        if client is None:
+            return self.local.get(key)
+        try:
+            stored = await client.get(key)
+        except Exception as e:
+            logger.warning(f"Search cache unavailable: {e}")
+            return None
+        return json.loads(stored) if stored is not None else None
+
+    async def aset(self, key: str, entry: dict) -> None:
+        ttl = self.negative_ttl if "error" in entry else self.ttl
+        client = redis.redis
+        if client is None:
+            self.local.set(key, entry, ttl=ttl)
+            return
+        try:
+            await client.set(key, json.dumps(entry), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Search cache unavailable: {e}")
+
+    def get(self, key: str) -> Optional[dict]:
+        # The synchronous path cannot await Redis and only uses the in-process tier.
+        return self.local.get(key)
+
+    def set(self, key: str, entry: dict) -> None:
+        self.local.set(key, entry, ttl=self.negative_ttl if "error" in entry else self.ttl)
+
+
+class CachedTavilySearchResults(TavilySearchResults):
+    """
+    TavilySearchResults with a result cache and a hard per-call timeout.
+
+    Searches are keyed by the normalized query and the search options. A search that fails or
+    takes longer than timeout seconds returns its error to the agent, which is cached briefly.
+    """
+
+    cache: Any = None
+    timeout: float = 8.0
+
+    def _options(self) -> dict:
+        return {
+            "max_results": self.max_results,
+            "search_depth": self.search_depth,
+            "include_domains": self.include_domains,
+            "exclude_domains": self.exclude_domains,
+            "include_answer": self.include_answer,
+            "include_raw_content": self.include_raw_content,
+            "include_images": self.include_images,
+        }
+
+    def _run(
+        self,
+        query: str,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> Union[List[Dict], str]:
+        """Use the tool."""
+        key = self.cache.key(query, self._options())
+        entry = self.cache.get(key)
+        if entry is None:
+            future = search_executor.submit(self.api_wrapper.results, query, **self._options())
+            try:
+                entry = {"results": future.result(timeout=self.timeout)}
+            except FutureTimeoutError:
+                entry = {"error": f"Search timed out after {self.timeout} seconds"}
+            except Exception as e:
+                entry = {"error": repr(e)}
+            if "error" in entry:
+                logger.warning(f"Web search failed: {entry['error']}")
+            self.cache.set(key, entry)
+        return entry.get("results", entry.get("error"))
 
-from app.configs import TAVILY_API_KEY
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Union[List[Dict], str]:
+        """Use the tool asynchronously."""
+        key = self.cache.key(query, self._options())
+        entry = await self.cache.aget(key)
+        if entry is None:
+            try:
+                results = await asyncio.wait_for(
+                    self.api_wrapper.results_async(query, **self._options()), timeout=self.timeout
+                )
+                entry = {"results": results}
+            except asyncio.TimeoutError:
+                entry = {"error": f"Search timed out after {self.timeout} seconds"}
+            except Exception as e:
+                entry = {"error": repr(e)}
+            if "error" in entry:
+                logger.warning(f"Web search failed: {entry['error']}")
+            await self.cache.aset(key, entry)
+        return entry.get("results", entry.get("error"))
 
 
+@lru_cache(maxsize=None)
 def search() -> TavilySearchResults:
     """
-    Creates and returns a TavilySearchResults tool for performing web searches.
+    Returns the TavilySearchResults tool for performing web searches, shared by all agents.
 
     Returns:
-        TavilySearchResults: A search tool configured with the Tavily API wrapper
+        TavilySearchResults: A cached search tool configured with the Tavily API wrapper
     """
     search = TavilySearchAPIWrapper(tavily_api_key=TAVILY_API_KEY)
-    search_tool = TavilySearchResults(api_wrapper=search)
+    search_tool = CachedTavilySearchResults(
+        api_wrapper=search,
+        cache=SearchCache(ttl=SEARCH_CACHE_TTL, negative_ttl=SEARCH_CACHE_NEGATIVE_TTL, local_size=SEARCH_CACHE_SIZE),
+        timeout=SEARCH_TIMEOUT,
+    )
     return search_tool
@@ -1,12 +1,174 @@
+import asyncio
+import time
 from typing import Optional, Type
 
-import requests  # type: ignore
-from langchain.tools import BaseTool
+import httpx
+from langchain_core.tools import BaseTool
 from pydantic import BaseModel
 
-from app.configs import OPENWEATHER_API_KEY
+from app.admission import SingleFlight
+from app.cache.lru import LRUCache
+from app.configs import (
+    OPENWEATHER_API_KEY,
+    OPENWEATHER_RETRIES,
+    OPENWEATHER_TIMEOUT,
+    OPENWEATHER_URL,
+    WEATHER_CACHE_SIZE,
+    WEATHER_CACHE_TTL,
+)
 from app.models.schema import GetCurrentWeatherCheckInput
 
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF = 0.2
+
+
+def normalize_location(location: str) -> str:
+    """
+    Normalize a location so spellings of the same place share a cache entry.
+
+    Args:
+        location (str): Location as written by the user or the model, e.g. " London,  UK"
+
+    Returns:
+        str: Lowercased location with single spaces and no spaces around commas, e.g. "london,uk"
+    """
+    return ",".join(" ".join(part.split()) for part in location.lower().split(","))
+
+
+class WeatherClient:
+    """
+    OpenWeather client with pooled keep-alive connections, retries and a TTL cache.
+
+    Current weather is cached per normalized location for cache_ttl seconds. Concurrent async
+    requests for a location that is not cached share one API call. Timeouts, connection errors,
+    429 and 5xx responses are retried with exponential backoff; other errors are raised at once
+    and never cached.
+    """
+
+    def __init__(
+        self,
+        url: str = OPENWEATHER_URL,
+        api_key: Optional[str] = OPENWEATHER_API_KEY,
+        timeout: float = 5.0,
+        retries: int = 2,
+        cache_size: int = 1024,
+        cache_ttl: float = 600,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Initialize the client.
+        Args:
+            url (str): OpenWeather current weather endpoint
+            api_key (Optional[str]): OpenWeather API key
+            timeout (float): Seconds allowed for each of connecting, reading and writing; connecting
+                             gets at most 2 seconds
+            retries (int): Retries after a failed attempt
+            cache_size (int): Locations cached at most
+            cache_ttl (float): Seconds a location's weather is reused
+            transport (Optional[httpx.AsyncBaseTransport]): Transport of the async client, for tests
+        """
+        self.url = url
+        self.api_key = api_key
+        self.retries = retries
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 2.0))
+        self.limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30)
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._calls = SingleFlight()
+        self.requests = 0
+
+    async def aget(self, location: str) -> dict:
+        """
+        Get the current weather of a location, from the cache when fresh.
+        Args:
+            location (str): Name of the location
+        Returns:
+            dict: Decoded OpenWeather API response
+        Raises:
+            httpx.HTTPError: If the API request fails after the retries
+        """
+        key = normalize_location(location)
+        data = self.cache.get(key)
+        if data is None:
+            data, _ = await self._calls.do(key, lambda: self._afetch(key))
+        return data
+
+    def get(self, location: str) -> dict:
+        """
+        Get the current weather of a location, from the cache when fresh. Blocks the calling thread.
+        Args:
+            location (str): Name of the location
+        Returns:
+            dict: Decoded OpenWeather API response
+        Raises:
+            httpx.HTTPError: If the API request fails after the retries
+        """
+        key = normalize_location(location)
+        data = self.cache.get(key)
+        if data is None:
+            data = self._fetch(key)
+        return data
+
+    async def aclose(self) -> None:
+        """Close the pooled connections. The next request opens new ones."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def _afetch(self, key: str) -> dict:
+        # Created on first use, so a client closed at shutdown works again when the app restarts in-process.
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.transport)
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                response = await self._client.get(self.url, params={"q": key, "appid": self.api_key})
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                    return self._store(key, response)
+            except httpx.TransportError:
+                # Timeouts and connection errors
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+            attempt += 1
+
+    def _fetch(self, key: str) -> dict:
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(timeout=self.timeout, limits=self.limits)
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                response = self._sync_client.get(self.url, params={"q": key, "appid": self.api_key})
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                    return self._store(key, response)
+            except httpx.TransportError:
+                # Timeouts and connection errors
+                if attempt == self.retries:
+                    raise
+            time.sleep(RETRY_BACKOFF * 2**attempt)
+            attempt += 1
+
+    def _store(self, key: str, response: httpx.Response) -> dict:
+        response.raise_for_status()
+        data = response.json()
+        self.cache.set(key, data)
+        return data
+
+
+weather_client = WeatherClient(
+    timeout=OPENWEATHER_TIMEOUT,
+    retries=OPENWEATHER_RETRIES,
+    cache_size=WEATHER_CACHE_SIZE,
+    cache_ttl=WEATHER_CACHE_TTL,
+)
+
 
 def get_current_weather(location: str) -> str:
     """
@@ -19,12 +181,38 @@ def get_current_weather(location: str) -> str:
         str: Weather information including temperature and description
 
     Raises:
-        requests.exceptions.RequestException: If API request fails
+        httpx.HTTPError: If API request fails
+    """
+    return format_weather(location, weather_client.get(location))
+
+
+async def aget_current_weather(location: str) -> str:
+    """
+    Asynchronously get the current weather for a given location using the pooled HTTP client.
+
+    Args:
+        location (str): Name of the location to get weather for
+
+    Returns:
+        str: Weather information including temperature and description
+
+    Raises:
+        httpx.HTTPError: If API request fails
+    """
+    return format_weather(location, await weather_client.aget(location))
+
+
+def format_weather(location: str, data: dict) -> str:
     """
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={OPENWEATHER_API_KEY}"
+    Format an OpenWeather API response.
+
+    Args:
+        location (str): Name of the location the weather was requested for
+        data (dict): Decoded OpenWeather API response
 
-    response = requests.get(url)
-    data = response.json()
+    Returns:
+        str: Weather information including temperature and description
+    """
     temperature = data["main"]["temp"]
     description = data["weather"][0]["description"]
     return f"The temperature in {location} is {temperature}°C with {description}."
@@ -54,15 +242,16 @@ class WeatherTool(BaseTool):
         weather_response = get_current_weather(location)
         return weather_response
 
-    def _arun(self, query: str) -> None:
-        """Async version of run - not implemented.
+    async def _arun(self, location: str) -> str:
+        """Get current weather for a location without blocking the event loop.
 
         Args:
-            query (str): Query string
+            location (str): Name of location to get weather for
 
-        Raises:
-            NotImplementedError: This tool does not support async operations
+        Returns:
+            str: Weather information including temperature and description
         """
-        raise NotImplementedError("This tool does not support async")
+        weather_response = await aget_current_weather(location)
+        return weather_response
 
     args_schema: Optional[Type[BaseModel]] = GetCurrentWeatherCheckInput
@@ -0,0 +1,281 @@
+import random
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.prompt_values import PromptValue
+
+from app.configs import (
+    TRACING_BATCH_SIZE,
+    TRACING_FLUSH_INTERVAL,
+    TRACING_MAX_PAYLOAD_CHARS,
+    TRACING_MAX_PENDING,
+    TRACING_MODE,
+    TRACING_SAMPLE_RATE,
+)
+from app.db.mongodb import add_traces_to_db, get_mongodb
+from app.db.write_behind import WriteBehindBuffer
+
+
+def truncate(value: Any, max_chars: int) -> Optional[str]:
+    """
+    Render a span input or output as text, keeping at most max_chars characters; None when max_chars is 0.
+    Only the part that is kept is rendered, so large chat histories cost no more than short ones.
+    """
+    if max_chars <= 0:
+        return None
+    parts: list[str] = []
+    remaining = max_chars
+
+    def emit(text: str) -> None:
+        nonlocal remaining
+        parts.append(text[: max(remaining, 0)])
+        remaining -= len(text)
+
+    def render(value: Any) -> None:
+        if remaining <= 0:
+            return
+        if isinstance(value, str):
+            emit(value)
+        elif isinstance(value, BaseMessage):
+            emit(f"{value.type}: ")
+            render(value.content)
+        elif isinstance(value, PromptValue):
+            render(value.to_messages())
+        elif isinstance(value, Document):
+            render(value.page_content)
+        elif isinstance(value, dict):
+            emit("{")
+            for i, (key, item) in enumerate(value.items()):
+                if remaining <= 0:
+                    break
+                emit(f"{', ' if i else ''}{key}: ")
+                render(item)
+            emit("}")
+        elif isinstance(value, (list, tuple)):
+            emit("[")
+            for i, item in enumerate(value):
+                if remaining <= 0:
+                    break
+                emit(", " if i else "")
+                render(item)
+            emit("]")
+        else:
+            emit(str(value))
+
+    render(value)
+    text = "".join(parts)
+    return text if remaining >= 0 else text + "..."
+
+
+def token_usage(response: LLMResult) -> dict:
+    """Input, output and total tokens of a model call, from the message usage or the provider's llm_output."""
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                for key in usage:
+                    usage[key] += metadata.get(key, 0)
+    if not usage["total_tokens"] and response.llm_output:
+        reported = response.llm_output.get("token_usage") or {}
+        usage = {
+            "input_tokens": reported.get("prompt_tokens", 0),
+            "output_tokens": reported.get("completion_tokens", 0),
+            "total_tokens": reported.get("total_tokens", 0),
+        }
+    return usage
+
+
+class SpanTracer(BaseCallbackHandler):
+    """
+    Callback handler recording agent runs as traces of spans, in memory.
+
+    Each top-level run is sampled with probability sample_rate. The chains, model calls, tools and
+    retrievers of a sampled run become spans with their latency, token counts and inputs and outputs
+    truncated to max_payload_chars. When the top-level run ends its trace is handed to export, which
+    must return immediately; nothing is written on the request path. At most max_open_traces runs
+    are tracked at once, the oldest being dropped when runs end without reporting it.
+    """
+
+    run_inline = True
+
+    def __init__(
+        self,
+        export: Callable[[dict], None],
+        sample_rate: float = 1.0,
+        max_payload_chars: int = 1000,
+        max_open_traces: int = 1000,
+    ):
+        """
+        Initialize the tracer.
+        Args:
+            export (Callable[[dict], None]): Receives each finished trace document
+            sample_rate (float): Fraction of top-level runs traced
+            max_payload_chars (int): Characters kept of each span's inputs and outputs, 0 keeps none
+            max_open_traces (int): Unfinished traces held at most
+        """
+        self.export = export
+        self.sample_rate = sample_rate
+        self.max_payload_chars = max_payload_chars
+        self.max_open_traces = max_open_traces
+        self._traces: dict[UUID, dict] = {}
+        self._spans: dict[UUID, tuple[dict, dict]] = {}
+        self._lock = Lock()
+
+    def _start(
+        self,
+        kind: str,
+        name: str,
+        inputs: Any,
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        metadata: Optional[dict],
+    ) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            if parent_run_id is None:
+                if random.random() >= self.sample_rate:
+                    return
+                if len(self._traces) >= self.max_open_traces:
+                    self._discard(next(iter(self._traces)))
+                trace = {
+                    "trace_id": str(run_id),
+                    "name": name,
+                    "start_time": datetime.utcnow(),
+                    "started": now,
+                    "sender_id": (metadata or {}).get("sender_id"),
+                    "collection_name": (metadata or {}).get("collection_name"),
+                    "spans": [],
+                }
+                self._traces[run_id] = trace
+            elif parent_run_id in self._spans:
+                trace = self._spans[parent_run_id][0]
+            else:
+                return
+            span = {
+                "span_id": str(run_id),
+                "parent_id": str(parent_run_id) if parent_run_id else None,
+                "name": name,
+                "type": kind,
+                "start": now - trace["started"],
+                "latency": None,
+                "inputs": truncate(inputs, self.max_payload_chars),
+                "outputs": None,
+                "error": None,
+            }
+            trace["spans"].append(span)
+            self._spans[run_id] = (trace, span)
+
+    def _end(self, run_id: UUID, outputs: Any = None, error: Optional[BaseException] = None, **fields: Any) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            entry = self._spans.get(run_id)
+            if entry is None:
+                return
+            trace, span = entry
+            span["latency"] = now - trace["started"] - span["start"]
+            span["outputs"] = truncate(outputs, self.max_payload_chars) if outputs is not None else None
+            span["error"] = repr(error) if error is not None else None
+            span.update(fields)
+            if run_id not in self._traces:
+                return
+            self._discard(run_id)
+        self.export(self._finish(trace, span))
+
+    def _discard(self, trace_run_id: UUID) -> None:
+        trace = self._traces.pop(trace_run_id)
+        for span in trace["spans"]:
+            self._spans.pop(UUID(span["span_id"]), None)
+
+    @staticmethod
+    def _finish(trace: dict, root: dict) -> dict:
+        trace.pop("started")
+        totals = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        for span in trace["spans"]:
+            for key in totals:
+                totals[key] += span.get(key, 0)
+        return {**trace, **totals, "latency": root["latency"], "error": root["error"]}
+
+    @staticmethod
+    def _name(serialized: Optional[dict], kwargs: dict, default: str) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        serialized = serialized or {}
+        return serialized.get("name") or (serialized.get("id") or [default])[-1]
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs) -> None:
+        self._start("chain", self._name(serialized, kwargs, "chain"), inputs, run_id, parent_run_id, metadata)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._end(run_id, outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start("llm", self._name(serialized, kwargs, "chat_model"), messages, run_id, parent_run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs) -> None:
+        self._start("llm", self._name(serialized, kwargs, "llm"), prompts, run_id, parent_run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs) -> None:
+        outputs = [[generation.text for generation in generations] for generations in response.generations]
+        self._end(run_id, outputs, **token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs) -> None:
+        self._start("tool", self._name(serialized, kwargs, "tool"), input_str, run_id, parent_run_id, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id, output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, metadata=None, **kwargs) -> None:
+        self._start("retriever", self._name(serialized, kwargs, "retriever"), query, run_id, parent_run_id, metadata)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        self._end(run_id, documents)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error=error)
+
+
+async def write_to_mongodb(traces: list[dict]) -> None:
+    db = await get_mongodb()
+    await add_traces_to_db(db, traces)
+
+
+trace_exporter = WriteBehindBuffer(
+    write_to_mongodb,
+    batch_size=TRACING_BATCH_SIZE,
+    flush_interval=TRACING_FLUSH_INTERVAL,
+    max_pending=TRACING_MAX_PENDING,
+    name="traces",
+)
+
+span_tracer = SpanTracer(
+    trace_exporter.append,
+    sample_rate=TRACING_SAMPLE_RATE,
+    max_payload_chars=TRACING_MAX_PAYLOAD_CHARS,
+)
+
+
+def tracing_callbacks() -> list[BaseCallbackHandler]:
+    """
+    Callback handlers tracing an agent run, per TRACING_MODE.
+
+    Returns:
+        list[BaseCallbackHandler]: The span tracer in "spans" mode, otherwise none
+    """
+    return [span_tracer] if TRACING_MODE == "spans" else []
@@ -0,0 +1,5 @@
+import os
+
+# Benchmarks never reach the real services; the clients only need a key to be constructed.
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-benchmark")
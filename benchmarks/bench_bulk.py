@@ -0,0 +1,141 @@
+"""
+Bulk upload benchmark: one ingestion job per file versus one bulk job for all files.
+
+Generates many small text files and ingests them with a CPU-bound parser stand-in (the splitter
+plus a fixed amount of hashing per KiB, standing in for Unstructured), a 3072-dim embedding
+stand-in with per-request latency, a Qdrant stand-in with per-upsert latency and a per-write
+latency for the document_uploads record:
+
+* per-file: what one upload_docs request per file amounts to: `--workers` jobs at a time, each
+  parsing in a thread, embedding and upserting its own partial batches, and writing its own record
+* bulk: the upload_docs_bulk job: files parsed in a process pool, the chunks of all files sharing
+  full embedding batches and upserts, and one write for all records
+
+Reports wall time, embedding requests and upserts for each. Parsing only runs in parallel with
+more than one CPU.
+
+    python -m benchmarks.bench_bulk --files 500 --processes 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator
+
+from langchain_core.documents import Document
+
+from app.db import vector_store
+from app.db.ingestion import BulkChunkIds, iter_parsed_files, with_source
+from app.db.pipeline import IngestionPipeline
+from app.db.qdrant import qdrant
+from benchmarks.bench_ingestion import TextFilePreprocessor
+from benchmarks.fakes import LatencyEmbeddings, LatencyQdrant
+
+
+class SlowTextPreprocessor(TextFilePreprocessor):
+    """TextFilePreprocessor spending CPU time in proportion to the file size, like a document parser."""
+
+    PASSES_PER_KIB = 200
+
+    def _iter_files(self, file_path: str) -> Iterator[Document]:
+        with open(file_path, "rb") as file:
+            data = file.read()
+        for _ in range(self.PASSES_PER_KIB * max(len(data) // 1024, 1)):
+            data = hashlib.sha256(data).digest() + data[32:]
+        yield from super()._iter_files(file_path)
+
+
+class CountingQdrant(LatencyQdrant):
+    """LatencyQdrant counting upsert requests."""
+
+    def __init__(self, latency: float = 0.01):
+        super().__init__(latency)
+        self.upserts = 0
+
+    async def upsert(self, collection_name: str, points: list, **kwargs: Any) -> None:
+        self.upserts += 1
+        await super().upsert(collection_name, points, **kwargs)
+
+
+def write_files(directory: str, count: int, paragraphs: int) -> list[dict]:
+    files = []
+    for i in range(count):
+        file_path = os.path.join(directory, f"{i}.txt")
+        with open(file_path, "w") as file:
+            for j in range(paragraphs):
+                file.write(f"Document {i} section {j} covers the warranty terms of product SKU-{i:06d}. " * 6 + "\n\n")
+        files.append({"filename": f"doc-{i}.txt", "file_path": file_path, "status": "queued"})
+    return files
+
+
+async def per_file(files: list[dict], batch_size: int, workers: int, write_latency: float) -> int:
+    queue: asyncio.Queue = asyncio.Queue()
+    for file in files:
+        queue.put_nowait(file)
+    chunks = 0
+
+    async def worker() -> None:
+        nonlocal chunks
+        while not queue.empty():
+            file = queue.get_nowait()
+            preprocessor = SlowTextPreprocessor(
+                os.path.dirname(file["file_path"]), os.path.basename(file["file_path"]), 200, 20
+            )
+            pipeline = IngestionPipeline(vector_store.VectorStore("benchmark"), batch_size=batch_size)
+            ids = await pipeline.run(
+                with_source(preprocessor.iter_documents(), file["filename"]), lambda index, doc: str(uuid.uuid4())
+            )
+            await asyncio.sleep(write_latency)
+            chunks += len(ids)
+
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    return chunks
+
+
+async def bulk(files: list[dict], batch_size: int, processes: int, write_latency: float) -> int:
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        documents = iter_parsed_files(pool, files, 200, 20, SlowTextPreprocessor, ahead=processes * 2)
+        pipeline = IngestionPipeline(vector_store.VectorStore("benchmark"), batch_size=batch_size)
+        ids = await pipeline.run(documents, BulkChunkIds(str(uuid.uuid4())))
+    await asyncio.sleep(write_latency)
+    return len(ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--paragraphs", type=int, default=6)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--upsert-latency", type=float, default=0.01)
+    parser.add_argument("--write-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, args.files, args.paragraphs)
+        size = sum(os.path.getsize(file["file_path"]) for file in files) / 2**20
+        print(f"{args.files} files, {size:.1f} MiB, batch size {args.batch_size}, {args.processes} parse processes")
+        print(f"{'mode':<10}{'chunks':>8}{'wall (s)':>10}{'embed calls':>13}{'upserts':>9}")
+        for mode in ("per-file", "bulk"):
+            embeddings = LatencyEmbeddings(latency=args.embed_latency)
+            client = CountingQdrant(latency=args.upsert_latency)
+            qdrant.embeddings, qdrant.async_client = embeddings, client
+
+            start = time.perf_counter()
+            if mode == "per-file":
+                chunks = asyncio.run(per_file(files, args.batch_size, args.workers, args.write_latency))
+            else:
+                chunks = asyncio.run(bulk(files, args.batch_size, args.processes, args.write_latency))
+            wall = time.perf_counter() - start
+            print(f"{mode:<10}{chunks:>8}{wall:>10.2f}{embeddings.requests:>13}{client.upserts:>9}")
+
+
+if __name__ == "__main__":
+    main()
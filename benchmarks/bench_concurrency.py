@@ -0,0 +1,57 @@
+"""
+Concurrency benchmark for the /queries/ask agent path.
+
+Runs N concurrent queries through the collection agent with a fixed-latency chat model, once
+the way the route used to call it (blocking ``invoke`` inside ``async def``) and once through
+the awaitable ``ask_agent``. Blocking calls serialize on the event loop, so their wall time is
+N x latency; awaited calls overlap, so their wall time stays close to a single latency.
+
+    python -m benchmarks.bench_concurrency --requests 20 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import math
+import time
+
+from app import agent
+from app.models.schema import Query
+from benchmarks.fakes import SlowChatModel
+
+
+async def blocking_ask(query: Query, sender_id: str, collection_name: str) -> str:
+    appraisal_agent = await agent.get_agent(collection_name)
+    config = {"configurable": {"session_id": sender_id}}
+    return appraisal_agent.invoke({"input": query.query}, config=config)["output"]
+
+
+async def run(ask, requests: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*[ask(Query(query=f"question {i}"), f"sender-{i}", "benchmark") for i in range(requests)])
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Leave MLflow autolog off: it logs artifacts synchronously per call, which would dominate both modes.
+    agent.tracing_configured = True
+    agent.llm = SlowChatModel(latency=args.latency)
+    agent.agent_registry.clear()
+    # Pre-build the agent so no collection settings are looked up in MongoDB.
+    agent.register_agent("benchmark", agent.build_agent("benchmark"), check_interval=math.inf)
+
+    blocking = asyncio.run(run(blocking_ask, args.requests))
+    awaited = asyncio.run(run(agent.ask_agent, args.requests))
+
+    print(f"{args.requests} concurrent requests, {args.latency:.3f}s LLM latency")
+    print(f"{'mode':<10}{'wall (s)':>10}{'overlap':>10}")
+    for mode, wall in (("blocking", blocking), ("async", awaited)):
+        print(f"{mode:<10}{wall:>10.3f}{args.requests * args.latency / wall:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Retrieval benchmark: dense-only versus hybrid (dense + BM25 sparse, RRF fusion) collections.
+
+Loads the same fixture product corpus into an in-memory Qdrant collection per mode, with a
+bag-of-words dense stand-in that, like real embedding models, does not resolve product codes.
+Runs the labelled queries through VectorStore.retrieve and reports, per query kind:
+
+* hit@k: share of queries with a relevant product in the top k
+* MRR: mean reciprocal rank of the first relevant product
+* p50 / p95 retrieval latency (local-mode Qdrant, so only relative numbers are meaningful)
+
+    python -m benchmarks.bench_hybrid --products 2000 --queries 200 --k 4
+"""
+
+import argparse
+import statistics
+import time
+
+from qdrant_client import QdrantClient
+
+from app.db import vector_store
+from app.db.qdrant import qdrant
+from app.models.schema import CollectionConfig, RetrievalMode
+from benchmarks.corpus import build_corpus
+from benchmarks.fakes import TopicEmbeddings
+
+
+def evaluate(mode: RetrievalMode, docs: list, queries: list, k: int) -> dict[str, dict[str, float]]:
+    store = vector_store.VectorStore(f"benchmark-{mode.value}", CollectionConfig(retrieval_mode=mode))
+    store.create_collection()
+    store.add_documents(docs)
+
+    results: dict[str, dict[str, list[float]]] = {}
+    for query in queries:
+        start = time.perf_counter()
+        retrieved = store.retrieve(query.text, k=k)
+        latency = time.perf_counter() - start
+
+        ranks = [rank for rank, doc in enumerate(retrieved, 1) if doc.metadata["product_id"] in query.relevant]
+        metrics = results.setdefault(query.kind, {"hit": [], "rr": [], "latency": []})
+        metrics["hit"].append(1.0 if ranks else 0.0)
+        metrics["rr"].append(1 / ranks[0] if ranks else 0.0)
+        metrics["latency"].append(latency)
+
+    return {
+        kind: {
+            "hit": statistics.mean(metrics["hit"]),
+            "mrr": statistics.mean(metrics["rr"]),
+            "p50": statistics.median(metrics["latency"]) * 1000,
+            "p95": statistics.quantiles(metrics["latency"], n=20)[-1] * 1000,
+        }
+        for kind, metrics in results.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    qdrant.client = QdrantClient(location=":memory:")
+    qdrant.embeddings = TopicEmbeddings()
+    docs, queries = build_corpus(args.products, args.queries)
+
+    print(f"{args.products} products, {args.queries} queries, k={args.k}")
+    print(f"{'mode':<8}{'queries':<9}{'hit@k':>8}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for mode in (RetrievalMode.DENSE, RetrievalMode.HYBRID):
+        for kind, metrics in sorted(evaluate(mode, docs, queries, args.k).items()):
+            print(
+                f"{mode.value:<8}{kind:<9}{metrics['hit']:>8.2f}{metrics['mrr']:>8.2f}"
+                f"{metrics['p50']:>9.2f}{metrics['p95']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
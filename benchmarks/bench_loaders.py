@@ -0,0 +1,97 @@
+"""
+Loader benchmark: throughput of the native Markdown and CSV loaders versus Unstructured.
+
+Generates a Markdown guide with nested sections and a product CSV of about `--mib` MiB each, then
+reads each file to the end with every loader available for its format, CSV also in groups of 20
+rows. Reports per format and loader the documents produced, throughput in MB/s and peak Python heap
+(tracemalloc). Unstructured is only measured when the unstructured package is installed; docx files
+have no native loader and are not measured.
+
+    python -m benchmarks.bench_loaders --mib 20
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from typing import Iterator
+
+from langchain_core.documents import Document
+
+from app.db.data_handler import Loader, load_csv, load_markdown, load_unstructured
+
+
+def write_markdown(path: str, size: int) -> None:
+    with open(path, "w") as file:
+        chapter = 0
+        while file.tell() < size:
+            file.write(f"# Chapter {chapter}\n\nThis chapter covers product line {chapter}.\n\n")
+            for section in range(5):
+                file.write(f"## Section {chapter}.{section}\n\n")
+                file.write(f"Item SKU-{chapter:05d}-{section} ships with a two year warranty and free returns. " * 10)
+                file.write("\n\n```\n# configuration, not a heading\nwarranty = 2\n```\n\n")
+            chapter += 1
+
+
+def write_csv(path: str, size: int) -> None:
+    with open(path, "w") as file:
+        file.write("sku,name,category,price,description\n")
+        row = 0
+        while file.tell() < size:
+            file.write(
+                f"SKU-{row:07d},Product {row},category {row % 40},{row % 500 + 0.99},"
+                f'"Durable, well reviewed item number {row} with a two year warranty"\n'
+            )
+            row += 1
+
+
+def consume(documents: Iterator[Document]) -> int:
+    return sum(1 for _ in documents)
+
+
+def measure(loader: Loader, path: str) -> tuple[int, float, float]:
+    # Throughput and memory come from separate runs: tracing every allocation distorts timings.
+    start = time.perf_counter()
+    documents = consume(loader(path))
+    wall = time.perf_counter() - start
+
+    tracemalloc.start()
+    consume(loader(path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return documents, os.path.getsize(path) / 1e6 / wall, peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mib", type=float, default=20)
+    args = parser.parse_args()
+
+    loaders: dict[str, dict[str, Loader]] = {
+        ".md": {"native": load_markdown},
+        ".csv": {"native": load_csv, "native 20 rows": partial(load_csv, rows_per_document=20)},
+    }
+    if importlib.util.find_spec("unstructured") is not None:
+        for format_loaders in loaders.values():
+            format_loaders["unstructured"] = load_unstructured
+    else:
+        print("unstructured is not installed, measuring the native loaders only")
+
+    with tempfile.TemporaryDirectory() as directory:
+        size = int(args.mib * 2**20)
+        paths = {".md": os.path.join(directory, "guide.md"), ".csv": os.path.join(directory, "products.csv")}
+        write_markdown(paths[".md"], size)
+        write_csv(paths[".csv"], size)
+
+        print(f"{'format':<8}{'loader':<16}{'docs':>9}{'MB/s':>9}{'peak (MiB)':>12}")
+        for extension, format_loaders in loaders.items():
+            for name, loader in format_loaders.items():
+                documents, throughput, peak = measure(loader, paths[extension])
+                print(f"{extension:<8}{name:<16}{documents:>9}{throughput:>9.1f}{peak:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Retrieval settings benchmark: context size, relevance and latency of the retriever tool per setting.
+
+Loads the fixture product corpus into an in-memory Qdrant collection, with a bag-of-words dense
+stand-in under which products of one category and features look alike, and runs the labelled
+queries through VectorStore.retrieve with each retrieval setting. Reports per setting:
+
+* tokens: mean size of the returned context in prompt tokens (about 4 characters per token)
+* hit: share of queries with a relevant product in the returned chunks
+* distinct: mean number of different product descriptions (ignoring codes) among the chunks
+* p50 / p95 retrieval latency (local-mode Qdrant, so only relative numbers are meaningful)
+
+    python -m benchmarks.bench_retrieval --products 2000 --queries 200
+"""
+
+import argparse
+import statistics
+import time
+
+from qdrant_client import QdrantClient
+
+from app.cache.retrieval import RetrievalCache
+from app.db import vector_store
+from app.db.qdrant import qdrant
+from app.models.schema import RetrievalSettings
+from benchmarks.corpus import build_corpus
+from benchmarks.fakes import TopicEmbeddings
+
+SETTINGS = {
+    "k=2": RetrievalSettings(k=2),
+    "k=4": RetrievalSettings(k=4),
+    "k=8": RetrievalSettings(k=8),
+    "k=8 score>=0.3": RetrievalSettings(k=8, score_threshold=0.3),
+    "k=8 budget 100": RetrievalSettings(k=8, max_context_tokens=100),
+    "k=4 mmr 0.3": RetrievalSettings(k=4, mmr=True, fetch_k=20, mmr_lambda=0.3),
+}
+
+
+def evaluate(store: vector_store.VectorStore, settings: RetrievalSettings, queries: list) -> dict[str, float]:
+    # A fresh cache per setting, so no setting reuses the query embeddings of another.
+    store.retrieval_cache = RetrievalCache()
+    tokens, hits, distinct, latencies = [], [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        retrieved = store.retrieve(query.text, settings=settings)
+        latencies.append(time.perf_counter() - start)
+
+        tokens.append(sum(store.token_counter(doc.page_content) for doc in retrieved))
+        hits.append(1.0 if any(doc.metadata["product_id"] in query.relevant for doc in retrieved) else 0.0)
+        distinct.append(len({doc.page_content.split(" ", 1)[1].split(" Warranty")[0] for doc in retrieved}))
+    return {
+        "tokens": statistics.mean(tokens),
+        "hit": statistics.mean(hits),
+        "distinct": statistics.mean(distinct),
+        "p50": statistics.median(latencies) * 1000,
+        "p95": statistics.quantiles(latencies, n=20)[-1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    qdrant.client = QdrantClient(location=":memory:")
+    qdrant.embeddings = TopicEmbeddings()
+    docs, queries = build_corpus(args.products, args.queries)
+    store = vector_store.VectorStore("benchmark")
+    # Count tokens without tiktoken, whose encoding is downloaded on first use.
+    store.token_counter = lambda text: len(text) // 4
+    store.create_collection()
+    store.add_documents(docs)
+
+    print(f"{args.products} products, {args.queries} queries")
+    print(f"{'setting':<16}{'tokens':>8}{'hit':>7}{'distinct':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, settings in SETTINGS.items():
+        metrics = evaluate(store, settings, queries)
+        print(
+            f"{name:<16}{metrics['tokens']:>8.1f}{metrics['hit']:>7.2f}{metrics['distinct']:>10.2f}"
+            f"{metrics['p50']:>9.2f}{metrics['p95']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
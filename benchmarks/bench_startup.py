@@ -0,0 +1,85 @@
+"""
+Startup benchmark: time from launching a worker to its first successful /health response.
+
+Starts uvicorn in a subprocess and polls /health, R times per mode. "lazy" serves app.main as it
+is; "eager" first does what importing the app used to do: import the agent with langchain, OpenAI
+and Qdrant, enable MLflow autologging and create the chat model, the embeddings and the Qdrant
+clients. MLflow logs to a temporary local directory, so no tracking server is needed. The lifespan
+is off in both modes, because it connects to MongoDB and Redis.
+
+    python -m benchmarks.bench_startup --runs 3
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def __getattr__(name: str):
+    # uvicorn target benchmarks.bench_startup:eager_app
+    if name != "eager_app":
+        raise AttributeError(name)
+    from app import agent
+    from app.db.qdrant import qdrant
+    from app.main import app
+
+    agent.configure_tracing()
+    agent.get_llm()
+    qdrant.connect()
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_health(target: str, mlruns: str, timeout: float = 120) -> float:
+    port = free_port()
+    env = {**os.environ, "MLFLOW_TRACKING_URI": f"file://{mlruns}"}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--lifespan", "off", "--log-level", "error"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"{target} exited with code {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"{target} did not answer /health within {timeout} seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"time to first /health over {args.runs} runs")
+    print(f"{'mode':<7}{'min s':>8}{'median s':>10}")
+    for mode, target in (("eager", "benchmarks.bench_startup:eager_app"), ("lazy", "app.main:app")):
+        with tempfile.TemporaryDirectory(prefix="mlruns-") as mlruns:
+            times = [time_to_health(target, mlruns) for _ in range(args.runs)]
+        print(f"{mode:<7}{min(times):>8.2f}{statistics.median(times):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
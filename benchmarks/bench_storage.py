@@ -0,0 +1,111 @@
+"""
+Storage profile benchmark: memory per 100k chunks and recall@k of each collection storage profile.
+
+Memory is estimated from the Qdrant storage layout: original float32 vectors (in RAM, or on disk
+with on_disk), the quantized copy that always stays in RAM, and the HNSW graph links (m=16).
+
+Recall is measured by replaying the search of each profile in NumPy on synthetic embeddings:
+truncate and re-normalize to the profile dimensions, score against the int8 or binary quantized
+vectors, keep oversampling x k candidates, rescore them with the float vectors, and compare the
+top k with exact full-size search. The synthetic vectors mimic a Matryoshka model: a low-dimensional
+topic space projected with weights decaying over the dimensions, so the leading ones carry most of the signal. Treat the
+recall numbers as a relative comparison; confirm a profile on a sample of real data before using it.
+
+    python -m benchmarks.bench_storage --chunks 10000 --queries 200 --k 4
+"""
+
+import argparse
+
+import numpy as np
+
+from app.configs import EMBEDDING_DIMENSIONS
+from app.models.schema import Quantization, StorageProfile
+
+PROFILES = {
+    "float32-3072": StorageProfile(),
+    "float32-1024": StorageProfile(dimensions=1024),
+    "float32-256": StorageProfile(dimensions=256),
+    "int8-3072": StorageProfile(quantization=Quantization.INT8),
+    "int8-3072-disk": StorageProfile(quantization=Quantization.INT8, on_disk=True),
+    "int8-1024-disk": StorageProfile(dimensions=1024, quantization=Quantization.INT8, on_disk=True),
+    "binary-3072-disk": StorageProfile(quantization=Quantization.BINARY, oversampling=3.0, on_disk=True),
+    "binary-1024-disk": StorageProfile(
+        dimensions=1024, quantization=Quantization.BINARY, oversampling=3.0, on_disk=True
+    ),
+}
+HNSW_LINK_BYTES = 2 * 16 * 4  # level-0 links of an m=16 graph, 4 bytes each
+MIB = 1024 * 1024
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_embeddings(chunks: int, queries: int, seed: int = 7) -> tuple[np.ndarray, np.ndarray]:
+    # Topics live in a low-dimensional latent space, projected to the embedding size with decaying weights.
+    rng = np.random.default_rng(seed)
+    latent_size = 64
+    projection = rng.standard_normal((latent_size, EMBEDDING_DIMENSIONS), dtype=np.float32)
+    projection *= (np.arange(EMBEDDING_DIMENSIONS, dtype=np.float32) + 1) ** -0.25
+    latent = rng.standard_normal((chunks, latent_size), dtype=np.float32)
+    corpus = normalize(latent @ projection).astype(np.float32)
+    query_latent = latent[rng.integers(chunks, size=queries)]
+    query_latent += 0.5 * rng.standard_normal(query_latent.shape, dtype=np.float32)
+    return corpus, normalize(query_latent @ projection).astype(np.float32)
+
+
+def quantized_scores(profile: StorageProfile, corpus: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    if profile.quantization == Quantization.INT8:
+        low, high = np.quantile(corpus, [0.005, 0.995])
+        step = (high - low) / 255
+        dequantized = low + np.round((np.clip(corpus, low, high) - low) / step) * step
+        return queries @ dequantized.T
+    if profile.quantization == Quantization.BINARY:
+        return np.sign(queries) @ np.sign(corpus).T
+    return queries @ corpus.T
+
+
+def recall(profile: StorageProfile, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> float:
+    corpus = normalize(corpus[:, : profile.dimensions])
+    queries = normalize(queries[:, : profile.dimensions])
+    scores = quantized_scores(profile, corpus, queries)
+    if profile.quantization != Quantization.NONE:
+        candidates = np.argsort(-scores, axis=1)[:, : int(k * profile.oversampling)]
+        rescored = np.einsum("qd,qcd->qc", queries, corpus[candidates])
+        top = np.take_along_axis(candidates, np.argsort(-rescored, axis=1)[:, :k], axis=1)
+    else:
+        top = np.argsort(-scores, axis=1)[:, :k]
+    return float(np.mean([len(set(found) & set(expected)) / k for found, expected in zip(top, truth)]))
+
+
+def memory_per_100k(profile: StorageProfile) -> tuple[float, float]:
+    original = profile.dimensions * 4
+    quantized = {
+        Quantization.NONE: 0,
+        Quantization.INT8: profile.dimensions,
+        Quantization.BINARY: profile.dimensions / 8,
+    }
+    ram = HNSW_LINK_BYTES + quantized[profile.quantization] + (0 if profile.on_disk else original)
+    disk = original if profile.on_disk else 0
+    return ram * 100_000 / MIB, disk * 100_000 / MIB
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    corpus, queries = synthetic_embeddings(args.chunks, args.queries)
+    truth = np.argsort(-(queries @ corpus.T), axis=1)[:, : args.k]
+
+    print(f"{args.chunks} synthetic chunks, {args.queries} queries, recall@{args.k} against exact full-size search")
+    print(f"{'profile':<18}{'RAM MiB/100k':>14}{'disk MiB/100k':>15}{'recall':>8}")
+    for name, profile in PROFILES.items():
+        ram, disk = memory_per_100k(profile)
+        print(f"{name:<18}{ram:>14.0f}{disk:>15.0f}{recall(profile, corpus, queries, truth, args.k):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Tool execution benchmark: one agent step calling several tools, run sequentially or concurrently.
+
+The stand-in agent requests the retriever (async), the weather tool (sync) and web search (async)
+in one step, then finishes. Runs S such steps with each executor: AgentExecutor invoked
+synchronously (tools one after another), AgentExecutor awaited (concurrent, with sync tools on the
+loop's default executor and no timeouts), and ParallelAgentExecutor, with and without a search that
+hangs past its timeout. Reports wall time per step and the per-tool wall times recorded for tracing.
+
+    python -m benchmarks.bench_tools --steps 10 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
+
+from app.executor import ParallelAgentExecutor, tool_timings
+
+TOOL_CALLS = ("query_tool", "Weather", "tavily_search_results_json")
+
+
+def latency_tool(name: str, latency: float, use_async: bool) -> StructuredTool:
+    def run(query: str) -> str:
+        time.sleep(latency)
+        return f"{name} result"
+
+    async def arun(query: str) -> str:
+        await asyncio.sleep(latency)
+        return f"{name} result"
+
+    return StructuredTool.from_function(
+        func=run, coroutine=arun if use_async else None, name=name, description=f"{name} stand-in"
+    )
+
+
+def plan(inputs: dict):
+    if inputs["intermediate_steps"]:
+        return AgentFinish({"output": "done"}, "")
+    return [AgentAction(tool, {"query": inputs["input"]}, "") for tool in TOOL_CALLS]
+
+
+def tools(latency: float, search_latency: float) -> list[StructuredTool]:
+    return [
+        latency_tool("query_tool", latency, True),
+        latency_tool("Weather", latency, False),
+        latency_tool("tavily_search_results_json", search_latency, True),
+    ]
+
+
+def run(executor, steps: int, use_async: bool) -> float:
+    start = time.perf_counter()
+    for step in range(steps):
+        if use_async:
+            asyncio.run(executor.ainvoke({"input": f"question {step}"}))
+        else:
+            executor.invoke({"input": f"question {step}"})
+    return (time.perf_counter() - start) / steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.getLogger("app.executor").setLevel(logging.ERROR)
+
+    agent = RunnableLambda(plan)
+    timeout = round(3 * args.latency, 3)
+    modes = [
+        ("sequential", AgentExecutor(agent=agent, tools=tools(args.latency, args.latency)), False),
+        ("gathered", AgentExecutor(agent=agent, tools=tools(args.latency, args.latency)), True),
+        ("parallel", ParallelAgentExecutor(agent=agent, tools=tools(args.latency, args.latency)), True),
+        (
+            "hung search",
+            ParallelAgentExecutor(
+                agent=agent, tools=tools(args.latency, 100 * args.latency), tool_timeouts={TOOL_CALLS[2]: timeout}
+            ),
+            True,
+        ),
+    ]
+
+    print(f"{len(TOOL_CALLS)} tool calls per step, {args.latency}s per tool, hung search times out after {timeout}s")
+    print(f"{'mode':<13}{'ms/step':>9}")
+    for mode, executor, use_async in modes:
+        print(f"{mode:<13}{run(executor, args.steps, use_async) * 1000:>9.1f}")
+
+    print(f"\n{'tool':<28}{'calls':>6}{'timeouts':>10}{'avg ms':>8}{'max ms':>8}")
+    for tool, stats in tool_timings.stats().items():
+        print(
+            f"{tool:<28}{stats['calls']:>6}{stats['timeouts']:>10}"
+            f"{stats['avg_seconds'] * 1000:>8.1f}{stats['max_seconds'] * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
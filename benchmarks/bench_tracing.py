@@ -0,0 +1,104 @@
+"""
+Tracing overhead benchmark for the /queries/ask agent path.
+
+Runs N requests through ask_agent, C at a time, with a fixed-latency chat model, once per tracing
+mode: off, span tracing of every run, span tracing of a sample of runs, and optionally MLflow
+autologging (slow: it logs a model per run). Span traces are exported by the background exporter
+to a writer that discards them. Reports p50 and p99 latency and the p99 overhead over "off".
+
+    python -m benchmarks.bench_tracing --requests 400 --concurrency 1 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import math
+import os
+import statistics
+import tempfile
+import time
+
+from app import agent, tracing
+from app.models.schema import Query
+from benchmarks.fakes import SlowChatModel
+
+
+async def discard(traces: list[dict]) -> None:
+    pass
+
+
+async def run(requests: int, concurrency: int) -> list[float]:
+    latencies: list[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def ask(i: int) -> None:
+        async with slots:
+            start = time.perf_counter()
+            await agent.ask_agent(Query(query=f"question {i}"), f"sender-{i % 50}", "benchmark")
+            latencies.append(time.perf_counter() - start)
+
+    tracing.trace_exporter.writer = discard
+    await tracing.trace_exporter.start()
+    await asyncio.gather(*[ask(i) for i in range(requests)])
+    await tracing.trace_exporter.stop()
+    return latencies
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--mlflow", action="store_true", help="also measure MLflow autologging, to a local store")
+    args = parser.parse_args()
+
+    agent.tracing_configured = True
+    agent.llm = SlowChatModel(latency=args.latency)
+    # Count history tokens without tiktoken, whose encoding is downloaded on first use.
+    agent.history_compactor.token_counter = lambda text: len(text) // 4
+    agent.agent_registry.clear()
+    # Pre-build the agent so no collection settings are looked up in MongoDB.
+    agent.register_agent("benchmark", agent.build_agent("benchmark"), check_interval=math.inf)
+    # Warm up imports outside the measurement.
+    tracing.TRACING_MODE = "off"
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(run(args.concurrency, args.concurrency))
+
+    modes = [("off", "off", 1.0), ("spans", "spans", 1.0), (f"spans {args.sample_rate:.0%}", "spans", args.sample_rate)]
+    if args.mlflow:
+        modes.append(("mlflow", "mlflow", 1.0))
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.latency:.3f}s LLM latency")
+    print(f"{'mode':<12}{'p50 ms':>9}{'p99 ms':>9}{'p99 overhead ms':>17}{'traces':>8}")
+    baseline = None
+    mlruns = tempfile.TemporaryDirectory(prefix="mlruns-")
+    for name, mode, sample_rate in modes:
+        tracing.TRACING_MODE = mode
+        tracing.span_tracer.sample_rate = sample_rate
+        if mode == "mlflow":
+            import mlflow
+
+            mlflow.set_tracking_uri(f"file://{mlruns.name}")
+            agent.TRACING_MODE = "mlflow"
+            agent.tracing_configured = False
+            agent.configure_tracing()
+        written = tracing.trace_exporter.written
+        gc.collect()
+        # The agent executor is verbose; keep its output out of the report.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            latencies = asyncio.run(run(args.requests, args.concurrency))
+        p50, p99 = percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+        baseline = p99 if baseline is None else baseline
+        traces = tracing.trace_exporter.written - written
+        print(f"{name:<12}{p50:>9.2f}{p99:>9.2f}{p99 - baseline:>17.2f}{traces:>8}")
+    mlruns.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Conversation tracker benchmark: sequential commands versus one pipeline per tracker update.
+
+Runs N concurrent turns from the same sender against a Redis stand-in with a fixed round-trip
+latency, once with the tracker as /queries/ask used to update it (hgetall, hset and expire before
+the agent, hset and expire after it) and once with app.db.conversation_tracker (one pipeline
+with HINCRBY before, one after). Reports Redis round trips and tracker time per turn, and the
+final message_count: the read-modify-write loses concurrent increments, HINCRBY counts all.
+
+    python -m benchmarks.bench_tracker --turns 50 --latency 0.001
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from app.configs import CONVERSATION_TTL
+from app.db.conversation_tracker import finish_turn, start_turn, tracker_key
+from benchmarks.fakes import LatencyRedis
+
+
+async def legacy_start_turn(redis, sender_id: str, collection_name: str) -> dict:
+    key = tracker_key(sender_id, collection_name)
+    conversation_data = await redis.hgetall(key)
+    if not conversation_data:
+        conversation_data = {"message_count": 1, "last_interaction": datetime.utcnow().isoformat(), "status": "ongoing"}
+    else:
+        conversation_data["message_count"] = int(conversation_data.get("message_count", 0)) + 1
+        conversation_data["last_interaction"] = datetime.utcnow().isoformat()
+    await redis.hset(key, mapping=conversation_data)
+    await redis.expire(key, CONVERSATION_TTL)
+    return conversation_data
+
+
+async def legacy_finish_turn(redis, sender_id: str, collection_name: str, conversation_data: dict) -> None:
+    key = tracker_key(sender_id, collection_name)
+    conversation_data.update({"last_response": "answer", "status": "responded"})
+    await redis.hset(key, mapping=conversation_data)
+    await redis.expire(key, CONVERSATION_TTL)
+
+
+async def legacy_turn(redis) -> float:
+    start = time.perf_counter()
+    conversation_data = await legacy_start_turn(redis, "alice", "docs")
+    tracked = time.perf_counter() - start
+    await asyncio.sleep(0.01)  # the agent
+    start = time.perf_counter()
+    await legacy_finish_turn(redis, "alice", "docs", conversation_data)
+    return tracked + time.perf_counter() - start
+
+
+async def pipelined_turn(redis) -> float:
+    start = time.perf_counter()
+    await start_turn(redis, "alice", "docs")
+    tracked = time.perf_counter() - start
+    await asyncio.sleep(0.01)  # the agent
+    start = time.perf_counter()
+    await finish_turn(redis, "alice", "docs", "answer")
+    return tracked + time.perf_counter() - start
+
+
+async def run(turn, turns: int, latency: float) -> tuple[int, float, int]:
+    redis = LatencyRedis(latency=latency)
+    durations = await asyncio.gather(*[turn(redis) for _ in range(turns)])
+    message_count = int(redis.hashes[tracker_key("alice", "docs")]["message_count"])
+    return redis.round_trips, sum(durations) / turns, message_count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.001)
+    args = parser.parse_args()
+
+    print(f"{args.turns} concurrent turns of one sender, {args.latency * 1000:.1f}ms Redis round trip")
+    print(f"{'mode':<11}{'round trips/turn':>18}{'tracker ms/turn':>17}{'message_count':>15}")
+    for mode, turn in (("sequential", legacy_turn), ("pipelined", pipelined_turn)):
+        round_trips, duration, message_count = asyncio.run(run(turn, args.turns, args.latency))
+        print(f"{mode:<11}{round_trips / args.turns:>18.1f}{duration * 1000:>17.2f}{message_count:>15}")
+
+
+if __name__ == "__main__":
+    main()
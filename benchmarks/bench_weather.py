@@ -0,0 +1,93 @@
+"""
+Weather tool benchmark: a new connection per call versus the pooled, cached WeatherClient.
+
+Serves benchmarks.mock_openweather over local HTTP with a fixed latency and looks up the weather
+of L locations, drawn with a skew towards a few popular cities and spelled inconsistently, C at a
+time. Compares the previous behaviour (a fresh connection and API call per lookup), the pooled
+client with caching disabled (keep-alive connections; concurrent lookups of a city still share
+one call) and the pooled client with its TTL cache. Reports wall time, mean lookup latency,
+upstream API calls and TCP connections opened. Local connections skip the TLS handshake a real
+API call pays, so the per-call mode is slower still in production.
+
+    python -m benchmarks.bench_weather --lookups 200 --cities 20 --concurrency 10 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from app.tools.weather_tool import WeatherClient, format_weather
+from benchmarks.mock_openweather import MockOpenWeather
+
+
+def workload(lookups: int, cities: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    names = [f"City {i}, XY" for i in range(cities)]
+    weights = [1 / (rank + 1) for rank in range(cities)]
+    spellings = [str, str.lower, lambda name: "  " + name.upper(), lambda name: name.replace(", ", ",")]
+    return [rng.choice(spellings)(rng.choices(names, weights)[0]) for _ in range(lookups)]
+
+
+async def run(lookup, locations: list[str], concurrency: int) -> tuple[float, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(location: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await lookup(location)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed(location) for location in locations])
+    return time.perf_counter() - start, sum(latencies) / len(latencies)
+
+
+def bench(mode: str, locations: list[str], concurrency: int, latency: float) -> tuple[float, float, int, int]:
+    mock = MockOpenWeather(latency=latency)
+    server, url = mock.serve()
+
+    async def per_call(location: str) -> str:
+        # Plain HTTP: skip loading CA certificates, so only the connection itself is paid per call.
+        async with httpx.AsyncClient(timeout=10, verify=False) as client:
+            response = await client.get(url, params={"q": location, "appid": "benchmark"})
+        return format_weather(location, response.json())
+
+    async def scenario() -> tuple[float, float]:
+        if mode == "per call":
+            return await run(per_call, locations, concurrency)
+        client = WeatherClient(url=url, api_key="benchmark", cache_ttl=600 if mode == "cached" else 0)
+        try:
+            return await run(client.aget, locations, concurrency)
+        finally:
+            await client.aclose()
+
+    try:
+        wall, mean_latency = asyncio.run(scenario())
+    finally:
+        server.should_exit = True
+    return wall, mean_latency, sum(mock.requests.values()), mock.connections
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--cities", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    locations = workload(args.lookups, args.cities, args.seed)
+    print(f"{args.lookups} lookups of {args.cities} cities, {args.concurrency} at a time, {args.latency}s API latency")
+    print(f"{'mode':<10}{'wall s':>9}{'mean ms':>10}{'API calls':>11}{'connections':>13}")
+    for mode in ("per call", "pooled", "cached"):
+        wall, mean_latency, calls, connections = bench(mode, locations, args.concurrency, args.latency)
+        print(f"{mode:<10}{wall:>9.3f}{mean_latency * 1000:>10.1f}{calls:>11}{connections:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Fixture corpus of product descriptions with identifiers, and labelled queries, for retrieval benchmarks.
+
+Generated from a fixed seed so every run and every retrieval mode sees the same data. Each query
+lists the IDs of the products that answer it.
+"""
+
+import random
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+CATEGORIES = {
+    "air purifier": ("HEPA filter", "bedroom air", "allergens and dust", "quiet night mode"),
+    "espresso machine": ("milk frother", "coffee beans", "pressure pump", "barista crema"),
+    "robot vacuum": ("carpet cleaning", "pet hair", "charging dock", "floor mapping"),
+    "electric kettle": ("boiling water", "tea temperature", "stainless steel jug", "auto shut-off"),
+    "standing desk": ("height adjustment", "office posture", "dual motor frame", "memory presets"),
+    "noise cancelling headphones": ("flight travel", "bass sound", "battery life", "ear cushions"),
+    "cordless drill": ("wood screws", "lithium battery", "torque settings", "masonry bits"),
+    "smart thermostat": ("heating schedule", "energy savings", "room sensors", "app control"),
+}
+PREFIXES = ["AX", "BQ", "CV", "DK", "FX", "HM", "KR", "LT", "MZ", "PW", "RS", "TV", "XK", "ZN"]
+
+
+@dataclass
+class LabelledQuery:
+    kind: str
+    text: str
+    relevant: set[str]
+
+
+def build_corpus(products: int = 2000, queries: int = 200, seed: int = 7) -> tuple[list[Document], list[LabelledQuery]]:
+    """
+    Build the corpus and its queries.
+    Args:
+        products (int): Number of product descriptions
+        queries (int): Number of queries, half asking for a product code and half topical
+        seed (int): Random seed
+    Returns:
+        tuple[list[Document], list[LabelledQuery]]: The documents, with their product ID in metadata, and the queries
+    """
+    rng = random.Random(seed)
+    docs = []
+    codes: set[str] = set()
+    for index in range(products):
+        category = rng.choice(list(CATEGORIES))
+        features = rng.sample(CATEGORIES[category], 2)
+        while (code := f"{rng.choice(PREFIXES)}-{rng.randint(1000, 9999)}") in codes:
+            pass
+        codes.add(code)
+        text = (
+            f"{code} {category}. Designed for {features[0]} with {features[1]}. "
+            f"Warranty: {rng.randint(1, 5)} years. Replacement parts ship within {rng.randint(2, 14)} days."
+        )
+        docs.append(Document(page_content=text, metadata={"product_id": str(index), "category": category}))
+
+    labelled = []
+    for _ in range(queries // 2):
+        doc = rng.choice(docs)
+        code = doc.page_content.split(" ", 1)[0]
+        template = rng.choice(["What is the warranty on {}?", "How fast do parts for {} ship?", "Tell me about {}"])
+        labelled.append(LabelledQuery("code", template.format(code), {doc.metadata["product_id"]}))
+    for _ in range(queries - queries // 2):
+        category = rng.choice(list(CATEGORIES))
+        feature = rng.choice(CATEGORIES[category])
+        relevant = {
+            doc.metadata["product_id"]
+            for doc in docs
+            if doc.metadata["category"] == category and feature in doc.page_content
+        }
+        labelled.append(LabelledQuery("topical", f"Which {category} is good for {feature}?", relevant))
+    return docs, labelled
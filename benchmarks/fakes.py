@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class SlowChatModel(BaseChatModel):
+    """
+    Chat model stand-in that answers after a fixed latency, to measure the service around the LLM.
+    """
+
+    latency: float = 0.2
+    reply: str = "This is a benchmark answer."
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "SlowChatModel":
+        return self
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        # Token counts approximated by words, so tracing has usage to record.
+        input_tokens = sum(len(str(message.content).split()) for message in messages)
+        output_tokens = len(self.reply.split())
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return AIMessage(content=self.reply, usage_metadata=usage)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self.reply.split(" "):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_latency)
+
+
+class LatencyEmbeddings(Embeddings):
+    """
+    Deterministic embedding model stand-in with a fixed per-request latency, like a remote embedding API.
+    """
+
+    def __init__(self, size: int = 3072, latency: float = 0.05):
+        self.size = size
+        self.latency = latency
+        self.requests = 0
+
+    def _vector(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.requests += 1
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class LatencyQdrant:
+    """
+    Async Qdrant client stand-in that acknowledges upserts after a fixed latency and keeps nothing.
+    """
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.points = 0
+
+    async def upsert(self, collection_name: str, points: list, **kwargs: Any) -> None:
+        await asyncio.sleep(self.latency)
+        self.points += len(points)
+
+
+class TopicEmbeddings(Embeddings):
+    """
+    Bag-of-words embedding stand-in that captures topical similarity but, like dense models, blurs exact
+    identifiers: tokens containing digits (product codes, part numbers) are ignored.
+    """
+
+    def __init__(self, size: int = 3072):
+        self.size = size
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"\S*\d\S*|[a-z]+(?:[-'][a-z]+)*", text.lower()):
+            if any(char.isdigit() for char in word):
+                continue
+            digest = hashlib.sha256(word.encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.size] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+class LatencyRedis:
+    """
+    In-memory stand-in for the aioredis hash commands, charging a fixed network latency per round trip.
+
+    Every awaited command is one round trip; a pipeline is one round trip for all its commands.
+    Like a real server, each command runs atomically, but nothing holds between round trips.
+    """
+
+    def __init__(self, latency: float = 0.001):
+        self.latency = latency
+        self.round_trips = 0
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.ttls: dict[str, int] = {}
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        await asyncio.sleep(self.latency)
+
+    def _hgetall(self, key: str) -> dict:
+        return dict(self.hashes.get(key, {}))
+
+    def _hset(self, key: str, mapping: dict) -> int:
+        self.hashes.setdefault(key, {}).update({field: str(value) for field, value in mapping.items()})
+        return len(mapping)
+
+    def _hincrby(self, key: str, field: str, amount: int) -> int:
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+        return int(fields[field])
+
+    def _expire(self, key: str, seconds: int) -> bool:
+        self.ttls[key] = seconds
+        return True
+
+    async def hgetall(self, key: str) -> dict:
+        await self._round_trip()
+        return self._hgetall(key)
+
+    async def hset(self, key: str, mapping: dict) -> int:
+        await self._round_trip()
+        return self._hset(key, mapping)
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        await self._round_trip()
+        return self._hincrby(key, field, amount)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        await self._round_trip()
+        return self._expire(key, seconds)
+
+    def pipeline(self, transaction: bool = True) -> "LatencyRedisPipeline":
+        return LatencyRedisPipeline(self)
+
+
+class LatencyRedisPipeline:
+    """
+    Pipeline of a LatencyRedis: queues commands and runs them in one round trip.
+    """
+
+    def __init__(self, redis: LatencyRedis):
+        self.redis = redis
+        self.commands: list = []
+
+    def hset(self, key: str, mapping: dict) -> "LatencyRedisPipeline":
+        self.commands.append(lambda: self.redis._hset(key, mapping))
+        return self
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> "LatencyRedisPipeline":
+        self.commands.append(lambda: self.redis._hincrby(key, field, amount))
+        return self
+
+    def expire(self, key: str, seconds: int) -> "LatencyRedisPipeline":
+        self.commands.append(lambda: self.redis._expire(key, seconds))
+        return self
+
+    async def execute(self) -> list:
+        await self.redis._round_trip()
+        return [command() for command in self.commands]
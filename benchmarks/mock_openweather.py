@@ -0,0 +1,124 @@
+"""
+Local stand-in for the OpenWeather current weather API.
+
+Answers GET /data/2.5/weather?q=<location>&appid=<key> with a deterministic response after a fixed
+latency, counts the requests and connections it received, and can fail the first requests of each
+location to exercise retries. Use it in process through httpx.ASGITransport(app=...), or over real
+sockets with serve(), which also lets connection reuse show up in the connection count.
+
+    python -m benchmarks.mock_openweather --port 8765 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+WEATHER_PATH = "/data/2.5/weather"
+DESCRIPTIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "mist"]
+
+
+class MockOpenWeather:
+    """
+    Mock OpenWeather API with request counters.
+
+    Attributes:
+        app: ASGI application serving WEATHER_PATH
+        requests (Counter): Requests received per location
+        connections (int): TCP connections opened, when served with serve()
+    """
+
+    def __init__(self, latency: float = 0.0, failures: int = 0, failure_status: int = 503):
+        """
+        Initialize the mock.
+        Args:
+            latency (float): Seconds each response is delayed
+            failures (int): Leading requests of each location answered with failure_status
+            failure_status (int): Status code of the failed requests
+        """
+        self.latency = latency
+        self.failures = failures
+        self.failure_status = failure_status
+        self.requests: Counter = Counter()
+        self.connections = 0
+        self.app = self._build_app()
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get(WEATHER_PATH)
+        async def weather(q: str, appid: Optional[str] = None) -> JSONResponse:
+            self.requests[q] += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.requests[q] <= self.failures:
+                return JSONResponse({"cod": self.failure_status, "message": "mock failure"}, self.failure_status)
+            if not appid:
+                return JSONResponse({"cod": 401, "message": "Invalid API key."}, status_code=401)
+            seed = zlib.crc32(q.encode())
+            return JSONResponse(
+                {
+                    "name": q,
+                    "main": {"temp": round(-5 + seed % 400 / 10, 1), "humidity": seed % 100},
+                    "weather": [{"description": DESCRIPTIONS[seed % len(DESCRIPTIONS)]}],
+                    "dt": int(time.time()),
+                }
+            )
+
+        return app
+
+    def url(self, base: str = "http://openweather.mock") -> str:
+        return base + WEATHER_PATH
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> tuple[uvicorn.Server, str]:
+        """
+        Serve the mock over HTTP from a background thread.
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free port
+        Returns:
+            tuple[uvicorn.Server, str]: The running server (set should_exit to stop it) and the weather URL
+        """
+        server = uvicorn.Server(uvicorn.Config(self._counting(self.app), host=host, port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        return server, self.url(f"http://{host}:{port}")
+
+    def _counting(self, app: ASGIApp) -> ASGIApp:
+        # Every request carries the client address; a new address is a new TCP connection.
+        clients = set()
+
+        async def counting(scope: Scope, receive: Receive, send: Send) -> None:
+            if scope["type"] == "http" and scope.get("client") and tuple(scope["client"]) not in clients:
+                clients.add(tuple(scope["client"]))
+                self.connections += 1
+            await app(scope, receive, send)
+
+        return counting
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failures", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockOpenWeather(latency=args.latency, failures=args.failures)
+    print(f"OPENWEATHER_URL={mock.url(f'http://{args.host}:{args.port}')}")
+    uvicorn.run(mock.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()